@@ -0,0 +1,125 @@
+"""
+async_database.py - Non-blocking wrappers around database.py
+
+pymongo is synchronous, so every call is run on a bounded thread pool
+instead of on the event loop. The API mirrors database.py one to one:
+    await async_database.add_item(user_id, 'thought', 'text')
+
+Large result sets are streamed with async generators (iter_*), which
+load one keyset batch at a time:
+    async for item in async_database.iter_due_reminders(until): ...
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import metrics
+
+# מספר ה-threads שמריצים שאילתות במקביל (ברירת מחדל: כמו maxPoolSize של pymongo)
+DB_MAX_WORKERS = int(os.getenv('DB_MAX_WORKERS', '32'))
+
+_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix='db')
+
+
+async def run(func, *args, **kwargs):
+    """מריץ פונקציה סינכרונית על ה-thread pool של ה-DB"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown():
+    """סוגר את ה-thread pool (לקריאה בסיום התהליך)"""
+    _executor.shutdown(wait=True)
+
+
+def _async(name):
+    """יוצר גרסה אסינכרונית לפונקציה מ-database.py לפי שמה"""
+    func = getattr(database, name)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        # חיפוש לפי שם בזמן הקריאה, כדי שהחלפת הפונקציה ב-database תשפיע גם כאן
+        return await run(metrics.timed_operation, name, getattr(database, name), *args, **kwargs)
+
+    return wrapper
+
+
+def _stream(name, key, batch_size):
+    """יוצר async generator על פונקציה מ-database.py שמקבלת after ו-limit
+
+    כל batch נטען ב-thread pool בנפרד, בעימוד keyset (key - המפתח של פריט),
+    כך שהצרכן מתחיל לעבוד על ה-batch הראשון לפני שהאחרונים נטענו, הזיכרון
+    חסום ב-batch אחד ואף cursor לא נשאר פתוח בין ה-batches.
+    """
+    async def stream(*args, **kwargs):
+        after = None
+        while True:
+            batch = await run(
+                metrics.timed_operation, name, getattr(database, name),
+                *args, after=after, limit=batch_size, **kwargs
+            )
+            for item in batch:
+                yield item
+            if len(batch) < batch_size:
+                return
+            after = key(batch[-1])
+
+    stream.__name__ = f"iter_{name}"
+    return stream
+
+
+# User Management
+get_or_create_user = _async('get_or_create_user')
+update_last_review = _async('update_last_review')
+should_review = _async('should_review')
+get_home_snapshot = _async('get_home_snapshot')
+
+# Item CRUD
+add_item = _async('add_item')
+get_item_by_id = _async('get_item_by_id')
+update_item_status = _async('update_item_status')
+update_item_content = _async('update_item_content')
+apply_bulk_action = _async('apply_bulk_action')
+
+# Item Queries
+get_items_today = _async('get_items_today')
+get_items_week = _async('get_items_week')
+get_archived_items = _async('get_archived_items')
+get_items_page = _async('get_items_page')
+search_items = _async('search_items')
+search_page = _async('search_page')
+search_cold_page = _async('search_cold_page')
+get_tag_page = _async('get_tag_page')
+get_top_tags = _async('get_top_tags')
+get_items_for_review = _async('get_items_for_review')
+
+# Reminder Operations
+set_reminder = _async('set_reminder')
+get_pending_reminders = _async('get_pending_reminders')
+get_due_reminders = _async('get_due_reminders')
+iter_due_reminders = _stream(
+    'get_due_reminders',
+    key=lambda reminder: (reminder['due_at'], str(reminder['_id'])),
+    batch_size=database.REMINDER_BATCH_SIZE
+)
+claim_reminders = _async('claim_reminders')
+release_reminder = _async('release_reminder')
+mark_reminder_sent = _async('mark_reminder_sent')
+mark_reminders_sent = _async('mark_reminders_sent')
+
+# Review Operations
+keep_for_next_week = _async('keep_for_next_week')
+apply_review_decisions = _async('apply_review_decisions')
+log_review_decision = _async('log_review_decision')
+replay_review_log = _async('replay_review_log')
+
+# Tiering
+tier_items = _async('tier_items')
+purge_cold = _async('purge_cold')
+
+# Leases
+acquire_lease = _async('acquire_lease')
+release_lease = _async('release_lease')
+get_lease = _async('get_lease')
@@ -0,0 +1,100 @@
+"""
+bench_async_db.py - Handler latency with sync vs. async database calls
+
+Simulates N concurrent users tapping "📆 השבוע" at the same time and
+measures p50/p99 latency of the DB part of the handler, once with the
+synchronous database.py calls made directly on the event loop (before)
+and once through async_database.py (after).
+
+Requires a reachable MongoDB (MONGODB_URI, STORAGE_BACKEND=mongo - the
+default). Run from the repo root:
+    python -m benchmarks.bench_async_db --users 50 --rounds 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import database
+import async_database
+from storage import mongo
+
+BENCH_USER_BASE = 900_000_000
+
+
+async def sync_handler(user_id):
+    """ההתנהגות הישנה - קריאות חוסמות בתוך ה-handler"""
+    database.get_pending_reminders(user_id)
+    database.should_review(user_id)
+    database.get_items_week(user_id)
+
+
+async def async_handler(user_id):
+    """ההתנהגות החדשה - קריאות דרך ה-thread pool"""
+    await async_database.get_pending_reminders(user_id)
+    await async_database.should_review(user_id)
+    await async_database.get_items_week(user_id)
+
+
+async def run_round(handler, users):
+    """מריץ handler אחד לכל משתמש במקביל ומחזיר זמני תגובה (ms)"""
+    async def timed(user_id):
+        start = time.perf_counter()
+        await handler(user_id)
+        return (time.perf_counter() - start) * 1000
+
+    return await asyncio.gather(*(timed(BENCH_USER_BASE + i) for i in range(users)))
+
+
+def percentile(values, pct):
+    """אחוזון פשוט (nearest-rank)"""
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def seed(users, items_per_user):
+    """יוצר פריטים למשתמשי הבדיקה"""
+    for i in range(users):
+        user_id = BENCH_USER_BASE + i
+        database.get_or_create_user(user_id)
+        for n in range(items_per_user):
+            database.add_item(user_id, 'thought', f'benchmark item {n}', ['bench'])
+
+
+def cleanup(users):
+    """מוחק את נתוני הבדיקה - גם מה ש-add_item כותב מחוץ ל-items (מוני תגיות, תזכורות)"""
+    query = {'user_id': {'$in': [BENCH_USER_BASE + i for i in range(users)]}}
+    for collection in (
+        mongo.items_collection, mongo.cold_items_collection, mongo.users_collection,
+        mongo.tags_collection, mongo.reminders_collection, mongo.review_log_collection
+    ):
+        collection.delete_many(query)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--items', type=int, default=20, help='items per user')
+    args = parser.parse_args()
+
+    seed(args.users, args.items)
+    try:
+        for name, handler in (('before (sync)', sync_handler), ('after (async)', async_handler)):
+            latencies = []
+            for _ in range(args.rounds):
+                latencies.extend(await run_round(handler, args.users))
+            print(
+                f"{name:14} users={args.users} "
+                f"p50={percentile(latencies, 50):.1f}ms "
+                f"p99={percentile(latencies, 99):.1f}ms "
+                f"mean={statistics.mean(latencies):.1f}ms"
+            )
+    finally:
+        cleanup(args.users)
+        async_database.shutdown()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
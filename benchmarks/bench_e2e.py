@@ -0,0 +1,311 @@
+"""
+bench_e2e.py - End-to-end throughput and latency of the bot handlers
+
+Runs the real Application from bot.py (handlers, conversations, outbox,
+update processor) against a local fake Bot API (fake_telegram.py) and the
+memory or SQLite storage backend, so no network, MongoDB or bot token is
+needed. N virtual users run concurrently, each doing a random sequence of
+realistic flows and pressing the buttons the bot actually sent:
+
+    add      ➕ הוסף → content → type → reminder
+    today    📅 היום → maybe next page / open an item
+    week     📆 השבוע → maybe next page / open an item
+    search   🔍 חיפוש → query
+    review   📋 סיקור → archive / keep / delete / skip until done
+    bulk     📅 היום → ☑️ בחירה → toggle items → bulk action → confirm
+    tags     🏷️ תגיות → a tag → maybe next page
+
+Reports updates/sec, handler latency (p50/p95/p99) overall and per flow,
+storage calls per update and Bot API calls per update. The outbox rate
+limits are lifted unless --rate-limits is given, so the numbers measure
+the bot rather than Telegram's limits. With --profile RATE that fraction
+of the updates is profiled (profiling.py) and the report path is printed. Run from the repo root:
+    python -m benchmarks.bench_e2e --users 50 --flows 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+from telegram import Update
+
+import async_database
+import bot
+import database
+import outbox
+import profiling
+import storage
+from benchmarks import fake_telegram
+
+BENCH_TOKEN = '123456:BENCH'
+BENCH_USER_BASE = 700_000_000
+
+FLOWS = {'add': 35, 'today': 20, 'week': 15, 'search': 20, 'review': 10, 'bulk': 5, 'tags': 5}
+
+WORDS = [
+    'עבודה', 'פגישה', 'רעיון', 'קניות', 'ספר', 'פרויקט', 'משפחה', 'טיול',
+    'meeting', 'project', 'idea', 'budget', 'release', 'design', 'review',
+]
+TAGS = ['עבודה', 'בית', 'רעיון', 'work', 'home', 'ideas']
+
+
+class CountingStorage:
+    """עוטף backend וסופר את הקריאות לכל מתודה"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.backend, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            with self._lock:
+                self.calls[name] += 1
+            return attr(*args, **kwargs)
+
+        return counted
+
+
+class Harness:
+    """ה-Application, ה-API המדומה והמדידות"""
+
+    def __init__(self, application, api):
+        self.application = application
+        self.api = api
+        self.updates = fake_telegram.UpdateFactory()
+        self.latencies = defaultdict(list)   # flow -> [ms]
+        self.stalled = Counter()             # flow -> כמה פעמים הכפתור הצפוי לא הגיע
+        self.errors = Counter()
+
+    async def dispatch(self, flow, data):
+        """מעביר עדכון אחד דרך ה-update processor, כמו ה-update fetcher, ומודד"""
+        application = self.application
+        update = Update.de_json(data, application.bot)
+        started = time.perf_counter()
+        await application.update_processor.process_update(update, application.process_update(update))
+        self.latencies[flow].append((time.perf_counter() - started) * 1000)
+
+    async def on_error(self, update, context):
+        self.errors[type(context.error).__name__] += 1
+
+    def reset(self):
+        self.latencies.clear()
+        self.stalled.clear()
+        self.errors.clear()
+        self.api.reset()
+        database.backend.calls.clear()
+        profiling.profiler.take_window()
+
+
+class VirtualUser:
+    """משתמש מדומה שמריץ flows אקראיים"""
+
+    def __init__(self, harness, user_id, rng):
+        self.harness = harness
+        self.user_id = user_id
+        self.rng = rng
+
+    async def text(self, flow, text):
+        await self.harness.dispatch(flow, self.harness.updates.message(self.user_id, text))
+
+    async def press(self, flow, *prefixes):
+        """לוחץ על כפתור אקראי מהמקלדת האחרונה שמתחיל באחת התחיליות"""
+        api = self.harness.api
+        message_id, buttons = api.buttons(self.user_id)
+        choices = [data for data in buttons if data.startswith(prefixes)]
+        if not choices:
+            self.harness.stalled[flow] += 1
+            return False
+        data = self.rng.choice(choices)
+        _, keyboard = api.keyboard(self.user_id)
+        await self.harness.dispatch(
+            flow, self.harness.updates.callback(self.user_id, message_id, data, keyboard)
+        )
+        return True
+
+    def content(self):
+        words = ' '.join(self.rng.choices(WORDS, k=self.rng.randint(3, 10)))
+        tags = ' '.join('#' + tag for tag in self.rng.sample(TAGS, self.rng.randint(0, 2)))
+        return f"{words} {tags}".strip()
+
+    async def add(self):
+        await self.text('add', '➕ הוסף')
+        await self.text('add', self.content())
+        if await self.press('add', 'type_'):
+            await self.press('add', 'reminder_tomorrow', 'reminder_week', 'reminder_none')
+
+    async def browse(self, flow, button):
+        await self.text(flow, button)
+        if self.rng.random() < 0.5:
+            await self.press(flow, 'pg_')
+        if self.rng.random() < 0.3:
+            await self.press(flow, 'open_')
+
+    async def today(self):
+        await self.browse('today', '📅 היום')
+
+    async def week(self):
+        await self.browse('week', '📆 השבוע')
+
+    async def search(self):
+        await self.text('search', '🔍 חיפוש')
+        await self.text('search', self.rng.choice(WORDS)[:self.rng.randint(3, 6)])
+
+    async def review(self, max_steps=10):
+        await self.text('review', '📋 סיקור')
+        for _ in range(max_steps):
+            message_id, buttons = self.harness.api.buttons(self.user_id)
+            if not any(data.startswith('review_') for data in buttons):
+                break
+            action = self.rng.choices(['review_archive', 'review_keep', 'review_delete', 'review_skip'],
+                                      weights=[4, 3, 1, 2])[0]
+            await self.press('review', action)
+
+    async def bulk(self):
+        await self.text('bulk', '📅 היום')
+        if not await self.press('bulk', 'sel_on_'):
+            return
+        for _ in range(self.rng.randint(1, 4)):
+            await self.press('bulk', 'tg_')
+        if await self.press('bulk', 'bulk_'):
+            await self.press('bulk', 'bulkok_')
+
+    async def tags(self):
+        await self.text('tags', '🏷️ תגיות')
+        if await self.press('tags', 'tag_') and self.rng.random() < 0.5:
+            await self.press('tags', 'pg_')
+
+    async def run(self, flows):
+        names, weights = zip(*FLOWS.items())
+        for name in self.rng.choices(names, weights=weights, k=flows):
+            await getattr(self, name)()
+
+
+def percentile(values, pct):
+    """אחוזון פשוט (nearest-rank)"""
+    ordered = sorted(values)
+    index = max(0, int(round(pct / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+
+def lift_rate_limits():
+    """מבטל את הגבלות הקצב של ה-outbox (כדי למדוד את הבוט ולא את טלגרם)"""
+    unlimited = 1e9
+    outbox.outbox.global_bucket = outbox.TokenBucket(unlimited, unlimited)
+    outbox.outbox.chat_rate = unlimited
+    outbox.outbox.chat_burst = unlimited
+
+
+def report(harness, elapsed):
+    latencies = [ms for values in harness.latencies.values() for ms in values]
+    count = len(latencies)
+    if not count:
+        print("No updates were processed")
+        return
+
+    print(f"updates      {count} in {elapsed:.2f}s = {count / elapsed:.1f} updates/s")
+    print(
+        f"latency      p50={percentile(latencies, 50):.1f}ms p95={percentile(latencies, 95):.1f}ms "
+        f"p99={percentile(latencies, 99):.1f}ms max={max(latencies):.1f}ms"
+    )
+    for flow, values in sorted(harness.latencies.items()):
+        print(
+            f"  {flow:10} updates={len(values):6} p50={percentile(values, 50):.1f}ms "
+            f"p95={percentile(values, 95):.1f}ms p99={percentile(values, 99):.1f}ms"
+        )
+
+    db_calls = database.backend.calls
+    print(f"db calls     {sum(db_calls.values()) / count:.2f}/update")
+    for name, calls in db_calls.most_common():
+        print(f"  {name:24} {calls / count:.2f}/update")
+
+    api_calls = harness.api.calls
+    print(f"bot api      {sum(api_calls.values()) / count:.2f} calls/update")
+    for name, calls in api_calls.most_common():
+        print(f"  {name:24} {calls / count:.2f}/update")
+
+    if harness.errors:
+        print(f"errors       {dict(harness.errors)}")
+    if harness.stalled:
+        print(f"stalled      {dict(harness.stalled)} (expected button was not sent)")
+
+
+async def run(args):
+    api = fake_telegram.FakeBotAPI()
+    await api.start()
+
+    path = None
+    if args.storage == 'sqlite':
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        os.environ['SQLITE_PATH'] = path
+    database.backend = CountingStorage(storage.create(args.storage))
+    if not args.rate_limits:
+        lift_rate_limits()
+    profiling.profiler.sample_rate = args.profile
+
+    application = bot.build_application(BENCH_TOKEN, base_url=api.base_url)
+    harness = Harness(application, api)
+    application.add_error_handler(harness.on_error)
+
+    await application.initialize()
+    await application.start()
+    try:
+        rng = random.Random(args.seed)
+        users = [VirtualUser(harness, BENCH_USER_BASE + i, random.Random(rng.random())) for i in range(args.users)]
+
+        # נתונים התחלתיים - לא נכנסים למדידה
+        for user in users:
+            await user.text('start', '/start')
+            for _ in range(args.items):
+                database.add_item(user.user_id, 'thought', user.content(), user.rng.sample(TAGS, 1))
+        harness.reset()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user.run(args.flows) for user in users))
+        report(harness, time.perf_counter() - started)
+        if args.profile:
+            print(f"profile      {await profiling.profiler.dump()}")
+    finally:
+        await application.stop()
+        await application.shutdown()
+        await bot.post_shutdown(application)
+        await api.stop()
+        async_database.shutdown()
+        database.backend.close()
+        if path:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--flows', type=int, default=20, help='flows per user')
+    parser.add_argument('--items', type=int, default=20, help='items seeded per user')
+    parser.add_argument('--storage', choices=['memory', 'sqlite'], default='memory')
+    parser.add_argument('--rate-limits', action='store_true', help='keep the outbox rate limits')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--profile', type=float, default=0, metavar='RATE',
+                        help='profile this fraction of updates and write a report to PROFILE_DIR')
+    args = parser.parse_args()
+
+    # הלוגים של כל בקשת HTTP מסתירים את התוצאות
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+bench_search.py - Indexed search vs. the old $regex scan
+
+Seeds a synthetic user with N items (default 100k) and compares the
+latency of database.search_items against the previous unanchored,
+case-insensitive $regex query. With the default SEARCH_INDEX_MAX_ITEMS
+a 100k-item user is served from the search_terms index in MongoDB; pass
+--items below that limit to measure the in-memory index instead.
+
+Requires a reachable MongoDB (MONGODB_URI, STORAGE_BACKEND=mongo - the
+default). Run from the repo root:
+    python -m benchmarks.bench_search --items 100000
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import database
+import search
+from storage import mongo
+
+BENCH_USER_ID = 900_000_001
+
+WORDS = [
+    'עבודה', 'פגישה', 'רעיון', 'קניות', 'ספר', 'פרויקט', 'משפחה', 'טיול',
+    'meeting', 'project', 'idea', 'budget', 'release', 'design', 'review',
+]
+TAGS = ['עבודה', 'בית', 'רעיון', 'work', 'home', 'ideas']
+QUERIES = ['פגישה', 'פרויק', 'budget', 'rev', 'רעיון טיול', 'a.b(c']
+
+
+def regex_search(user_id, query):
+    """החיפוש הישן - $regex לא מעוגן (לצורך השוואה בלבד)"""
+    query = re.escape(query)  # הגרסה הישנה לא הגנה על הקלט; כאן רק כדי שלא תיכשל
+    return list(mongo.items_collection.find({
+        'user_id': user_id,
+        'status': {'$ne': 'deleted'},
+        '$or': [
+            {'content': {'$regex': query, '$options': 'i'}},
+            {'tags': {'$regex': query, '$options': 'i'}}
+        ]
+    }).sort('created_at', -1).limit(30))
+
+
+def seed(count):
+    """יוצר משתמש סינתטי עם count פריטים"""
+    rng = random.Random(42)
+    now = datetime.now()
+    batch = []
+    for n in range(count):
+        content = ' '.join(rng.choices(WORDS, k=8))
+        tags = rng.sample(TAGS, k=rng.randint(0, 2))
+        batch.append({
+            'user_id': BENCH_USER_ID,
+            'type': 'thought',
+            'content': content,
+            'tags': tags,
+            'search_terms': search.item_terms(content, tags),
+            'search_v': search.TERMS_VERSION,
+            'status': rng.choice(['active', 'active', 'archived']),
+            'created_at': now - timedelta(minutes=n),
+            'keep_until': None
+        })
+        if len(batch) == 5000:
+            mongo.items_collection.insert_many(batch)
+            batch = []
+    if batch:
+        mongo.items_collection.insert_many(batch)
+
+
+def measure(func, repeat):
+    """מחזיר רשימת זמני ריצה (ms) לכל השאילתות"""
+    latencies = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            func(BENCH_USER_ID, query)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    seed(args.items)
+    try:
+        for name, func in (('regex scan', regex_search), ('indexed', database.search_items)):
+            latencies = sorted(measure(func, args.repeat))
+            print(
+                f"{name:10} items={args.items} "
+                f"p50={latencies[len(latencies) // 2]:.1f}ms "
+                f"max={latencies[-1]:.1f}ms "
+                f"mean={statistics.mean(latencies):.1f}ms"
+            )
+    finally:
+        mongo.items_collection.delete_many({'user_id': BENCH_USER_ID})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+bench_startup.py - Cold-start time: lazy connection vs. eager init
+
+Each measurement runs in a fresh interpreter, so module caches and the
+connection pool start empty. "lazy" is what happens now on startup:
+importing database and bot (no connection, no index builds). "eager"
+reproduces the old behaviour: the same imports followed by connecting to
+MongoDB and running the index migration, as the old import-time code did.
+
+The lazy numbers do not need MongoDB; the eager ones need MONGODB_URI to
+point at a reachable server. Run from the repo root:
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+SNIPPETS = {
+    'import database (lazy)': "import database",
+    'import bot (lazy)': "import bot",
+    'import bot + connect + indexes (eager)': (
+        "import bot, database\n"
+        "database.backend.create_indexes()"
+    ),
+}
+
+TIMER = """
+import time
+_started = time.perf_counter()
+{code}
+print(time.perf_counter() - _started)
+"""
+
+
+def measure(code, runs):
+    """מריץ את הקוד בתהליך חדש runs פעמים ומחזיר זמנים במילישניות"""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-c', TIMER.format(code=code)],
+            capture_output=True, text=True
+        )
+        if result.returncode:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        timings.append(float(result.stdout.strip().splitlines()[-1]) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, code in SNIPPETS.items():
+        try:
+            timings = measure(code, args.runs)
+        except RuntimeError as e:
+            print(f"{name:42} skipped ({str(e)[:80]})")
+            continue
+        print(
+            f"{name:42} median {statistics.median(timings):8.1f} ms   "
+            f"max {max(timings):8.1f} ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
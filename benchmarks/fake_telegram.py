@@ -0,0 +1,188 @@
+"""
+fake_telegram.py - A local stand-in for the Telegram Bot API
+
+FakeBotAPI is an aiohttp server that answers the Bot API methods the bot
+uses and records every call, so a real Application can be pointed at it
+with base_url and driven without network access or a bot token. It keeps
+the last inline keyboard shown in every chat, which lets a simulated user
+"press" the buttons the bot actually sent.
+
+UpdateFactory builds the JSON of incoming updates (text messages and
+callback queries, which carry the keyboard of the pressed message), the
+way Telegram would deliver them.
+"""
+import itertools
+import json
+import time
+from collections import Counter
+
+from aiohttp import web
+
+BOT_USER = {'id': 100000, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+class FakeBotAPI:
+    """שרת Bot API מדומה שמתעד את כל הקריאות"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.calls = Counter()        # method -> מספר קריאות
+        self.keyboards = {}           # chat_id -> (message_id, inline_keyboard)
+        self._message_ids = itertools.count(1)
+        self._runner = None
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        # port=0 - הפורט שמערכת ההפעלה בחרה
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def reset(self):
+        self.calls.clear()
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        if request.content_type == 'application/json':
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        self.calls[method] += 1
+
+        handler = getattr(self, f"_{method}", None)
+        if handler is None:
+            return _ok(True)
+        return handler(params)
+
+    # Bot API methods
+
+    def _getMe(self, params):
+        return _ok({**BOT_USER, 'can_join_groups': False, 'can_read_all_group_messages': False,
+                    'supports_inline_queries': False})
+
+    def _sendMessage(self, params):
+        chat_id = int(params['chat_id'])
+        message = self._message(chat_id, next(self._message_ids), params)
+        self._remember_keyboard(chat_id, message)
+        return _ok(message)
+
+    def _editMessageText(self, params):
+        markup = _json_param(params.get('reply_markup'))
+        if markup and 'inline_keyboard' not in markup:
+            # כמו טלגרם: בעריכת הודעה אפשר לצרף רק מקלדת inline
+            return _error(400, 'Bad Request: inline keyboard expected')
+        chat_id = int(params['chat_id'])
+        message = self._message(chat_id, int(params['message_id']), params)
+        self._remember_keyboard(chat_id, message)
+        return _ok(message)
+
+    def _editMessageReplyMarkup(self, params):
+        chat_id = int(params['chat_id'])
+        message = self._message(chat_id, int(params['message_id']), params)
+        self._remember_keyboard(chat_id, message)
+        return _ok(message)
+
+    def _message(self, chat_id, message_id, params):
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': params.get('text', ''),
+        }
+        markup = _json_param(params.get('reply_markup'))
+        if markup and 'inline_keyboard' in markup:
+            message['reply_markup'] = markup
+        return message
+
+    def _remember_keyboard(self, chat_id, message):
+        keyboard = message.get('reply_markup', {}).get('inline_keyboard')
+        if keyboard:
+            self.keyboards[chat_id] = (message['message_id'], keyboard)
+        elif self.keyboards.get(chat_id, (None,))[0] == message['message_id']:
+            # ההודעה עם המקלדת נערכה בלי מקלדת
+            del self.keyboards[chat_id]
+
+    def buttons(self, chat_id):
+        """(message_id, [callback_data]) של המקלדת האחרונה בצ'אט"""
+        message_id, keyboard = self.keyboard(chat_id)
+        return message_id, [
+            button['callback_data']
+            for row in keyboard for button in row if 'callback_data' in button
+        ]
+
+    def keyboard(self, chat_id):
+        """(message_id, inline_keyboard) של המקלדת האחרונה בצ'אט"""
+        return self.keyboards.get(chat_id, (None, []))
+
+
+class UpdateFactory:
+    """בונה עדכונים נכנסים (JSON) כמו שטלגרם שולח אותם"""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+        self._query_ids = itertools.count(1)
+
+    def message(self, user_id, text):
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': _user(user_id),
+            'text': text,
+        }
+        if text.startswith('/'):
+            command = text.split()[0]
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(command)}]
+        return {'update_id': next(self._update_ids), 'message': message}
+
+    def callback(self, user_id, message_id, data, keyboard=None):
+        message = {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': '',
+        }
+        if keyboard:
+            message['reply_markup'] = {'inline_keyboard': keyboard}
+        return {
+            'update_id': next(self._update_ids),
+            'callback_query': {
+                'id': str(next(self._query_ids)),
+                'from': _user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': message,
+            },
+        }
+
+
+def _user(user_id):
+    return {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}'}
+
+
+def _json_param(value):
+    if isinstance(value, str):
+        return json.loads(value)
+    return value
+
+
+def _ok(result):
+    return web.json_response({'ok': True, 'result': result})
+
+
+def _error(code, description):
+    return web.json_response({'ok': False, 'error_code': code, 'description': description}, status=code)
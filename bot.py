@@ -2,8 +2,9 @@
 bot.py - Main Telegram Bot
 """
 import os
+import sys
+import asyncio
 import logging
-from datetime import datetime
 from dotenv import load_dotenv
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import (
@@ -11,8 +12,21 @@ from telegram.ext import (
     CallbackQueryHandler, ContextTypes, filters, ConversationHandler
 )
 
-import database as db
+# לפני המודולים שלנו - חלקם קוראים הגדרות מהסביבה בזמן import
+load_dotenv()
+
+import async_database as db
+import database
+import leader
+import metrics
+import outbox
+import profiling
+import reminders
+import review
+import tiering
+import update_processor
 import utils
+import webhook
 
 # הגדרת לוגים
 logging.basicConfig(
@@ -21,7 +35,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-load_dotenv()
+# polling (ברירת מחדל) או webhook. גם ב-webhook - replica אחד: ה-state של השיחות, context.user_data
+# (חיפוש, תגית, בחירה מרובה) והסיקורים הפתוחים (review._sessions) נמצאים בזיכרון של התהליך
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
 
 # States לשיחות
 ADD_CONTENT, ADD_REMINDER, EDIT_CONTENT, SEARCH_QUERY, CUSTOM_DATE = range(5)
@@ -30,14 +46,84 @@ ADD_CONTENT, ADD_REMINDER, EDIT_CONTENT, SEARCH_QUERY, CUSTOM_DATE = range(5)
 MAIN_KEYBOARD = ReplyKeyboardMarkup([
     ['➕ הוסף', '📅 היום'],
     ['📆 השבוע', '📦 ארכיון'],
-    ['🔍 חיפוש', '📋 סיקור']
+    ['🔍 חיפוש', '📋 סיקור'],
+    ['🏷️ תגיות']
 ], resize_keyboard=True)
 
+# עימוד רשימות
+PAGE_SIZE = 5
+PREVIEW_CHARS = 400
+
+# כמה תגיות מוצגות ב"🏷️ תגיות"
+TOP_TAGS = 12
+
+# קוד קצר לכל תצוגה (נכנס ל-callback_data, שמוגבל ל-64 בתים)
+VIEW_CODES = {
+    'today': 't', 'week': 'w', 'archive': 'a', 'search': 's', 'tag': 'g', 'old': 'o', 'oldsearch': 'x'
+}
+VIEW_BY_CODE = {code: view for view, code in VIEW_CODES.items()}
+
+VIEW_TITLES = {
+    'today': "📅 היום",
+    'week': "📆 השבוע",
+    'archive': "📦 ארכיון",
+    'search': "🔍 תוצאות חיפוש",
+    'tag': "🏷️ תגית",
+    'old': "🗄️ ארכיון ישן",
+    'oldsearch': "🗄️ תוצאות בארכיון הישן"
+}
+
+# בעמוד האחרון של ארכיון / חיפוש - כפתור להמשך בפריטים שהועברו ל-cold
+COLD_VIEWS = {
+    'archive': ('old', "🗄️ ארכיון ישן"),
+    'search': ('oldsearch', "🗄️ חפש בארכיון הישן")
+}
+
+# בחירה מרובה: הפעולות שאפשר להחיל בכל תצוגה (בלי בחירה בתצוגות של ה-cold)
+VIEW_BULK_ACTIONS = {
+    'today': ('archive', 'keep', 'delete'),
+    'week': ('archive', 'keep', 'delete'),
+    'archive': ('unarchive', 'delete'),
+    'search': ('archive', 'unarchive', 'delete'),
+    'tag': ('archive', 'unarchive', 'delete')
+}
+
+BULK_BUTTONS = {
+    'archive': "📦 ארכיון",
+    'unarchive': "🔄 לפעיל",
+    'keep': "♻️ לשבוע הבא",
+    'delete': "🗑️ מחק"
+}
+
+BULK_PROMPTS = {
+    'archive': "להעביר לארכיון",
+    'unarchive': "להחזיר לפעיל",
+    'keep': "לשמור לשבוע הבא",
+    'delete': "למחוק"
+}
+
+BULK_DONE = {
+    'archive': "הועברו לארכיון 📦",
+    'unarchive': "הוחזרו לפעיל 🔄",
+    'keep': "נשמרו לשבוע הבא ♻️",
+    'delete': "נמחקו 🗑️"
+}
+
+EMPTY_MESSAGES = {
+    'today': "אין פריטים מהיום 📅",
+    'week': "אין פריטים מהשבוע 📆",
+    'archive': "הארכיון ריק 📦",
+    'search': "אין עוד תוצאות 🔍",
+    'tag': "אין עוד פריטים עם התגית 🏷️",
+    'old': "אין פריטים בארכיון הישן 🗄️",
+    'oldsearch': "אין תוצאות בארכיון הישן 🗄️"
+}
+
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """פקודת /start"""
     user_id = update.effective_user.id
-    db.get_or_create_user(user_id)
+    await db.get_or_create_user(user_id)
     
     welcome_message = """
 ברוך הבא לבוט ריקון מחשבות! 🧠
@@ -54,7 +140,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 בהצלחה! 🚀
     """
     
-    await update.message.reply_text(welcome_message, reply_markup=MAIN_KEYBOARD)
+    await outbox.reply_text(update.message, welcome_message, reply_markup=MAIN_KEYBOARD)
 
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -69,9 +155,13 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 • היום - פריטים שנוספו היום
 • השבוע - כל הפריטים מ-7 הימים האחרונים
 • ארכיון - פריטים ישנים שארכבת
+• ארכיון ישן - פריטים שארכבת מזמן, בסוף הארכיון
 
 🔍 *חיפוש:*
-חפש לפי מילות מפתח או תגיות
+חפש לפי מילות מפתח או תגיות. בסוף התוצאות אפשר לחפש גם בארכיון הישן
+
+🏷️ *תגיות:*
+התגיות הנפוצות שלך - לחץ על תגית כדי לראות את הפריטים שלה
 
 📋 *סיקור שבועי:*
 הבוט יזכיר לך אוטומטית לעשות סיקור כל שבוע.
@@ -83,48 +173,86 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 ✏️ *עריכה:*
 לחץ על הכפתורים ליד כל פריט
 
+☑️ *בחירה מרובה:*
+ברשימה לחץ "בחירה", סמן כמה פריטים ובחר פעולה לכולם
+
 ---
 /start - התחל מחדש
 /help - מדריך זה
     """
     
-    await update.message.reply_text(help_text, parse_mode='Markdown')
+    await outbox.reply_text(update.message, help_text, parse_mode='Markdown')
 
 
-async def check_reminders_and_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """בודק תזכורות וצורך בסיקור"""
-    user_id = update.effective_user.id
-    
-    # בדיקת תזכורות
-    reminders = db.get_pending_reminders(user_id)
-    for item in reminders:
-        reminder_text = f"🔔 *תזכורת!*\n\n{utils.format_item(item)}"
-        keyboard = get_item_keyboard(str(item['_id']))
-        await context.bot.send_message(
-            chat_id=user_id,
-            text=reminder_text,
-            reply_markup=keyboard,
-            parse_mode='Markdown'
-        )
-        db.mark_reminder_sent(str(item['_id']))
+async def send_reminder(bot, item):
+    """שליחת תזכורת למשתמש (נקרא מה-ReminderScheduler)"""
+    reminder_text = f"🔔 *תזכורת!*\n\n{utils.format_item(item)}"
+    keyboard = get_item_keyboard(str(item['_id']))
+    await outbox.send_message(
+        bot,
+        chat_id=item['user_id'],
+        text=reminder_text,
+        reply_markup=keyboard,
+        parse_mode='Markdown'
+    )
+
+
+async def log_stats(context: ContextTypes.DEFAULT_TYPE):
+    """לוג תקופתי של מדדי תור השליחה, עיבוד העדכונים וה-handlers"""
+    logger.info("Outbox stats: %s", outbox.stats())
+    logger.info("Update processor stats: %s", context.application.update_processor.stats())
+    logger.info("Metrics: %s", metrics.summary())
+
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פקודת /profile [on [rate] | off | dump] - דגימת ביצועים, למנהלים בלבד"""
+    if update.effective_user.id not in profiling.ADMIN_IDS:
+        return
+    profiler = profiling.profiler
+    action = context.args[0] if context.args else 'status'
+    
+    if action == 'on':
+        try:
+            rate = float(context.args[1]) if len(context.args) > 1 else 0.01
+        except ValueError:
+            rate = 0
+        if not 0 < rate <= 1:
+            await outbox.reply_text(update.message, "שיעור דגימה צריך להיות בין 0 ל-1")
+            return
+        profiler.sample_rate = rate
+        text = f"🔬 דגימה פעילה: {rate:.0%} מהעדכונים"
+    elif action == 'off':
+        profiler.sample_rate = 0
+        path = await profiler.dump()
+        text = "דגימה כבויה" + (f"\nדוח אחרון: {path}" if path else "")
+    elif action == 'dump':
+        path = await profiler.dump()
+        text = f"📄 {path}" if path else "אין דגימות בחלון הנוכחי"
+    else:
+        text = f"🔬 {profiler.status()}"
     
-    # בדיקת צורך בסיקור
-    if db.should_review(user_id):
-        keyboard = InlineKeyboardMarkup([[
-            InlineKeyboardButton("בוא נתחיל ✅", callback_data="start_review"),
-            InlineKeyboardButton("אחר כך ⏰", callback_data="skip_review")
-        ]])
-        
-        await context.bot.send_message(
-            chat_id=user_id,
-            text="היי! עבר שבוע מאז הסיקור האחרון 📋\n\nרוצה לעשות סיקור של הפריטים?",
-            reply_markup=keyboard
-        )
+    await outbox.reply_text(update.message, text)
+
+
+async def send_review_prompt(bot, user_id):
+    """הצעה לסיקור שבועי"""
+    keyboard = InlineKeyboardMarkup([[
+        InlineKeyboardButton("בוא נתחיל ✅", callback_data="start_review"),
+        InlineKeyboardButton("אחר כך ⏰", callback_data="skip_review")
+    ]])
+    
+    await outbox.send_message(
+        bot,
+        chat_id=user_id,
+        text="היי! עבר שבוע מאז הסיקור האחרון 📋\n\nרוצה לעשות סיקור של הפריטים?",
+        reply_markup=keyboard
+    )
 
 
 async def add_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """התחלת תהליך הוספת פריט"""
-    await update.message.reply_text(
+    await outbox.reply_text(
+        update.message,
         "מה תרצה להוסיף? 💭\n\n"
         "שלח את התוכן, ותוכל להוסיף תגיות עם # (לדוגמה: #עבודה #רעיון)\n\n"
         "שלח /cancel לביטול"
@@ -137,7 +265,7 @@ async def receive_content(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
     
     if text == '/cancel':
-        await update.message.reply_text("בוטל ✖️", reply_markup=MAIN_KEYBOARD)
+        await outbox.reply_text(update.message, "בוטל ✖️", reply_markup=MAIN_KEYBOARD)
         return ConversationHandler.END
     
     # חילוץ תגיות
@@ -160,7 +288,8 @@ async def receive_content(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     tags_text = f"\nתגיות: {', '.join(['#' + t for t in tags])}" if tags else ""
     
-    await update.message.reply_text(
+    await outbox.reply_text(
+        update.message,
         f"מעולה! קיבלתי:\n\n{content}{tags_text}\n\nזו מחשבה או משימה?",
         reply_markup=keyboard
     )
@@ -185,7 +314,8 @@ async def set_item_type(update: Update, context: ContextTypes.DEFAULT_TYPE):
         [InlineKeyboardButton("ללא תזכורת ✖️", callback_data="reminder_none")]
     ])
     
-    await query.edit_message_text(
+    await outbox.edit_message_text(
+        query,
         "האם להוסיף תזכורת? ⏰",
         reply_markup=keyboard
     )
@@ -202,7 +332,7 @@ async def set_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
     # הוספת הפריט
-    item_id = db.add_item(
+    item_id = await db.add_item(
         user_id,
         item_data['type'],
         item_data['content'],
@@ -211,13 +341,14 @@ async def set_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # טיפול בתזכורת
     if 'none' in query.data:
-        await query.edit_message_text(
-            f"נשמר בהצלחה! ✅\n\n{utils.format_item(db.get_item_by_id(item_id))}",
-            reply_markup=MAIN_KEYBOARD
+        await outbox.edit_message_text(
+            query,
+            f"נשמר בהצלחה! ✅\n\n{utils.format_item(await db.get_item_by_id(item_id))}"
         )
     elif 'custom' in query.data:
         context.user_data['pending_item_id'] = item_id
-        await query.edit_message_text(
+        await outbox.edit_message_text(
+            query,
             "שלח תאריך בפורמט dd/mm/yyyy או dd/mm\n"
             "לדוגמה: 25/12 או 25/12/2024\n\n"
             "שלח /cancel לביטול"
@@ -227,12 +358,13 @@ async def set_reminder(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # תזכורת מהירה
         option = query.data.split('_')[1]
         reminder_date = utils.get_reminder_date(option)
-        db.set_reminder(item_id, reminder_date)
+        await db.set_reminder(item_id, reminder_date)
+        context.bot_data['reminders'].schedule(item_id, user_id, reminder_date)
         
-        await query.edit_message_text(
+        await outbox.edit_message_text(
+            query,
             f"נשמר עם תזכורת! ✅⏰\n\n"
-            f"{utils.format_item(db.get_item_by_id(item_id))}",
-            reply_markup=MAIN_KEYBOARD
+            f"{utils.format_item(await db.get_item_by_id(item_id))}"
         )
     
     # ניקוי קונטקסט
@@ -245,14 +377,15 @@ async def receive_custom_date(update: Update, context: ContextTypes.DEFAULT_TYPE
     text = update.message.text
     
     if text == '/cancel':
-        await update.message.reply_text("בוטל ✖️", reply_markup=MAIN_KEYBOARD)
+        await outbox.reply_text(update.message, "בוטל ✖️", reply_markup=MAIN_KEYBOARD)
         context.user_data.clear()
         return ConversationHandler.END
     
     date = utils.validate_date_input(text)
     
     if not date:
-        await update.message.reply_text(
+        await outbox.reply_text(
+            update.message,
             "תאריך לא תקין ❌\n\n"
             "נסה שוב בפורמט: dd/mm/yyyy או dd/mm\n"
             "או שלח /cancel לביטול"
@@ -260,11 +393,13 @@ async def receive_custom_date(update: Update, context: ContextTypes.DEFAULT_TYPE
         return CUSTOM_DATE
     
     item_id = context.user_data['pending_item_id']
-    db.set_reminder(item_id, date)
+    await db.set_reminder(item_id, date)
+    context.bot_data['reminders'].schedule(item_id, update.effective_user.id, date)
     
-    await update.message.reply_text(
+    await outbox.reply_text(
+        update.message,
         f"נשמר עם תזכורת! ✅⏰\n\n"
-        f"{utils.format_item(db.get_item_by_id(item_id))}",
+        f"{utils.format_item(await db.get_item_by_id(item_id))}",
         reply_markup=MAIN_KEYBOARD
     )
     
@@ -272,72 +407,56 @@ async def receive_custom_date(update: Update, context: ContextTypes.DEFAULT_TYPE
     return ConversationHandler.END
 
 
-async def show_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """הצגת פריטים מהיום"""
-    user_id = update.effective_user.id
-    
-    # בדיקת תזכורות וסיקור
-    await check_reminders_and_review(update, context)
-    
-    items = db.get_items_today(user_id)
-    
+async def reply_first_page(update: Update, view, items, has_next):
+    """שליחת העמוד הראשון של תצוגת רשימה - הודעה אחת לכל עמוד"""
     if not items:
-        await update.message.reply_text("אין פריטים מהיום 📅", reply_markup=MAIN_KEYBOARD)
+        await outbox.reply_text(update.message, EMPTY_MESSAGES[view], reply_markup=MAIN_KEYBOARD)
         return
     
-    for item in items:
-        keyboard = get_item_keyboard(str(item['_id']))
-        await update.message.reply_text(
-            utils.format_item(item),
-            reply_markup=keyboard
-        )
+    await outbox.reply_text(
+        update.message,
+        format_page(view, items, 1),
+        reply_markup=get_page_keyboard(view, items, 1, False, has_next)
+    )
 
 
-async def show_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """הצגת פריטים מהשבוע"""
+async def send_home(update: Update, context: ContextTypes.DEFAULT_TYPE, view):
+    """היום / השבוע: דגל הסיקור והפריטים מגיעים משאילתה אחת"""
     user_id = update.effective_user.id
+    snapshot = await db.get_home_snapshot(user_id, view, limit=PAGE_SIZE)
     
-    # בדיקת תזכורות וסיקור
-    await check_reminders_and_review(update, context)
-    
-    items = db.get_items_week(user_id)
-    
-    if not items:
-        await update.message.reply_text("אין פריטים מהשבוע 📆", reply_markup=MAIN_KEYBOARD)
-        return
+    if snapshot['review']:
+        await send_review_prompt(context.bot, user_id)
     
-    await update.message.reply_text(f"נמצאו {len(items)} פריטים מהשבוע האחרון 📆")
-    
-    for item in items:
-        keyboard = get_item_keyboard(str(item['_id']))
-        await update.message.reply_text(
-            utils.format_item(item),
-            reply_markup=keyboard
-        )
+    await reply_first_page(update, view, snapshot['items'], snapshot['has_next'])
+
+
+async def show_today(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """הצגת פריטים מהיום"""
+    await send_home(update, context, 'today')
+
+
+async def show_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """הצגת פריטים מהשבוע"""
+    await send_home(update, context, 'week')
 
 
 async def show_archive(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """הצגת ארכיון"""
+    """הצגת ארכיון (כשהוא ריק - הארכיון הישן)"""
     user_id = update.effective_user.id
-    items = db.get_archived_items(user_id)
-    
+    view = 'archive'
+    items, _, has_next = await db.get_items_page(user_id, view, limit=PAGE_SIZE)
     if not items:
-        await update.message.reply_text("הארכיון ריק 📦", reply_markup=MAIN_KEYBOARD)
-        return
-    
-    await update.message.reply_text(f"הארכיון ({len(items)} פריטים) 📦")
-    
-    for item in items:
-        keyboard = get_item_keyboard(str(item['_id']), is_archived=True)
-        await update.message.reply_text(
-            utils.format_item(item),
-            reply_markup=keyboard
-        )
+        items, _, has_next = await db.get_items_page(user_id, 'old', limit=PAGE_SIZE)
+        if items:
+            view = 'old'
+    await reply_first_page(update, view if items else 'archive', items, has_next)
 
 
 async def search_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """התחלת חיפוש"""
-    await update.message.reply_text(
+    await outbox.reply_text(
+        update.message,
         "מה תרצה לחפש? 🔍\n\n"
         "שלח מילת מפתח או תגית\n"
         "שלח /cancel לביטול"
@@ -350,29 +469,319 @@ async def search_execute(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.message.text
     
     if query == '/cancel':
-        await update.message.reply_text("בוטל ✖️", reply_markup=MAIN_KEYBOARD)
+        await outbox.reply_text(update.message, "בוטל ✖️", reply_markup=MAIN_KEYBOARD)
         return ConversationHandler.END
     
     user_id = update.effective_user.id
-    items = db.search_items(user_id, query)
+    view = 'search'
+    items, _, has_next = await db.search_page(user_id, query, limit=PAGE_SIZE)
+    if not items:
+        # אין תוצאות בפריטים הפעילים - מחפשים גם בארכיון הישן
+        view = 'oldsearch'
+        items, _, has_next = await db.search_cold_page(user_id, query, limit=PAGE_SIZE)
     
     if not items:
-        await update.message.reply_text(
+        await outbox.reply_text(
+            update.message,
             f'לא נמצאו תוצאות עבור "{query}" 🤷‍♂️',
             reply_markup=MAIN_KEYBOARD
         )
         return ConversationHandler.END
     
-    await update.message.reply_text(f"נמצאו {len(items)} תוצאות 🔍")
+    # השאילתה נשמרת לניווט בין עמודי התוצאות
+    context.user_data['search_query'] = query
+    await outbox.reply_text(
+        update.message,
+        format_page(view, items, 1),
+        reply_markup=get_page_keyboard(view, items, 1, False, has_next)
+    )
     
-    for item in items:
-        keyboard = get_item_keyboard(str(item['_id']), item['status'] == 'archived')
-        await update.message.reply_text(
-            utils.format_item(item),
-            reply_markup=keyboard
+    return ConversationHandler.END
+
+
+async def show_tags(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """התגיות הנפוצות של המשתמש, כפתור לכל תגית"""
+    tags = await db.get_top_tags(update.effective_user.id, limit=TOP_TAGS)
+    # התגית עצמה ב-callback_data - תגית ארוכה מדי ל-64 בתים לא מוצגת
+    buttons = [
+        InlineKeyboardButton(f"#{tag} ({count})", callback_data=f"tag_{tag}")
+        for tag, count in tags
+        if len(f"tag_{tag}".encode()) <= 64
+    ]
+    if not buttons:
+        await outbox.reply_text(
+            update.message,
+            "אין עדיין תגיות 🏷️\n\nהוסף #תגית לפריט כדי לארגן אותו",
+            reply_markup=MAIN_KEYBOARD
         )
+        return
     
-    return ConversationHandler.END
+    rows = [buttons[i:i + 3] for i in range(0, len(buttons), 3)]
+    await outbox.reply_text(update.message, "🏷️ התגיות שלך:", reply_markup=InlineKeyboardMarkup(rows))
+
+
+async def open_tag(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """העמוד הראשון של הפריטים עם תגית - בהודעה חדשה, כך שרשימת התגיות נשארת"""
+    query = update.callback_query
+    await query.answer()
+    
+    tag = query.data.split('_', 1)[1]
+    items, _, has_next = await db.get_tag_page(query.from_user.id, tag, limit=PAGE_SIZE)
+    if not items:
+        await outbox.reply_text(query.message, f"אין פריטים עם #{tag} 🏷️")
+        return
+    
+    # התגית נשמרת לניווט בין העמודים, כמו שאילתת החיפוש
+    context.user_data['browse_tag'] = tag
+    await outbox.reply_text(
+        query.message,
+        format_page('tag', items, 1, tag_title(tag)),
+        reply_markup=get_page_keyboard('tag', items, 1, False, has_next)
+    )
+
+
+def tag_title(tag):
+    return f"🏷️ #{tag}"
+
+
+def format_page(view, items, page, title=None):
+    """טקסט של עמוד ברשימה (title - במקום הכותרת של התצוגה)"""
+    start = (page - 1) * PAGE_SIZE + 1
+    title = title or VIEW_TITLES[view]
+    return f"{title} · עמוד {page}\n\n{utils.format_items_list(items, start, PREVIEW_CHARS)}"
+
+
+def get_page_keyboard(view, items, page, has_prev, has_next, selected=None):
+    """יוצר מקלדת לעמוד: כפתור ממוספר לכל פריט + ניווט + בחירה מרובה
+
+    selected - ה-ids שסומנו כשההודעה במצב בחירה (None - מצב רגיל)
+    """
+    start = (page - 1) * PAGE_SIZE + 1
+    rows = [_item_row([(str(idx), str(item['_id'])) for idx, item in enumerate(items, start)], selected)]
+    
+    # ניווט keyset: הטוקן הוא המפתח של הפריט הראשון / האחרון בעמוד (בחיפוש - עם הציון)
+    code = VIEW_CODES[view]
+    nav = []
+    if has_prev:
+        cursor = utils.encode_cursor(items[0], items[0].get('score'))
+        nav.append(InlineKeyboardButton("▶️ הקודם", callback_data=f"pg_{code}_p_{page - 1}_{cursor}"))
+    if has_next:
+        cursor = utils.encode_cursor(items[-1], items[-1].get('score'))
+        nav.append(InlineKeyboardButton("הבא ◀️", callback_data=f"pg_{code}_n_{page + 1}_{cursor}"))
+    if nav:
+        rows.append(nav)
+    if not has_next and view in COLD_VIEWS:
+        cold_view, label = COLD_VIEWS[view]
+        rows.append([InlineKeyboardButton(label, callback_data=f"cold_{VIEW_CODES[cold_view]}")])
+    
+    rows.extend(_selection_rows(view, selected))
+    return InlineKeyboardMarkup(rows)
+
+
+def _item_row(entries, selected):
+    """כפתור לכל פריט [(מספר, item_id)]: פתיחה, או סימון במצב בחירה"""
+    if selected is None:
+        return [InlineKeyboardButton(idx, callback_data=f"open_{item_id}") for idx, item_id in entries]
+    return [
+        InlineKeyboardButton(f"✅ {idx}" if item_id in selected else idx, callback_data=f"tg_{item_id}")
+        for idx, item_id in entries
+    ]
+
+
+def _selection_rows(view, selected):
+    """כפתור כניסה לבחירה, או הפעולות על הפריטים שסומנו + יציאה"""
+    if view not in VIEW_BULK_ACTIONS:
+        return []
+    code = VIEW_CODES[view]
+    if selected is None:
+        return [[InlineKeyboardButton("☑️ בחירה", callback_data=f"sel_on_{code}")]]
+    count = f" ({len(selected)})" if selected else ""
+    return [
+        [
+            InlineKeyboardButton(f"{BULK_BUTTONS[action]}{count}", callback_data=f"bulk_{action}")
+            for action in VIEW_BULK_ACTIONS[view]
+        ],
+        [InlineKeyboardButton("✖️ סיום בחירה", callback_data=f"sel_off_{code}")]
+    ]
+
+
+def rebuild_page_keyboard(markup, view, selected):
+    """המקלדת של עמוד שכבר מוצג (מתוך ההודעה) במצב רגיל / בחירה, בלי לטעון שוב את הפריטים"""
+    rows = markup.inline_keyboard
+    # המספר של כל פריט הוא המילה האחרונה בכפתור שלו ("3" / "✅ 3")
+    entries = [(button.text.split()[-1], button.callback_data.split('_', 1)[1]) for button in rows[0]]
+    nav = [list(row) for row in rows[1:] if row[0].callback_data.startswith(('pg_', 'cold_'))]
+    return InlineKeyboardMarkup([_item_row(entries, selected), *nav, *_selection_rows(view, selected)])
+
+
+def get_selection(context, message):
+    """הבחירה המרובה של ההודעה (או None אם ההודעה לא במצב בחירה)"""
+    selection = context.user_data.get('selection')
+    if selection is None or selection['message_id'] != message.message_id:
+        return None
+    return selection
+
+
+async def handle_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """ניווט בין עמודים - עורך את אותה הודעה"""
+    query = update.callback_query
+    await query.answer()
+    
+    _, code, direction, page, cursor = query.data.split('_', 4)
+    view = VIEW_BY_CODE[code]
+    page = int(page)
+    user_id = query.from_user.id
+    cursor = utils.decode_cursor(cursor)
+    direction = 'next' if direction == 'n' else 'prev'
+    
+    title = None
+    if view in ('search', 'oldsearch'):
+        search_query = context.user_data.get('search_query')
+        # בחיפוש ה-cursor כולל את הציון; בארכיון הישן - רק (created_at, _id)
+        cursor_size = 3 if view == 'search' else 2
+        if not search_query or (cursor is not None and len(cursor) != cursor_size):
+            await outbox.edit_message_text(query, "החיפוש פג תוקף, חפש שוב 🔍")
+            return
+        page_func = db.search_page if view == 'search' else db.search_cold_page
+        items, has_prev, has_next = await page_func(
+            user_id, search_query, cursor=cursor, direction=direction, limit=PAGE_SIZE
+        )
+    elif view == 'tag':
+        tag = context.user_data.get('browse_tag')
+        if not tag:
+            await outbox.edit_message_text(query, "הרשימה פגה תוקף, פתח שוב את 🏷️ תגיות")
+            return
+        items, has_prev, has_next = await db.get_tag_page(
+            user_id, tag, cursor=cursor, direction=direction, limit=PAGE_SIZE
+        )
+        title = tag_title(tag)
+    else:
+        items, has_prev, has_next = await db.get_items_page(
+            user_id, view, cursor=cursor, direction=direction, limit=PAGE_SIZE
+        )
+    
+    if not items:
+        await outbox.edit_message_text(query, EMPTY_MESSAGES[view])
+        return
+    
+    # במצב בחירה - הסימונים נשמרים גם במעבר בין עמודים
+    selection = get_selection(context, query.message)
+    await outbox.edit_message_text(
+        query,
+        format_page(view, items, page, title),
+        reply_markup=get_page_keyboard(
+            view, items, page, has_prev, has_next, selection['ids'] if selection else None
+        )
+    )
+
+
+async def open_cold(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """העמוד הראשון של הארכיון הישן / החיפוש בו - בהודעה חדשה, כמו open_tag"""
+    query = update.callback_query
+    await query.answer()
+    
+    view = VIEW_BY_CODE[query.data.split('_', 1)[1]]
+    user_id = query.from_user.id
+    if view == 'oldsearch':
+        search_query = context.user_data.get('search_query')
+        if not search_query:
+            await outbox.reply_text(query.message, "החיפוש פג תוקף, חפש שוב 🔍")
+            return
+        items, _, has_next = await db.search_cold_page(user_id, search_query, limit=PAGE_SIZE)
+    else:
+        items, _, has_next = await db.get_items_page(user_id, view, limit=PAGE_SIZE)
+    
+    if not items:
+        await outbox.reply_text(query.message, EMPTY_MESSAGES[view])
+        return
+    await outbox.reply_text(
+        query.message,
+        format_page(view, items, 1),
+        reply_markup=get_page_keyboard(view, items, 1, False, has_next)
+    )
+
+
+async def handle_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """בחירה מרובה ברשימה: כניסה / יציאה וסימון פריטים - עורך רק את המקלדת"""
+    query = update.callback_query
+    message = query.message
+    selection = get_selection(context, message)
+    
+    if query.data.startswith('sel_'):
+        _, mode, code = query.data.split('_')
+        view = VIEW_BY_CODE[code]
+        if mode == 'on':
+            # בחירה אחת פעילה למשתמש - כניסה בהודעה אחרת מתחילה בחירה חדשה
+            selection = context.user_data['selection'] = {
+                'view': view, 'message_id': message.message_id, 'ids': set()
+            }
+            await query.answer("סמן פריטים ובחר פעולה")
+        else:
+            if selection is not None:
+                del context.user_data['selection']
+            selection = None
+            await query.answer()
+    else:
+        if selection is None:
+            await query.answer("הבחירה הסתיימה, לחץ שוב על ☑️ בחירה")
+            return
+        view = selection['view']
+        selection['ids'] ^= {query.data.split('_', 1)[1]}
+        await query.answer()
+    
+    if message.reply_markup is None:
+        return
+    await outbox.edit_message_reply_markup(
+        query, rebuild_page_keyboard(message.reply_markup, view, selection['ids'] if selection else None)
+    )
+
+
+async def handle_bulk_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פעולה על כל הפריטים שסומנו: הודעת אישור אחת ועדכון אחד ב-DB"""
+    query = update.callback_query
+    selection = get_selection(context, query.message)
+    
+    if selection is None:
+        await query.answer("הבחירה הסתיימה, לחץ שוב על ☑️ בחירה")
+        return
+    if not selection['ids']:
+        await query.answer("לא סומנו פריטים")
+        return
+    await query.answer()
+    
+    if query.data == 'bulkno':
+        del context.user_data['selection']
+        await outbox.edit_message_text(query, "בוטל ✖️")
+        return
+    
+    step, action = query.data.split('_', 1)
+    if step == 'bulk':
+        keyboard = InlineKeyboardMarkup([[
+            InlineKeyboardButton("✅ אישור", callback_data=f"bulkok_{action}"),
+            InlineKeyboardButton("✖️ ביטול", callback_data="bulkno")
+        ]])
+        await outbox.edit_message_text(
+            query, f"{BULK_PROMPTS[action]} {len(selection['ids'])} פריטים?", reply_markup=keyboard
+        )
+        return
+    
+    del context.user_data['selection']
+    count = await db.apply_bulk_action(query.from_user.id, selection['ids'], action)
+    await outbox.edit_message_text(query, f"{count} פריטים {BULK_DONE[action]}")
+
+
+async def open_item(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """פתיחת פריט מרשימה עם כפתורי הפעולה שלו"""
+    query = update.callback_query
+    await query.answer()
+    
+    item = await db.get_item_by_id(query.data.split('_', 1)[1])
+    if not item or item['user_id'] != query.from_user.id or item['status'] == 'deleted':
+        await outbox.reply_text(query.message, "הפריט לא נמצא 🤷‍♂️")
+        return
+    
+    keyboard = get_item_keyboard(str(item['_id']), item['status'] == 'archived')
+    await outbox.reply_text(query.message, utils.format_item(item), reply_markup=keyboard)
 
 
 def get_item_keyboard(item_id, is_archived=False):
@@ -398,20 +807,21 @@ async def handle_item_action(update: Update, context: ContextTypes.DEFAULT_TYPE)
     action, item_id = query.data.split('_', 1)
     
     if action == 'archive':
-        db.update_item_status(item_id, 'archived')
-        await query.edit_message_text("הועבר לארכיון 📦")
+        await db.update_item_status(item_id, 'archived')
+        await outbox.edit_message_text(query, "הועבר לארכיון 📦")
     
     elif action == 'unarchive':
-        db.update_item_status(item_id, 'active')
-        await query.edit_message_text("הוחזר לפעיל 🔄")
+        await db.update_item_status(item_id, 'active')
+        await outbox.edit_message_text(query, "הוחזר לפעיל 🔄")
     
     elif action == 'delete':
-        db.update_item_status(item_id, 'deleted')
-        await query.edit_message_text("נמחק 🗑️")
+        await db.update_item_status(item_id, 'deleted')
+        await outbox.edit_message_text(query, "נמחק 🗑️")
     
     elif action == 'edit':
         context.user_data['edit_item_id'] = item_id
-        await query.edit_message_text(
+        await outbox.edit_message_text(
+            query,
             "שלח את התוכן החדש:\n\n"
             "שלח /cancel לביטול"
         )
@@ -423,17 +833,19 @@ async def receive_edit(update: Update, context: ContextTypes.DEFAULT_TYPE):
     text = update.message.text
     
     if text == '/cancel':
-        await update.message.reply_text("בוטל ✖️", reply_markup=MAIN_KEYBOARD)
+        await outbox.reply_text(update.message, "בוטל ✖️", reply_markup=MAIN_KEYBOARD)
         context.user_data.clear()
         return ConversationHandler.END
     
     content, tags = utils.extract_tags(text)
     item_id = context.user_data['edit_item_id']
     
-    db.update_item_content(item_id, content)
+    # תגיות בטקסט החדש מחליפות את הקיימות; בלי תגיות - הקיימות נשארות
+    await db.update_item_content(item_id, content, tags or None)
     
-    await update.message.reply_text(
-        f"עודכן בהצלחה! ✅\n\n{utils.format_item(db.get_item_by_id(item_id))}",
+    await outbox.reply_text(
+        update.message,
+        f"עודכן בהצלחה! ✅\n\n{utils.format_item(await db.get_item_by_id(item_id))}",
         reply_markup=MAIN_KEYBOARD
     )
     
@@ -451,20 +863,19 @@ async def start_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         user_id = update.effective_user.id
     
-    items = db.get_items_for_review(user_id)
+    items = await db.get_items_for_review(user_id, limit=review.REVIEW_MAX_ITEMS)
     
     if not items:
         message = "אין פריטים לסיקור! 🎉"
         if query:
-            await query.edit_message_text(message)
+            await outbox.edit_message_text(query, message)
         else:
-            await update.message.reply_text(message, reply_markup=MAIN_KEYBOARD)
-        db.update_last_review(user_id)
+            await outbox.reply_text(update.message, message, reply_markup=MAIN_KEYBOARD)
+        await db.update_last_review(user_id)
         return
     
-    # שמירה בקונטקסט
-    context.user_data['review_items'] = [str(item['_id']) for item in items]
-    context.user_data['review_index'] = 0
+    # הפריטים עצמם נשמרים בסשן - אין טעינה חוזרת לכל פריט
+    await review.start_session(user_id, items)
     
     # הצגת הפריט הראשון
     await show_review_item(update, context, query)
@@ -472,23 +883,27 @@ async def start_review(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def show_review_item(update: Update, context: ContextTypes.DEFAULT_TYPE, query=None):
     """הצגת פריט בסיקור"""
-    items_ids = context.user_data['review_items']
-    index = context.user_data['review_index']
+    user_id = update.effective_user.id
+    session = review.get_session(user_id)
+    
+    if session is None:
+        await outbox.edit_message_text(query, "הסיקור הזה כבר הסתיים. אפשר להתחיל חדש עם 📋 סיקור")
+        return
+    
+    item = session.current()
     
-    if index >= len(items_ids):
-        # סיום הסיקור
-        message = f"סיימת את הסיקור! ✅\n\nעברת על {len(items_ids)} פריטים."
+    if item is None:
+        # סיום הסיקור - כתיבת ההחלטות שנשארו
+        await review.finish_session(session)
+        message = f"סיימת את הסיקור! ✅\n\nעברת על {session.position} פריטים."
         if query:
-            await query.edit_message_text(message)
+            await outbox.edit_message_text(query, message)
         else:
-            await update.callback_query.edit_message_text(message)
+            await outbox.reply_text(update.message, message, reply_markup=MAIN_KEYBOARD)
         
-        db.update_last_review(update.effective_user.id)
-        context.user_data.clear()
+        await db.update_last_review(user_id)
         return
     
-    item = db.get_item_by_id(items_ids[index])
-    
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton("📦 לארכיון", callback_data=f"review_archive_{item['_id']}")],
         [InlineKeyboardButton("♻️ שמור לשבוע הבא", callback_data=f"review_keep_{item['_id']}")],
@@ -496,12 +911,15 @@ async def show_review_item(update: Update, context: ContextTypes.DEFAULT_TYPE, q
         [InlineKeyboardButton("⏭️ דלג", callback_data="review_skip")]
     ])
     
-    message = f"סיקור שבועי ({index + 1}/{len(items_ids)}) 📋\n\n{utils.format_item(item)}\n\nמה לעשות עם זה?"
+    message = (
+        f"סיקור שבועי ({session.position + 1}/{session.total}) 📋\n\n"
+        f"{utils.format_item(item)}\n\nמה לעשות עם זה?"
+    )
     
     if query:
-        await query.edit_message_text(message, reply_markup=keyboard)
+        await outbox.edit_message_text(query, message, reply_markup=keyboard)
     else:
-        await update.callback_query.edit_message_text(message, reply_markup=keyboard)
+        await outbox.reply_text(update.message, message, reply_markup=keyboard)
 
 
 async def handle_review_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -509,25 +927,21 @@ async def handle_review_action(update: Update, context: ContextTypes.DEFAULT_TYP
     query = update.callback_query
     await query.answer()
     
-    if query.data == "review_skip":
-        context.user_data['review_index'] += 1
-        await show_review_item(update, context, query)
-        return
-    
     if query.data == "skip_review":
-        await query.edit_message_text("אוקיי, נזכיר לך בפעם הבאה 👍")
+        await outbox.edit_message_text(query, "אוקיי, נזכיר לך בפעם הבאה 👍")
         return
     
-    action, item_id = query.data.split('_', 2)[1:]
+    session = review.get_session(query.from_user.id)
+    if session is None:
+        await show_review_item(update, context, query)
+        return
     
-    if action == 'archive':
-        db.update_item_status(item_id, 'archived')
-    elif action == 'keep':
-        db.keep_for_next_week(item_id)
-    elif action == 'delete':
-        db.update_item_status(item_id, 'deleted')
+    if query.data != "review_skip":
+        # ההחלטה נאספת ונכתבת יחד עם האחרות (bulk write)
+        action, item_id = query.data.split('_', 2)[1:]
+        await session.decide(item_id, action)
     
-    context.user_data['review_index'] += 1
+    await session.advance()
     await show_review_item(update, context, query)
 
 
@@ -547,28 +961,62 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return await search_start(update, context)
     elif text == '📋 סיקור':
         return await start_review(update, context)
+    elif text == '🏷️ תגיות':
+        return await show_tags(update, context)
 
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """ביטול פעולה"""
-    await update.message.reply_text("בוטל ✖️", reply_markup=MAIN_KEYBOARD)
+    await outbox.reply_text(update.message, "בוטל ✖️", reply_markup=MAIN_KEYBOARD)
     context.user_data.clear()
     return ConversationHandler.END
 
 
-def main():
-    """הפעלת הבוט"""
-    token = os.getenv('TELEGRAM_TOKEN')
+async def post_shutdown(application: Application):
+    """כיבוי: כתיבת החלטות של סיקורים שלא הסתיימו ושחרור ה-lease של עבודות הרקע"""
+    await review.flush_all()
+    await leader.lease.release()
+
+
+def build_application(token, base_url=None):
+    """בונה את ה-Application עם כל ה-handlers וה-jobs (בלי להפעיל אותו)
+
+    base_url - כתובת חלופית ל-Bot API (לדוגמה שרת מדומה בבנצ'מרק)
+    """
+    builder = (
+        Application.builder()
+        .token(token)
+        # עדכונים של משתמשים שונים במקביל, של אותו משתמש לפי הסדר
+        .concurrent_updates(update_processor.PerUserUpdateProcessor())
+        # ספירה ומדידה של כל קריאה ל-Bot API
+        .request(metrics.InstrumentedRequest(connection_pool_size=256))
+        .get_updates_request(metrics.InstrumentedRequest())
+        .post_shutdown(post_shutdown)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
     
-    if not token:
-        logger.error("TELEGRAM_TOKEN not found in environment variables!")
-        return
+    # עבודות רקע שרצות ב-instance אחד בלבד נרשמות דרך leader
+    leader.start(application.job_queue)
     
-    application = Application.builder().token(token).build()
+    # תזמון תזכורות ברקע
+    application.bot_data['reminders'] = reminders.ReminderScheduler(
+        application.job_queue, send_reminder
+    )
+    application.bot_data['reminders'].start()
+    application.job_queue.run_repeating(log_stats, interval=outbox.STATS_INTERVAL)
+    application.job_queue.run_repeating(review.flush_idle_sessions, interval=60)
+    # החלטות סיקור שנרשמו ולא נכתבו לפני נפילה
+    application.job_queue.run_once(review.recover, when=0)
+    application.job_queue.run_repeating(profiling.rotate, interval=profiling.PROFILE_WINDOW_SECONDS)
+    # העברת פריטים מחוקים וארכיון ישן ל-cold
+    leader.run_repeating(application.job_queue, tiering.run, interval=tiering.TIER_INTERVAL_SECONDS)
     
     # Handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("profile", profile_command))
     
     # ConversationHandler להוספת פריט
     add_conv = ConversationHandler(
@@ -578,7 +1026,10 @@ def main():
         ],
         states={
             ADD_CONTENT: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_content)],
-            ADD_REMINDER: [CallbackQueryHandler(set_item_type, pattern='^type_')],
+            ADD_REMINDER: [
+                CallbackQueryHandler(set_item_type, pattern='^type_'),
+                CallbackQueryHandler(set_reminder, pattern='^reminder_')
+            ],
             CUSTOM_DATE: [MessageHandler(filters.TEXT & ~filters.COMMAND, receive_custom_date)]
         },
         fallbacks=[CommandHandler("cancel", cancel)]
@@ -609,20 +1060,57 @@ def main():
     application.add_handler(edit_conv)
     
     # Callback handlers
-    application.add_handler(CallbackQueryHandler(set_reminder, pattern='^reminder_'))
     application.add_handler(CallbackQueryHandler(handle_item_action, pattern='^(archive|unarchive|delete)_'))
+    application.add_handler(CallbackQueryHandler(handle_page, pattern='^pg_'))
+    application.add_handler(CallbackQueryHandler(open_item, pattern='^open_'))
+    application.add_handler(CallbackQueryHandler(open_tag, pattern='^tag_'))
+    application.add_handler(CallbackQueryHandler(open_cold, pattern='^cold_'))
+    application.add_handler(CallbackQueryHandler(handle_selection, pattern='^(sel|tg)_'))
+    application.add_handler(CallbackQueryHandler(handle_bulk_action, pattern='^bulk'))
     application.add_handler(CallbackQueryHandler(start_review, pattern='^start_review$'))
-    application.add_handler(CallbackQueryHandler(handle_review_action, pattern='^review_'))
+    application.add_handler(CallbackQueryHandler(handle_review_action, pattern='^(review_|skip_review$)'))
     
     # Text handlers
     application.add_handler(MessageHandler(filters.Regex('^📅 היום$'), show_today))
     application.add_handler(MessageHandler(filters.Regex('^📆 השבוע$'), show_week))
     application.add_handler(MessageHandler(filters.Regex('^📦 ארכיון$'), show_archive))
     application.add_handler(MessageHandler(filters.Regex('^📋 סיקור$'), start_review))
+    application.add_handler(MessageHandler(filters.Regex('^🏷️ תגיות$'), show_tags))
+    
+    # דגימת cProfile/tracemalloc (כשהופעלה), ומדידת זמן ושגיאות לכל handler
+    profiling.instrument(application)
+    metrics.instrument(application)
+    metrics.register_stats('outbox', outbox.stats)
+    metrics.register_stats('update_processor', application.update_processor.stats)
+    metrics.register_stats('user_cache', database.user_cache.stats)
+    metrics.register_stats('view_cache', database.view_cache.stats)
+    metrics.register_stats('tiering', tiering.stats)
+    metrics.register_stats('leader', leader.stats)
+    
+    return application
+
+
+def main():
+    """הפעלת הבוט"""
+    token = os.getenv('TELEGRAM_TOKEN')
+    
+    if not token:
+        logger.error("TELEGRAM_TOKEN not found in environment variables!")
+        return
+    
+    if BOT_MODE == 'webhook' and database.MULTI_INSTANCE:
+        # עדכון של משתמש שמגיע ל-replica אחר מאבד את השיחה, הבחירה וההחלטות שבסיקור
+        sys.exit("MULTI_INSTANCE=1 is not supported in webhook mode: conversation state, user_data "
+                 "and review sessions live in process memory, so the bot must run as a single replica")
+    
+    application = build_application(token)
     
     # התחלת הבוט
-    logger.info("Bot is starting...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    logger.info("Bot is starting in %s mode...", BOT_MODE)
+    if BOT_MODE == 'webhook':
+        asyncio.run(webhook.run(application))
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
 
 
 if __name__ == '__main__':
@@ -1,183 +1,701 @@
 """
-database.py - MongoDB connection and operations
+database.py - Data access for the bot
+
+The functions here keep the caches, the in-memory search index and the
+business rules; the reads and writes go through a storage backend
+(storage/), chosen with STORAGE_BACKEND: mongo (default), sqlite or
+memory. With MongoDB the connection is opened lazily, on the first query.
+Indexes and data migrations are not run on import; run them once per
+deploy with:
+    python -m database migrate
 """
-from pymongo import MongoClient
 from datetime import datetime, timedelta
+import sys
 import os
+import threading
 from dotenv import load_dotenv
 
+import cache
+import search
+import storage
+from storage.base import bson_time
+
 load_dotenv()
 
-# חיבור ל-MongoDB
-client = MongoClient(os.getenv('MONGODB_URI'))
-db = client['thought_bot']
+# ה-backend נבחר לפי STORAGE_BACKEND (ונקרא אחרי load_dotenv)
+backend = storage.create()
+
+# השדות ש-format_item ומקלדות הפריט צריכים
+DISPLAY_PROJECTION = {
+    'user_id': 1, 'type': 1, 'content': 1, 'tags': 1, 'status': 1,
+    'created_at': 1, 'reminder_date': 1
+}
+
+# השדות שעמוד ברשימה מציג (format_items_list) ו-created_at ל-cursor
+LIST_PROJECTION = {
+    'type': 1, 'content': 1, 'tags': 1, 'created_at': 1, 'reminder_date': 1
+}
+
+# מה שצריך כדי לעדכן את מוני התגיות כשפריט נמחק
+TAGS_PROJECTION = {'user_id': 1, 'status': 1, 'tags': 1}
+
+# כמה תזכורות בכל batch כשטוענים חלון (async_database.iter_due_reminders)
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '500'))
+
+# כמה instances על אותו DB (MULTI_INSTANCE=1): המטמונים בזיכרון - משתמשים, עמודים ואינדקס
+# החיפוש - מתעדכנים רק מכתיבות של התהליך עצמו, ושינוי מ-instance אחר לא מגיע אליהם.
+# לכן במצב הזה הם כבויים וכל קריאה מגיעה ל-DB (וחיפוש - לאינדקס של ה-backend)
+MULTI_INSTANCE = os.getenv('MULTI_INSTANCE', '0') == '1'
+
+# מטמון משתמשים (מתנקה ב-update_last_review)
+USER_CACHE_SIZE = 0 if MULTI_INSTANCE else int(os.getenv('USER_CACHE_SIZE', '1000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL_SECONDS', '300'))
+user_cache = cache.TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
 
-# Collections
-users_collection = db['users']
-items_collection = db['items']
+# מטמון עמודים של today / week / archive. המפתח כולל את גרסת הפריטים של המשתמש,
+# שעולה בכל שינוי - עמודים ישנים פשוט לא נמצאים יותר ונפלטים ב-LRU
+VIEW_CACHE_SIZE = 0 if MULTI_INSTANCE else int(os.getenv('VIEW_CACHE_SIZE', '5000'))
+VIEW_CACHE_TTL = int(os.getenv('VIEW_CACHE_TTL_SECONDS', '300'))
+view_cache = cache.TTLCache(VIEW_CACHE_SIZE, VIEW_CACHE_TTL)
 
-# יצירת אינדקסים לביצועים טובים יותר
-users_collection.create_index('user_id', unique=True)
-items_collection.create_index([('user_id', 1), ('created_at', -1)])
-items_collection.create_index([('user_id', 1), ('status', 1)])
+# "השבוע" מתחיל בתחילת דלי של VIEW_BUCKET_SECONDS, כדי שאותה שאילתה תחזור בתוך הדלי
+VIEW_BUCKET_SECONDS = int(os.getenv('VIEW_BUCKET_SECONDS', '60'))
+
+_item_versions = {}  # user_id -> גרסה, של הכתיבות בתהליך הזה בלבד
+_versions_lock = threading.Lock()
+
+# כל כמה זמן מציעים סיקור
+REVIEW_INTERVAL = timedelta(days=7)
+
+# סטטוסים שמופיעים בחיפוש
+SEARCHABLE_STATUSES = ('active', 'archived')
+
+# מעבר ל-cold: פריטים מחוקים אחרי תקופת חסד, וארכיון שלא נגעו בו זמן רב.
+# פריטים מחוקים נמחקים לגמרי מה-cold אחרי COLD_DELETED_TTL_DAYS
+TIER_DELETED_GRACE = timedelta(days=int(os.getenv('TIER_DELETED_GRACE_DAYS', '7')))
+TIER_ARCHIVED_AFTER = timedelta(days=int(os.getenv('TIER_ARCHIVED_AFTER_DAYS', '90')))
+COLD_DELETED_TTL = timedelta(days=int(os.getenv('COLD_DELETED_TTL_DAYS', '30')))
+
+# אינדקס חיפוש בזיכרון (נבנה לכל משתמש בחיפוש הראשון שלו; כבוי ב-MULTI_INSTANCE)
+search_index = search.SearchIndex(max_users=0 if MULTI_INSTANCE else search.SEARCH_INDEX_MAX_USERS)
 
 
 def get_or_create_user(user_id):
-    """מקבל או יוצר משתמש"""
-    user = users_collection.find_one({'user_id': user_id})
-    if not user:
-        user = {
-            'user_id': user_id,
-            'last_review_date': None,
-            'created_at': datetime.now()
-        }
-        users_collection.insert_one(user)
+    """מקבל או יוצר משתמש (upsert אטומי, עם מטמון)"""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    now = datetime.now()
+    user = backend.get_or_create_user(user_id, {
+        'last_review_date': None,
+        'next_review_at': now,
+        'created_at': now
+    })
+    user_cache.set(user_id, user)
     return user
 
 
 def update_last_review(user_id):
-    """מעדכן את תאריך הסיקור האחרון"""
-    users_collection.update_one(
-        {'user_id': user_id},
-        {'$set': {'last_review_date': datetime.now()}}
-    )
+    """מעדכן את תאריך הסיקור האחרון ואת מועד הסיקור הבא"""
+    now = datetime.now()
+    backend.update_user(user_id, {'last_review_date': now, 'next_review_at': now + REVIEW_INTERVAL})
+    user_cache.pop(user_id)
+
+
+def _review_due(user):
+    """בודק לפי מסמך המשתמש אם הגיע מועד הסיקור הבא"""
+    next_review_at = user.get('next_review_at')
+    if next_review_at is None:
+        # משתמשים ותיקים שנשמרו לפני next_review_at
+        if not user.get('last_review_date'):
+            return True
+        next_review_at = user['last_review_date'] + REVIEW_INTERVAL
+    
+    return next_review_at <= datetime.now()
 
 
 def should_review(user_id):
-    """בודק אם עבר שבוע מאז הסיקור האחרון"""
-    user = users_collection.find_one({'user_id': user_id})
-    if not user or not user.get('last_review_date'):
-        return True
+    """בודק אם הגיע מועד הסיקור הבא (שבוע מאז הסיקור האחרון)"""
+    return _review_due(get_or_create_user(user_id))
+
+
+def _items_version(user_id):
+    return _item_versions.get(user_id, 0)
+
+
+def _bump_version(*user_ids):
+    """מסמן שהפריטים של המשתמשים השתנו (אחרי הכתיבה), כך שהמטמון לא יחזיר עמודים ישנים"""
+    with _versions_lock:
+        for user_id in user_ids:
+            if user_id is not None:
+                _item_versions[user_id] = _item_versions.get(user_id, 0) + 1
+
+
+def _update_item(item_id, fields):
+    """מעדכן פריט ומעלה את גרסת המשתמש; מחזיר את הפריט כפי שהיה לפני העדכון (או None)
+
+    פריט שנמצא ב-cold מוחזר קודם ל-hot ואז מתעדכן.
+    """
+    previous = backend.update_item(item_id, fields)
+    if previous is None and _restore_from_cold(item_id):
+        previous = backend.update_item(item_id, fields)
+    if previous is not None:
+        _bump_version(previous['user_id'])
+    return previous
+
+
+def _restore_from_cold(item_id):
+    """מחזיר פריט מה-cold ל-hot (למוני התגיות ולאינדקס החיפוש); מחזיר אם היה שם"""
+    item = backend.restore_item(item_id)
+    if item is None:
+        return False
+    _bump_version(item['user_id'])
+    if item['status'] != 'deleted':
+        _count_tags([item], 1)
+        _add_to_index(item)
+    return True
+
+
+def _add_to_index(item):
+    """מוסיף פריט לאינדקס החיפוש, עם created_at ברזולוציה של ה-cursor (אלפיות שנייה)
+
+    אחרת המפתח (score, created_at, _id) בזיכרון מדויק יותר מה-cursor, ועמוד הבא /
+    הקודם מדלג על פריטים מאותה אלפית שנייה או חוזר עליהם
+    """
+    search_index.add({**item, 'created_at': bson_time(item['created_at'])})
+
+
+def _count_tags(items, sign):
+    """מעדכן את מוני התגיות: +1 (sign=1) או -1 לכל תגית של כל פריט"""
+    deltas = {}  # user_id -> {tag: delta}
+    for item in items:
+        counts = deltas.setdefault(item['user_id'], {})
+        for tag in set(item.get('tags') or ()):
+            counts[tag] = counts.get(tag, 0) + sign
+    for user_id, counts in deltas.items():
+        backend.adjust_tag_counts(user_id, counts)
+
+
+def _view_cache_key(user_id, view, query, cursor, direction, limit):
+    # הגרסה נקראת לפני השאילתה: שינוי שנכתב בזמן השאילתה מעלה אותה, והתוצאה לא תימצא
+    return (user_id, _items_version(user_id), view, query['since'], cursor, direction, limit)
+
+
+def get_home_snapshot(user_id, view, limit=5):
+    """מחזיר את דגל הסיקור ואת העמוד הראשון של today / week בסבב אחד מול ה-DB
+
+    כשהמשתמש במטמון - שאילתת פריטים בלבד; אחרת המשתמש והפריטים יחד
+    (ב-MongoDB: aggregation אחד עם $lookup). מחזיר {'review', 'items', 'has_next'}
+    """
+    user = user_cache.get(user_id)
+    if user is not None:
+        items, _, has_next = get_items_page(user_id, view, limit=limit)
+        return {'review': _review_due(user), 'items': items, 'has_next': has_next}
     
-    week_ago = datetime.now() - timedelta(days=7)
-    return user['last_review_date'] < week_ago
+    query = _view_query(view)
+    key = _view_cache_key(user_id, view, query, None, 'next', limit)
+    user, items = backend.get_user_with_items(user_id, limit=limit + 1, projection=LIST_PROJECTION, **query)
+    if user is None:
+        # משתמש שעוד לא נוצר (לא שלח /start)
+        review = should_review(user_id)
+    else:
+        user_cache.set(user_id, user)
+        review = _review_due(user)
+    items, has_next = items[:limit], len(items) > limit
+    view_cache.set(key, (items, False, has_next))
+    return {'review': review, 'items': list(items), 'has_next': has_next}
 
 
 def add_item(user_id, item_type, content, tags=None):
     """מוסיף פריט חדש"""
+    now = datetime.now()
     item = {
         'user_id': user_id,
         'type': item_type,
         'content': content,
         'tags': tags or [],
+        'search_terms': search.item_terms(content, tags),
+        'search_v': search.TERMS_VERSION,
         'status': 'active',
-        'created_at': datetime.now(),
-        'keep_until': None,
-        'reminder_date': None,
-        'reminded': False
+        'created_at': now,
+        'status_at': now,
+        'keep_until': None
     }
-    result = items_collection.insert_one(item)
-    return str(result.inserted_id)
+    item_id = backend.insert_item(item)
+    _bump_version(user_id)
+    _add_to_index(item)
+    _count_tags([item], 1)
+    return item_id
+
+
+def _view_query(view):
+    """הסטטוסים וטווח הזמן של כל תצוגת רשימה (since משמש גם כדלי הזמן במטמון)"""
+    if view == 'today':
+        today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return {'statuses': ('active',), 'since': today_start}
+    if view == 'week':
+        now = datetime.now().timestamp()
+        bucket_start = datetime.fromtimestamp(now - now % VIEW_BUCKET_SECONDS)
+        return {'statuses': ('active',), 'since': bucket_start - timedelta(days=7)}
+    if view == 'archive':
+        return {'statuses': ('archived',), 'since': None}
+    if view == 'old':
+        # ארכיון ישן - נקרא מה-cold רק כשמבקשים
+        return {'statuses': ('archived',), 'since': None, 'cold': True}
+    raise ValueError(f"Unknown view: {view}")
 
 
 def get_items_today(user_id):
     """מחזיר פריטים מהיום"""
-    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    return list(items_collection.find({
-        'user_id': user_id,
-        'status': 'active',
-        'created_at': {'$gte': today_start}
-    }).sort('created_at', -1))
+    return backend.find_items(user_id, projection=LIST_PROJECTION, **_view_query('today'))
 
 
 def get_items_week(user_id):
     """מחזיר פריטים מהשבוע"""
-    week_ago = datetime.now() - timedelta(days=7)
-    return list(items_collection.find({
-        'user_id': user_id,
-        'status': 'active',
-        'created_at': {'$gte': week_ago}
-    }).sort('created_at', -1))
+    return backend.find_items(user_id, projection=LIST_PROJECTION, **_view_query('week'))
 
 
 def get_archived_items(user_id):
     """מחזיר פריטים בארכיון"""
-    return list(items_collection.find({
-        'user_id': user_id,
-        'status': 'archived'
-    }).sort('created_at', -1).limit(50))
+    return backend.find_items(user_id, limit=50, projection=LIST_PROJECTION, **_view_query('archive'))
 
 
-def search_items(user_id, query):
-    """חיפוש פריטים"""
-    return list(items_collection.find({
-        'user_id': user_id,
-        'status': {'$ne': 'deleted'},
-        '$or': [
-            {'content': {'$regex': query, '$options': 'i'}},
-            {'tags': {'$regex': query, '$options': 'i'}}
-        ]
-    }).sort('created_at', -1).limit(30))
+def get_items_page(user_id, view, cursor=None, direction='next', limit=5):
+    """מחזיר עמוד מתצוגה (today / week / archive / old) בעימוד keyset על (created_at, _id)
+
+    cursor - (created_at, item_id) של הפריט שממנו ממשיכים, או None לעמוד הראשון
+    direction - 'next' לפריטים ישנים יותר מה-cursor, 'prev' לחדשים יותר
+    מחזיר (items, has_prev, has_next), מהחדש לישן. עמודים נשמרים ב-view_cache
+    עד שהפריטים של המשתמש משתנים.
+    """
+    if cursor is None:
+        direction = 'next'
+    
+    query = _view_query(view)
+    key = _view_cache_key(user_id, view, query, cursor, direction, limit)
+    return _cached_page(key, user_id, cursor, direction, limit, **query)
+
+
+def get_tag_page(user_id, tag, cursor=None, direction='next', limit=5):
+    """עמוד מהפריטים (שאינם מחוקים) עם התגית, כמו get_items_page - התאמה מדויקת באינדקס"""
+    if cursor is None:
+        direction = 'next'
+    
+    query = {'statuses': SEARCHABLE_STATUSES, 'since': None, 'tag': tag}
+    key = _view_cache_key(user_id, ('tag', tag), query, cursor, direction, limit)
+    return _cached_page(key, user_id, cursor, direction, limit, **query)
+
+
+def _cached_page(key, user_id, cursor, direction, limit, **query):
+    page = view_cache.get(key)
+    if page is None:
+        items = backend.find_items(
+            user_id, after=cursor, ascending=direction == 'prev', limit=limit + 1,
+            projection=LIST_PROJECTION, **query
+        )
+        page = _paginate(items, cursor, direction, limit)
+        view_cache.set(key, page)
+    items, has_prev, has_next = page
+    return list(items), has_prev, has_next
+
+
+def get_top_tags(user_id, limit=12):
+    """[(tag, count)] - התגיות הנפוצות של המשתמש (מהמונים, בלי לסרוק פריטים)"""
+    key = (user_id, _items_version(user_id), 'tags', limit)
+    tags = view_cache.get(key)
+    if tags is None:
+        tags = backend.top_tags(user_id, limit)
+        view_cache.set(key, tags)
+    return list(tags)
+
+
+def _paginate(items, cursor, direction, limit):
+    """(items, has_prev, has_next) מהחדש לישן, מתוך עד limit + 1 פריטים שנשלפו בכיוון הניווט"""
+    has_more = len(items) > limit
+    items = items[:limit]
+    if direction == 'next':
+        return items, cursor is not None, has_more
+    items.reverse()
+    return items, has_more, True
+
+
+def search_items(user_id, query, limit=30, after=None, ascending=False):
+    """חיפוש פריטים לפי מילים (תחיליות) בתוכן ובתגיות, מדורג לפי רלוונטיות
+
+    כל תוצאה כוללת 'score'; הסדר הוא (score, created_at, _id) מהגבוה לנמוך, ו-after
+    הוא המפתח הזה של התוצאה שממנה ממשיכים (ascending - בכיוון ההפוך).
+    """
+    terms = search.query_terms(query)
+    if not terms:
+        return []
+    
+    results = search_index.search(user_id, terms, limit, after, ascending)
+    if results is None and search_index.begin_build(user_id):
+        try:
+            docs = backend.find_items(
+                user_id, SEARCHABLE_STATUSES,
+                limit=search.SEARCH_INDEX_MAX_ITEMS + 1,
+                projection=search.INDEX_PROJECTION
+            )
+        except Exception:
+            search_index.abort_build(user_id)
+            raise
+        search_index.finish_build(user_id, docs)
+        results = search_index.search(user_id, terms, limit, after, ascending)
+    
+    if results is None:
+        # משתמש עם היסטוריה גדולה מדי לזיכרון - חיפוש באינדקס של ה-backend,
+        # מהחדש לישן (כל התוצאות בציון 0) כדי שכל עמוד יהיה סריקת טווח באורך קבוע
+        results = backend.find_items_by_terms(
+            user_id, terms, limit, after=after[-2:] if after else None, ascending=ascending,
+            projection=LIST_PROJECTION
+        )
+        for item in results:
+            item['score'] = 0
+    return results
+
+
+def search_page(user_id, query, cursor=None, direction='next', limit=5):
+    """עמוד מתוצאות החיפוש בעימוד keyset, כמו get_items_page
+
+    cursor - (score, created_at, item_id) של התוצאה שממנה ממשיכים, או None לעמוד הראשון
+    """
+    if cursor is None:
+        direction = 'next'
+    items = search_items(user_id, query, limit=limit + 1, after=cursor, ascending=direction == 'prev')
+    return _paginate(items, cursor, direction, limit)
+
+
+def search_cold_page(user_id, query, cursor=None, direction='next', limit=5):
+    """עמוד מתוצאות החיפוש בארכיון הישן (ה-cold), מהחדש לישן
+
+    cursor - (created_at, item_id) של התוצאה שממנה ממשיכים, או None לעמוד הראשון
+    """
+    if cursor is None:
+        direction = 'next'
+    terms = search.query_terms(query)
+    if not terms:
+        return [], False, False
+    items = backend.find_items_by_terms(
+        user_id, terms, limit + 1, after=cursor, ascending=direction == 'prev',
+        projection=LIST_PROJECTION, cold=True
+    )
+    return _paginate(items, cursor, direction, limit)
+
+
+def backfill_search_terms(batch_size=500):
+    """מחשב search_terms לפריטים שנשמרו בגרסה קודמת של האינדקס"""
+    updated = 0
+    while True:
+        batch = backend.find_stale_items(search.TERMS_VERSION, batch_size)
+        if not batch:
+            return updated
+        backend.update_items([
+            (str(item['_id']), {
+                'search_terms': search.item_terms(item.get('content'), item.get('tags')),
+                'search_v': search.TERMS_VERSION
+            })
+            for item in batch
+        ], ordered=False)
+        updated += len(batch)
 
 
 def get_item_by_id(item_id):
-    """מקבל פריט לפי ID"""
-    from bson.objectid import ObjectId
-    return items_collection.find_one({'_id': ObjectId(item_id)})
+    """מקבל פריט לפי ID (השדות להצגה, למקלדת ולבדיקת בעלות / תזכורת), גם מה-cold"""
+    item = backend.get_item(item_id, DISPLAY_PROJECTION)
+    if item is None:
+        item = backend.get_item(item_id, DISPLAY_PROJECTION, cold=True)
+    return item
 
 
 def update_item_status(item_id, status):
     """מעדכן סטטוס של פריט"""
-    from bson.objectid import ObjectId
-    items_collection.update_one(
-        {'_id': ObjectId(item_id)},
-        {'$set': {'status': status}}
-    )
-
-
-def update_item_content(item_id, content):
-    """מעדכן תוכן של פריט"""
-    from bson.objectid import ObjectId
-    items_collection.update_one(
-        {'_id': ObjectId(item_id)},
-        {'$set': {'content': content}}
-    )
+    previous = _update_item(item_id, {'status': status, 'status_at': datetime.now()})
+    if previous is not None and (previous['status'] == 'deleted') != (status == 'deleted'):
+        # רק פריטים שאינם מחוקים נספרים בתגיות
+        _count_tags([previous], -1 if status == 'deleted' else 1)
+    if status == 'deleted':
+        # התזכורת של פריט שנמחק לא תישלח
+        backend.cancel_reminders([item_id])
+        search_index.remove(item_id)
+    else:
+        search_index.update(item_id, status=status)
+
+
+def update_item_content(item_id, content, tags=None):
+    """מעדכן תוכן של פריט; tags - תגיות חדשות במקום הקיימות (None - התגיות נשארות)"""
+    fields = {'content': content}
+    if tags is None:
+        # פריט ב-cold חוזר ל-hot רק ב-_update_item - התגיות שלו נקראות משם
+        item = backend.get_item(item_id, {'tags': 1}) or backend.get_item(item_id, {'tags': 1}, cold=True)
+        tags = item.get('tags') if item else []
+    else:
+        fields['tags'] = tags
+    fields['search_terms'] = search.item_terms(content, tags)
+    fields['search_v'] = search.TERMS_VERSION
+    previous = _update_item(item_id, fields)
+    if 'tags' in fields and previous is not None and previous['status'] != 'deleted':
+        old, new = set(previous.get('tags') or ()), set(tags)
+        backend.adjust_tag_counts(previous['user_id'], {tag: (tag in new) - (tag in old) for tag in old ^ new})
+    search_index.update(item_id, content=content, tags=tags)
 
 
 def keep_for_next_week(item_id):
     """שומר פריט לשבוע הבא"""
-    from bson.objectid import ObjectId
     next_week = datetime.now() + timedelta(days=7)
-    items_collection.update_one(
-        {'_id': ObjectId(item_id)},
-        {'$set': {'keep_until': next_week}}
-    )
+    _update_item(item_id, {'keep_until': next_week})
 
 
 def set_reminder(item_id, reminder_date):
-    """מגדיר תזכורת לפריט"""
-    from bson.objectid import ObjectId
-    items_collection.update_one(
-        {'_id': ObjectId(item_id)},
-        {'$set': {'reminder_date': reminder_date, 'reminded': False}}
-    )
+    """מגדיר תזכורת לפריט (ב-reminders; בפריט - המועד להצגה עד שהתזכורת נשלחת)"""
+    previous = _update_item(item_id, {'reminder_date': reminder_date})
+    if previous is None:
+        return
+    backend.set_reminder(item_id, previous['user_id'], reminder_date)
+    search_index.update(item_id, reminder_date=reminder_date)
 
 
 def get_pending_reminders(user_id):
-    """מחזיר תזכורות שצריך לשלוח"""
+    """מחזיר תזכורות שצריך לשלוח (הפריטים, עם השדות להצגה)"""
+    due = backend.find_due_reminders(datetime.now(), user_id=user_id)
+    items = {item['_id']: item for item in backend.get_items([str(r['_id']) for r in due], DISPLAY_PROJECTION)}
+    return [items[reminder['_id']] for reminder in due if reminder['_id'] in items]
+
+
+def get_due_reminders(until, after=None, limit=None):
+    """מחזיר תזכורות (לכל המשתמשים) שמועדן עד until, לפי (due_at, _id) - סריקת טווח אחת
+
+    כל תזכורת היא {_id: id הפריט, user_id, due_at}
+    after / limit - לטעינה ב-batches (async_database.iter_due_reminders)
+    """
+    return backend.find_due_reminders(until, after=after, limit=limit)
+
+
+def claim_reminders(owner, lease, limit=1, item_id=None):
+    """תופס תזכורות שהגיע זמנן לשליחה על ידי owner למשך lease (timedelta)
+
+    כל תזכורת נתפסת אטומית - תהליך אחר לא יקבל אותה עד שהתפיסה תפוג. item_id - רק
+    התזכורת של הפריט. מחזיר {_id, user_id, due_at, attempts} לכל תזכורת שנתפסה.
+    """
     now = datetime.now()
-    return list(items_collection.find({
-        'user_id': user_id,
-        'reminder_date': {'$lte': now},
-        'reminded': False,
-        'status': {'$ne': 'deleted'}
-    }))
+    return backend.claim_reminders(owner, now, now + lease, limit, item_id=item_id)
+
+
+def release_reminder(item_id, owner, delay):
+    """משחרר תזכורת שנתפסה ולא נשלחה - תיתפס שוב בעוד delay (timedelta)"""
+    backend.release_reminder(item_id, owner, datetime.now() + delay)
 
 
 def mark_reminder_sent(item_id):
     """מסמן שתזכורת נשלחה"""
-    from bson.objectid import ObjectId
-    items_collection.update_one(
-        {'_id': ObjectId(item_id)},
-        {'$set': {'reminded': True}}
+    mark_reminders_sent([item_id])
+
+
+def mark_reminders_sent(item_ids):
+    """מסמן כמה תזכורות כנשלחו בעדכון אחד"""
+    if not item_ids:
+        return
+    # תזכורת שהוגדרה מחדש בינתיים (למועד עתידי) לא מסומנת
+    backend.mark_reminders_sent(item_ids, datetime.now())
+    # התזכורת מוצגת בפריט עד שנשלחה
+    _bump_version(*backend.item_owners(item_ids))
+    for item_id in item_ids:
+        search_index.update(item_id, reminder_date=None)
+
+
+def get_items_for_review(user_id, after=None, limit=None):
+    """מחזיר פריטים לסיקור שבועי (מהישן לחדש)
+
+    after - (created_at, item_id) של הפריט האחרון שכבר נטען, להמשך בעימוד keyset
+    """
+    return backend.find_items(
+        user_id, after=after, ascending=True, limit=limit,
+        projection=DISPLAY_PROJECTION, **_view_query('week')
     )
 
 
-def get_items_for_review(user_id):
-    """מחזיר פריטים לסיקור שבועי"""
-    week_ago = datetime.now() - timedelta(days=7)
-    return list(items_collection.find({
-        'user_id': user_id,
-        'status': 'active',
-        'created_at': {'$gte': week_ago}
-    }).sort('created_at', 1))
+def _action_updates():
+    """השדות שכל פעולה על פריט כותבת (סיקור / בחירה מרובה)"""
+    now = datetime.now()
+    return {
+        'archive': {'status': 'archived', 'status_at': now},
+        'unarchive': {'status': 'active', 'status_at': now},
+        'delete': {'status': 'deleted', 'status_at': now},
+        'keep': {'keep_until': now + timedelta(days=7)}
+    }
+
+
+def _apply_to_index(item_id, action):
+    if action == 'delete':
+        search_index.remove(item_id)
+    elif action == 'archive':
+        search_index.update(item_id, status='archived')
+    elif action == 'unarchive':
+        search_index.update(item_id, status='active')
+
+
+def _deletable(item_ids):
+    """הפריטים שעוד לא נמחקו (עם התגיות), לפני מחיקה - כדי להוריד אותם ממוני התגיות"""
+    if not item_ids:
+        return []
+    return [item for item in backend.get_items(item_ids, TAGS_PROJECTION) if item['status'] != 'deleted']
+
+
+def _forget_deleted(items):
+    """פריטים שנמחקו עכשיו: יורדים ממוני התגיות, והתזכורות שלהם לא יישלחו"""
+    _count_tags(items, -1)
+    backend.cancel_reminders([str(item['_id']) for item in items])
+
+
+def log_review_decision(user_id, item_id, action):
+    """רושם החלטת סיקור ב-review_log מיד - נשמרת גם אם התהליך נופל לפני הכתיבה המרוכזת"""
+    return backend.log_review_decision(user_id, item_id, action)
+
+
+def apply_review_decisions(user_id, decisions, log_ids=()):
+    """כותב החלטות סיקור [(item_id, 'archive' | 'keep' | 'delete')] של משתמש, ואז מוחק את הרשומות שלהן
+
+    עדכון אחד לכל פעולה, רק על פריטים של המשתמש שאינם מחוקים (כמו apply_bulk_action) - ההחלטות
+    מגיעות מה-callback. שתי החלטות על אותו פריט - האחרונה קובעת. בטוח להרצה חוזרת.
+    """
+    latest = dict(decisions)
+    owned = {str(item['_id']): item for item in _deletable(list(latest)) if item['user_id'] == user_id}
+    updates = _action_updates()
+    for action in {latest[item_id] for item_id in owned}:
+        backend.update_user_items(
+            user_id, [item_id for item_id in owned if latest[item_id] == action], updates[action]
+        )
+    _bump_version(user_id)
+    _forget_deleted([item for item_id, item in owned.items() if latest[item_id] == 'delete'])
+    for item_id in owned:
+        _apply_to_index(item_id, latest[item_id])
+    backend.delete_review_log(log_ids)
+
+
+def replay_review_log():
+    """כותב החלטות סיקור שנרשמו ולא נכתבו לפריטים (תהליך שנפל באמצע סיקור); מחזיר כמה"""
+    by_user = {}
+    for entry in backend.find_review_log():
+        by_user.setdefault(entry['user_id'], []).append(entry)
+    for user_id, entries in by_user.items():
+        apply_review_decisions(
+            user_id,
+            [(entry['item_id'], entry['action']) for entry in entries],
+            [entry['_id'] for entry in entries]
+        )
+    return sum(len(entries) for entries in by_user.values())
+
+
+def apply_bulk_action(user_id, item_ids, action):
+    """פעולה אחת ('archive' / 'unarchive' / 'delete' / 'keep') על כל הפריטים שנבחרו, בעדכון אחד
+
+    רק פריטים של המשתמש שאינם מחוקים מתעדכנים; מחזיר כמה פריטים עודכנו
+    """
+    # item_ids מגיעים מה-callback - רק הפריטים של המשתמש מתעדכנים, גם ב-DB וגם באינדקס החיפוש
+    owned = [item for item in _deletable(list(item_ids)) if item['user_id'] == user_id]
+    owned_ids = [str(item['_id']) for item in owned]
+    count = backend.update_user_items(user_id, owned_ids, _action_updates()[action])
+    _bump_version(user_id)
+    if action == 'delete':
+        _forget_deleted(owned)
+    if count:
+        for item_id in owned_ids:
+            _apply_to_index(item_id, action)
+    return count
+
+
+# Tiering - ה-job ב-tiering.py
+
+def tier_items(limit=500):
+    """מעביר batch אחד של פריטים מחוקים / ארכיון ישן ל-cold; מחזיר כמה הועברו"""
+    now = datetime.now()
+    moved = backend.move_to_cold(
+        now - TIER_DELETED_GRACE, now - TIER_ARCHIVED_AFTER, limit, now + COLD_DELETED_TTL
+    )
+    _bump_version(*{item['user_id'] for item in moved})
+    # מוני התגיות ואינדקס החיפוש מכסים רק את ה-hot
+    _count_tags([item for item in moved if item['status'] != 'deleted'], -1)
+    for item in moved:
+        search_index.remove(item['_id'])
+    return len(moved)
+
+
+def purge_cold(limit=500):
+    """מוחק מה-cold פריטים מחוקים שתוקפם עבר; מחזיר כמה נמחקו (ב-MongoDB - אינדקס TTL)"""
+    return backend.purge_cold(datetime.now(), limit)
+
+
+# Leases - ה-leader של עבודות הרקע ב-leader.py
+
+def acquire_lease(name, owner, ttl):
+    """תופס או מאריך lease ל-ttl (timedelta); מחזיר את ה-fencing token, או None אם מחזיק אחר"""
+    now = datetime.now()
+    return backend.acquire_lease(name, owner, now, now + ttl)
+
+
+def release_lease(name, owner):
+    """משחרר lease ש-owner מחזיק - instance אחר יכול לתפוס אותו מיד"""
+    backend.release_lease(name, owner, datetime.now())
+
+
+def get_lease(name):
+    """ה-lease הנוכחי {_id, owner, token, expire_at}, או None"""
+    return backend.get_lease(name)
+
+
+# Migrations - רצות פעם אחת לכל deploy: python -m database migrate
+
+def _migration_indexes():
+    """אינדקסים לביצועים טובים יותר"""
+    backend.create_indexes()
+
+
+def _migration_search_terms():
+    """search_terms בגרסה הנוכחית לפריטים ישנים"""
+    backfill_search_terms()
+
+
+def _migration_reminders():
+    """collection נפרד לתזכורות, עם אינדקס חלקי על התזכורות שלא נשלחו"""
+    backend.create_indexes()
+    backend.migrate_reminders()
+
+
+def _migration_tags():
+    """אינדקס התגיות ומונים לפריטים הקיימים"""
+    backend.create_indexes()
+    backend.rebuild_tags()
+
+
+# (גרסה, תיאור, פונקציה) - מוסיפים רק בסוף, לא משנים גרסאות קיימות
+MIGRATIONS = [
+    (1, 'indexes', _migration_indexes),
+    (2, 'search terms v2', _migration_search_terms),
+    (3, 'reminders keyset index', _migration_indexes),
+    (4, 'tag index and counts', _migration_tags),
+    (5, 'cold tier', _migration_indexes),
+    (6, 'reminders collection', _migration_reminders),
+    (7, 'reminders due index', _migration_indexes),
+]
+
+
+def migrate():
+    """מריץ את כל ה-migrations שעוד לא רצו; מחזיר את הגרסאות שהורצו"""
+    applied = backend.applied_migrations()
+    ran = []
+    for version, description, func in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"Running migration {version}: {description}")
+        func()
+        backend.record_migration(version, description, datetime.now())
+        ran.append(version)
+    return ran
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['migrate']:
+        sys.exit("usage: python -m database migrate")
+    ran = migrate()
+    print(f"Applied migrations: {ran}" if ran else "Database is up to date")
@@ -0,0 +1,146 @@
+"""
+leader.py - Leader lease for background jobs that must run on one instance
+
+With several bot instances behind the webhook, the batch jobs (loading
+the reminder window, the reminder sweep, tiering) should run on one of
+them while all of them handle updates. Every instance heartbeats a lease
+named LEADER_LEASE_NAME in the locks collection every
+LEADER_HEARTBEAT_SECONDS: the holder extends it to now +
+LEADER_LEASE_SECONDS, the others try to take it over, which succeeds only
+once it has expired. When the leader dies another instance takes over
+within a heartbeat of the expiry; a leader that stops cleanly releases
+the lease (post_shutdown) so the takeover is immediate.
+
+Every takeover gets a new token, a counter kept with the lease. Jobs
+registered with run_repeating run only while this instance holds an
+unexpired lease, and long batch jobs call lease.still_leader() between
+batches, which checks that the token in the database is still ours. This
+is a check before each batch, not fencing: the writes themselves are not
+conditioned on the token, so a leader that freezes (GC pause, suspended
+container) after the check and past its lease still finishes the batch
+it was in, alongside the new leader. The check only narrows that overlap
+to one batch, so batch jobs must tolerate it - see tiering.py. Expiry is
+computed from each instance's clock, so the clocks should agree to well
+within LEADER_LEASE_SECONDS.
+"""
+import functools
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+import async_database as db
+
+logger = logging.getLogger(__name__)
+
+LEADER_LEASE_NAME = os.getenv('LEADER_LEASE_NAME', 'scheduler')
+LEADER_LEASE = timedelta(seconds=int(os.getenv('LEADER_LEASE_SECONDS', '30')))
+LEADER_HEARTBEAT_SECONDS = int(os.getenv('LEADER_HEARTBEAT_SECONDS', '10'))
+
+# מזהה התהליך ב-leases ובתפיסות של תזכורות - ייחודי לכל instance של הבוט
+INSTANCE_ID = os.getenv('INSTANCE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Lease:
+    """lease בשם name ב-collection locks, שמוחזק בעזרת heartbeat מחזורי"""
+
+    def __init__(self, name=LEADER_LEASE_NAME, owner=INSTANCE_ID, ttl=LEADER_LEASE):
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+        self.token = None         # fencing token כל עוד ה-lease שלנו
+        self._valid_until = None  # time.monotonic() שעד אליו ה-lease בתוקף אצלנו
+        self._stats = {'acquired': 0, 'lost': 0, 'skipped': 0, 'errors': 0}
+
+    @property
+    def held(self):
+        """האם ה-instance מחזיק ב-lease (לפי ה-heartbeat האחרון שהצליח, בלי פנייה ל-DB)"""
+        return self.token is not None and time.monotonic() < self._valid_until
+
+    async def heartbeat(self, context=None):
+        """Job: מאריך את ה-lease, או מנסה לתפוס אותו אם פג"""
+        # נמדד לפני הקריאה - התפוגה אצלנו לא מאוחרת מזו שב-DB
+        started = time.monotonic()
+        try:
+            token = await db.acquire_lease(self.name, self.owner, self.ttl)
+        except Exception:
+            # ה-lease נשאר בתוקף אצלנו עד התפוגה המקורית שלו
+            self._stats['errors'] += 1
+            logger.exception("Heartbeat of lease %s failed", self.name)
+            return
+
+        if token is None:
+            if self.token is not None:
+                self._stats['lost'] += 1
+                logger.warning("Lost lease %s (token %d)", self.name, self.token)
+            self.token = None
+            self._valid_until = started
+            return
+
+        if token != self.token:
+            self._stats['acquired'] += 1
+            logger.info("Acquired lease %s as %s (token %d)", self.name, self.owner, token)
+        self.token = token
+        self._valid_until = started + self.ttl.total_seconds()
+
+    async def still_leader(self):
+        """בודק מול ה-DB שה-lease עדיין שלנו עם אותו token - בין batches של עבודה ארוכה
+
+        בדיקה לפני הכתיבה, לא fencing: מצמצם את החפיפה עם leader חדש ל-batch אחד, לא מונע אותה
+        """
+        if not self.held:
+            return False
+        lease = await db.get_lease(self.name)
+        return bool(lease and lease['owner'] == self.owner and lease['token'] == self.token)
+
+    async def release(self):
+        """משחרר את ה-lease (בכיבוי), כדי ש-instance אחר יתפוס אותו בלי לחכות לתפוגה"""
+        if self.token is None:
+            return
+        self.token = None
+        try:
+            await db.release_lease(self.name, self.owner)
+        except Exception:
+            logger.exception("Failed to release lease %s", self.name)
+
+    def guard(self, callback):
+        """עוטף job כך שירוץ רק כשה-instance מחזיק ב-lease"""
+
+        @functools.wraps(callback)
+        async def wrapper(context):
+            if self._valid_until is None:
+                # job שרץ לפני ה-heartbeat הראשון
+                await self.heartbeat()
+            if not self.held:
+                self._stats['skipped'] += 1
+                return None
+            return await callback(context)
+
+        return wrapper
+
+    def stats(self):
+        held = self.held
+        return {'leader': int(held), 'token': self.token if held else 0, **self._stats}
+
+
+lease = Lease()
+
+
+def start(job_queue):
+    """heartbeat מיידי ואז כל LEADER_HEARTBEAT_SECONDS"""
+    job_queue.run_repeating(
+        lease.heartbeat,
+        interval=LEADER_HEARTBEAT_SECONDS,
+        first=0,
+        name='leader_heartbeat'
+    )
+
+
+def run_repeating(job_queue, callback, interval, **kwargs):
+    """רושם job מחזורי שרץ רק ב-instance שמחזיק ב-lease"""
+    return job_queue.run_repeating(lease.guard(callback), interval=interval, **kwargs)
+
+
+def stats():
+    return lease.stats()
@@ -0,0 +1,299 @@
+"""
+metrics.py - Handler, query and Bot API metrics in the Prometheus format
+
+What is measured:
+- every handler registered on the Application (instrument()): latency
+  histogram and error count, labelled with the callback name
+- every database.py function called through async_database: latency
+  histogram labelled with the function name
+- every MongoDB command (CommandTimer, a pymongo command listener):
+  latency and failures, labelled with the database.py function that
+  issued it and the command name
+- every Bot API request (InstrumentedRequest): count by method and HTTP
+  status, and latency
+- the stats() dicts of outbox, update processor and caches, as gauges
+
+In webhook mode everything is served on GET /metrics (protected by
+METRICS_TOKEN when set); in both modes summary() is logged periodically
+with the other stats.
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+
+from pymongo import monitoring
+from telegram.ext import ConversationHandler
+from telegram.request import HTTPXRequest
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+PREFIX = 'thought_bot_'
+
+# גבולות ה-buckets בשניות
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# הפונקציה ב-database.py שרצה כרגע (ב-thread של ה-DB), לשיוך פקודות MongoDB
+current_operation = contextvars.ContextVar('current_operation', default='other')
+
+
+class _Metric:
+    """בסיס למדד עם labels; בטוח לשימוש מכמה threads"""
+
+    type = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # (ערכי labels) -> ערך
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def _format_labels(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            values = {key: _copy(value) for key, value in self._values.items()}
+        for key, value in sorted(values.items()):
+            lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    """מונה שרק עולה"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def _samples(self, key, value):
+        return [f"{self.name}{self._format_labels(key)} {value}"]
+
+
+class Histogram(_Metric):
+    """התפלגות זמנים לפי buckets, עם סכום וספירה"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = buckets
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def totals(self):
+        """(ערכי labels) -> (ספירה, סכום)"""
+        with self._lock:
+            return {key: (entry[2], entry[1]) for key, entry in self._values.items()}
+
+    def _samples(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip(self.buckets, counts):
+            cumulative += bucket
+            lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', bound)])} {cumulative}")
+        lines.append(f"{self.name}_bucket{self._format_labels(key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_sum{self._format_labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+def _copy(value):
+    if isinstance(value, list):
+        return [list(value[0]), value[1], value[2]]
+    return value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# המדדים
+
+HANDLER_SECONDS = Histogram('handler_duration_seconds', 'Handler latency', ['handler'])
+HANDLER_ERRORS = Counter('handler_errors_total', 'Exceptions raised by handlers', ['handler', 'error'])
+DB_OPERATION_SECONDS = Histogram(
+    'db_operation_duration_seconds', 'database.py function latency', ['operation']
+)
+DB_COMMAND_SECONDS = Histogram(
+    'db_command_duration_seconds', 'MongoDB command latency', ['operation', 'command']
+)
+DB_COMMAND_FAILURES = Counter(
+    'db_command_failures_total', 'Failed MongoDB commands', ['operation', 'command']
+)
+BOT_API_REQUESTS = Counter('bot_api_requests_total', 'Bot API requests', ['method', 'status'])
+BOT_API_SECONDS = Histogram('bot_api_duration_seconds', 'Bot API request latency', ['method'])
+
+_METRICS = [
+    HANDLER_SECONDS, HANDLER_ERRORS, DB_OPERATION_SECONDS, DB_COMMAND_SECONDS,
+    DB_COMMAND_FAILURES, BOT_API_REQUESTS, BOT_API_SECONDS,
+]
+
+# name -> פונקציית stats() שמחזירה dict של מספרים
+_stats_sources = {}
+
+
+def register_stats(name, source):
+    """מוסיף את ה-dict ש-source() מחזיר ל-/metrics כ-gauges בשם thought_bot_<name>_<key>"""
+    _stats_sources[name] = source
+
+
+# Handlers
+
+def _instrument_callback(callback):
+    if getattr(callback, '_instrumented', False):
+        return callback
+    name = callback.__name__
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        try:
+            return await callback(update, context)
+        except Exception as e:
+            HANDLER_ERRORS.inc(handler=name, error=type(e).__name__)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+
+    wrapper._instrumented = True
+    return wrapper
+
+
+def iter_handlers(application):
+    """כל ה-handlers שרשומים ב-Application, כולל אלה שבתוך שיחות"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            yield from _leaf_handlers(handler)
+
+
+def _leaf_handlers(handler):
+    if isinstance(handler, ConversationHandler):
+        for inner in handler.entry_points + handler.fallbacks:
+            yield from _leaf_handlers(inner)
+        for handlers in handler.states.values():
+            for inner in handlers:
+                yield from _leaf_handlers(inner)
+    else:
+        yield handler
+
+
+def instrument(application):
+    """עוטף את כל ה-handlers שרשומים ב-Application (כולל בתוך שיחות) במדידה"""
+    for handler in iter_handlers(application):
+        handler.callback = _instrument_callback(handler.callback)
+
+
+# Database
+
+def timed_operation(operation, func, /, *args, **kwargs):
+    """מריץ פונקציה מ-database.py, מודד אותה ומשייך אליה את פקודות MongoDB שהיא שולחת"""
+    token = current_operation.set(operation)
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        DB_OPERATION_SECONDS.observe(time.perf_counter() - started, operation=operation)
+        current_operation.reset(token)
+
+
+class CommandTimer(monitoring.CommandListener):
+    """מאזין לפקודות MongoDB (רץ ב-thread ששלח את הפקודה)"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        DB_COMMAND_SECONDS.observe(
+            event.duration_micros / 1e6,
+            operation=current_operation.get(), command=event.command_name
+        )
+
+    def failed(self, event):
+        DB_COMMAND_SECONDS.observe(
+            event.duration_micros / 1e6,
+            operation=current_operation.get(), command=event.command_name
+        )
+        DB_COMMAND_FAILURES.inc(operation=current_operation.get(), command=event.command_name)
+
+
+# Bot API
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest שסופר ומודד כל קריאה ל-Bot API"""
+
+    async def do_request(self, url, *args, **kwargs):
+        method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            code, payload = await super().do_request(url, *args, **kwargs)
+            status = str(code)
+            return code, payload
+        finally:
+            BOT_API_SECONDS.observe(time.perf_counter() - started, method=method)
+            BOT_API_REQUESTS.inc(method=method, status=status)
+
+
+# Output
+
+def render():
+    """כל המדדים בפורמט הטקסט של Prometheus"""
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    for source_name, source in _stats_sources.items():
+        for key, value in source().items():
+            if isinstance(value, (int, float)):
+                name = f"{PREFIX}{source_name}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def _averages(histogram, top=None):
+    totals = sorted(histogram.totals().items(), key=lambda entry: -entry[1][1])
+    return {
+        '/'.join(key): f"{count}x {total / count * 1000:.1f}ms"
+        for key, (count, total) in totals[:top]
+        if count
+    }
+
+
+def summary(top=10):
+    """תקציר ללוג: הכי הרבה זמן מצטבר לכל handler / פונקציה / פקודה, שגיאות וקריאות API"""
+    return {
+        'handlers': _averages(HANDLER_SECONDS, top),
+        'handler_errors': {'/'.join(key): count for key, count in HANDLER_ERRORS.values().items()},
+        'db_operations': _averages(DB_OPERATION_SECONDS, top),
+        'db_commands': _averages(DB_COMMAND_SECONDS, top),
+        'bot_api': {'/'.join(key): count for key, count in BOT_API_REQUESTS.values().items()},
+    }
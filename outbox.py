@@ -0,0 +1,228 @@
+"""
+outbox.py - Rate-limited outbound message pipeline
+
+Every reply_text / send_message / edit_message_text /
+edit_message_reply_markup in bot.py goes through here. Messages are
+queued per chat and sent by one worker per chat, throttled by a per-chat
+and a global token bucket (Telegram allows about 1 msg/s per chat and
+30 msg/s overall). RetryAfter pauses the chat for the requested time,
+network errors are retried with backoff, and consecutive small plain
+messages to the same chat are merged into one.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = float(os.getenv('OUTBOX_GLOBAL_RATE', '30'))
+CHAT_RATE = float(os.getenv('OUTBOX_CHAT_RATE', '1'))
+CHAT_BURST = int(os.getenv('OUTBOX_CHAT_BURST', '3'))
+MAX_RETRIES = int(os.getenv('OUTBOX_MAX_RETRIES', '3'))
+STATS_INTERVAL = int(os.getenv('OUTBOX_STATS_SECONDS', '60'))
+
+# מגבלת האורך של הודעת טלגרם
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TokenBucket:
+    """דלי אסימונים: rate אסימונים לשנייה, עד capacity ברצף"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def take(self):
+        """לוקח אסימון; מחזיר 0 אם הצליח, אחרת כמה שניות לחכות"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class _Outgoing:
+    """הודעה בתור"""
+
+    def __init__(self, kind, target, text, kwargs):
+        self.kind = kind          # 'send' / 'edit' / 'markup'
+        self.target = target      # bot + chat_id, או callback query
+        self.text = text
+        self.kwargs = kwargs
+        self.futures = [asyncio.get_running_loop().create_future()]
+        self.enqueued_at = time.monotonic()
+
+    def can_merge(self, other):
+        """אפשר לאחד הודעה רגילה בלי כפתורים עם ההודעה הבאה אחריה"""
+        return (
+            self.kind == other.kind == 'send'
+            and not self.kwargs.get('reply_markup')
+            and self.kwargs.get('parse_mode') == other.kwargs.get('parse_mode')
+            and len(self.text) + len(other.text) + 2 <= MAX_MESSAGE_LENGTH
+        )
+
+    def merge(self, other):
+        self.text = f"{self.text}\n\n{other.text}"
+        self.kwargs = other.kwargs
+        self.futures.extend(other.futures)
+
+
+class Outbox:
+    """תור שליחה מרכזי עם הגבלת קצב"""
+
+    def __init__(self, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE, chat_burst=CHAT_BURST):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._queues = {}    # chat_id -> deque של _Outgoing
+        self._buckets = {}   # chat_id -> TokenBucket
+        self._workers = {}   # chat_id -> asyncio.Task
+        self._pruned_at = time.monotonic()
+
+        # מדדים
+        self.sent = 0
+        self.merged = 0
+        self.retry_after = 0
+        self.failed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def send_message(self, bot, chat_id, text, **kwargs):
+        return await self._enqueue(chat_id, _Outgoing('send', (bot, chat_id), text, kwargs))
+
+    async def reply_text(self, message, text, **kwargs):
+        return await self.send_message(message.get_bot(), message.chat_id, text, **kwargs)
+
+    async def edit_message_text(self, query, text, **kwargs):
+        return await self._enqueue(query.message.chat_id, _Outgoing('edit', query, text, kwargs))
+
+    async def edit_message_reply_markup(self, query, reply_markup):
+        """עורך רק את המקלדת של ההודעה (בלי לשלוח שוב את הטקסט)"""
+        return await self._enqueue(
+            query.message.chat_id, _Outgoing('markup', query, None, {'reply_markup': reply_markup})
+        )
+
+    async def _enqueue(self, chat_id, outgoing):
+        self._queues.setdefault(chat_id, deque()).append(outgoing)
+        if chat_id not in self._workers:
+            self._prune()
+            self._workers[chat_id] = asyncio.create_task(self._worker(chat_id))
+        return await outgoing.futures[0]
+
+    def _prune(self, every=60):
+        """מוחק דליים של צ'אטים לא פעילים שכבר התמלאו (שקולים לדלי חדש)"""
+        now = time.monotonic()
+        if now - self._pruned_at < every:
+            return
+        self._pruned_at = now
+        for chat_id, bucket in list(self._buckets.items()):
+            idle = now - bucket.updated >= bucket.capacity / bucket.rate
+            if chat_id not in self._workers and idle and now >= bucket.paused_until:
+                del self._buckets[chat_id]
+
+    async def _worker(self, chat_id):
+        """שולח את התור של צ'אט אחד לפי הסדר, עד שהוא מתרוקן"""
+        queue = self._queues[chat_id]
+        bucket = self._buckets.setdefault(chat_id, TokenBucket(self.chat_rate, self.chat_burst))
+        try:
+            while queue:
+                outgoing = queue.popleft()
+                while queue and outgoing.can_merge(queue[0]):
+                    outgoing.merge(queue.popleft())
+                    self.merged += 1
+
+                await self._take(bucket)
+                await self._take(self.global_bucket)
+                self._record_wait(time.monotonic() - outgoing.enqueued_at)
+
+                try:
+                    result = await self._send(outgoing, bucket)
+                except Exception as e:
+                    self.failed += 1
+                    for future in outgoing.futures:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    self.sent += 1
+                    for future in outgoing.futures:
+                        if not future.done():
+                            future.set_result(result)
+        finally:
+            del self._workers[chat_id]
+            del self._queues[chat_id]
+
+    async def _send(self, outgoing, bucket):
+        """שליחה בפועל, כולל המתנה ל-RetryAfter וניסיונות חוזרים"""
+        attempt = 0
+        while True:
+            try:
+                if outgoing.kind == 'send':
+                    bot, chat_id = outgoing.target
+                    return await bot.send_message(chat_id=chat_id, text=outgoing.text, **outgoing.kwargs)
+                if outgoing.kind == 'markup':
+                    return await outgoing.target.edit_message_reply_markup(**outgoing.kwargs)
+                return await outgoing.target.edit_message_text(outgoing.text, **outgoing.kwargs)
+            except RetryAfter as e:
+                self.retry_after += 1
+                logger.warning("RetryAfter %ss, pausing chat", e.retry_after)
+                bucket.pause(e.retry_after)
+                await self._take(bucket)
+                await self._take(self.global_bucket)
+            except BadRequest:
+                # שגיאה בבקשה עצמה - אין טעם לנסות שוב
+                raise
+            except NetworkError:
+                # תקלות רשת זמניות (כולל TimedOut)
+                attempt += 1
+                if attempt > MAX_RETRIES:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+    async def _take(self, bucket):
+        while True:
+            wait = bucket.take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def _record_wait(self, seconds):
+        self._wait_total += seconds
+        self._wait_max = max(self._wait_max, seconds)
+
+    def stats(self):
+        """מדדי התור: עומק, זמני המתנה, ספירות"""
+        handled = self.sent + self.failed
+        return {
+            'queue_depth': sum(len(queue) for queue in self._queues.values()),
+            'active_chats': len(self._workers),
+            'sent': self.sent,
+            'merged': self.merged,
+            'retry_after': self.retry_after,
+            'failed': self.failed,
+            'wait_avg_ms': round(self._wait_total / handled * 1000, 1) if handled else 0.0,
+            'wait_max_ms': round(self._wait_max * 1000, 1),
+        }
+
+
+# מופע ברירת המחדל שכל הבוט משתמש בו
+outbox = Outbox()
+
+send_message = outbox.send_message
+reply_text = outbox.reply_text
+edit_message_text = outbox.edit_message_text
+edit_message_reply_markup = outbox.edit_message_reply_markup
+stats = outbox.stats
@@ -0,0 +1,203 @@
+"""
+profiling.py - Opt-in sampled profiling of handlers (cProfile + tracemalloc)
+
+Off by default. When PROFILE_SAMPLE_RATE > 0 (or after an admin sends
+/profile on), a random fraction of the updates reaching every handler is
+run under cProfile, with tracemalloc tracing the memory it allocates.
+Results are aggregated per handler over a window (PROFILE_WINDOW_SECONDS)
+and then written to PROFILE_DIR:
+
+    <timestamp>.txt                 top functions by cumulative time and
+                                    top allocation sites, for every handler
+    <timestamp>-<handler>.prof      the aggregated pstats, for snakeviz etc.
+
+cProfile profiles the whole thread, so only one update is profiled at a
+time (a sample that comes while another is running is skipped), and the
+profile of a sampled update also contains whatever other coroutines ran
+while it was awaiting. Time spent in the DB thread pool shows up as the
+await of the executor, and time talking to Telegram as the await of httpx.
+While a sample runs the whole process is slower (both tracers are
+process-wide), so keep the rate low in production - 0.01 is plenty for a
+window of a few minutes.
+
+/profile [on [rate] | off | dump] - admin only (ADMIN_IDS), without
+arguments shows the status.
+"""
+import asyncio
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_WINDOW_SECONDS = int(os.getenv('PROFILE_WINDOW_SECONDS', '300'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '25'))
+# עומק ה-traceback שנשמר לכל הקצאה
+PROFILE_TRACEBACK_FRAMES = int(os.getenv('PROFILE_TRACEBACK_FRAMES', '1'))
+
+# משתמשים שמורשים להפעיל /profile
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
+
+# הקצאות של tracemalloc עצמו ושל import לא מעניינות
+_ALLOCATION_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+class Profiler:
+    """דגימה של עדכונים לכל handler וצבירה של התוצאות לחלון זמן"""
+
+    def __init__(self, sample_rate=PROFILE_SAMPLE_RATE, directory=PROFILE_DIR, top=PROFILE_TOP):
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.top = top
+        self._active = False
+        self._reset()
+
+    @property
+    def enabled(self):
+        return self.sample_rate > 0
+
+    def _reset(self):
+        self._stats = {}                       # handler -> pstats.Stats מצטבר
+        self._allocations = {}                 # handler -> Counter(אתר הקצאה -> bytes)
+        self._samples = Counter()              # handler -> מספר עדכונים שנדגמו
+        self._window_started = time.time()
+
+    def wrap(self, callback):
+        """עוטף callback של handler בדגימה"""
+        if getattr(callback, '_profiled', False):
+            return callback
+        name = callback.__name__
+
+        @functools.wraps(callback)
+        async def wrapper(update, context):
+            if self._active or not self.enabled or random.random() >= self.sample_rate:
+                return await callback(update, context)
+            return await self._profile(name, callback, update, context)
+
+        wrapper._profiled = True
+        return wrapper
+
+    async def _profile(self, name, callback, update, context):
+        self._active = True
+        # אם מישהו אחר כבר מריץ tracemalloc - לא עוצרים אותו
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(PROFILE_TRACEBACK_FRAMES)
+        before = tracemalloc.take_snapshot()
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return await callback(update, context)
+        finally:
+            profile.disable()
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            self._active = False
+            self._record(name, profile, before, after)
+
+    def _record(self, name, profile, before, after):
+        if name in self._stats:
+            self._stats[name].add(profile)
+        else:
+            self._stats[name] = pstats.Stats(profile, stream=io.StringIO())
+
+        allocations = self._allocations.setdefault(name, Counter())
+        before = before.filter_traces(_ALLOCATION_FILTERS)
+        after = after.filter_traces(_ALLOCATION_FILTERS)
+        for stat in after.compare_to(before, 'lineno'):
+            if stat.size_diff > 0:
+                frame = stat.traceback[0]
+                allocations[f"{frame.filename}:{frame.lineno}"] += stat.size_diff
+        self._samples[name] += 1
+
+    def status(self):
+        return {
+            'sample_rate': self.sample_rate,
+            'samples': dict(self._samples),
+            'window_seconds': int(time.time() - self._window_started),
+            'directory': self.directory,
+        }
+
+    def take_window(self):
+        """סוגר את החלון הנוכחי ומתחיל חדש; מחזיר את מה שנצבר בו (או None אם אין דגימות)"""
+        window = (self._window_started, self._stats, self._allocations, self._samples)
+        self._reset()
+        return window if window[3] else None
+
+    def write_report(self, window):
+        """כותב חלון לדיסק ומחזיר את נתיב הדוח (פעולת קבצים - להריץ ב-thread)"""
+        window_started, stats, allocations, samples = window
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        lines = [
+            f"Profile window {datetime.fromtimestamp(window_started):%Y-%m-%d %H:%M:%S} - "
+            f"{datetime.now():%H:%M:%S}, sample rate {self.sample_rate}",
+            '',
+        ]
+        for name, count in samples.most_common():
+            stats[name].dump_stats(os.path.join(self.directory, f"{stamp}-{_safe(name)}.prof"))
+            lines.append(f"== {name}: {count} samples ==")
+            lines.append('-- top functions by cumulative time --')
+            lines.append(self._top_functions(stats[name]))
+            lines.append('-- top allocation sites (net bytes still allocated at the end) --')
+            for site, size in allocations[name].most_common(self.top):
+                lines.append(f"{size / 1024:10.1f} KiB  {site}")
+            lines.append('')
+
+        path = os.path.join(self.directory, f"{stamp}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        return path
+
+    async def dump(self):
+        """סוגר את החלון וכותב אותו לדיסק בלי לחסום את ה-event loop"""
+        window = self.take_window()
+        if window is None:
+            return None
+        path = await asyncio.get_running_loop().run_in_executor(None, self.write_report, window)
+        logger.info("Profile report written to %s", path)
+        return path
+
+    def _top_functions(self, stats):
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.strip_dirs().sort_stats('cumulative').print_stats(self.top)
+        # בלי שורות הכותרת של pstats
+        return stream.getvalue().split('\n', 1)[-1].strip('\n')
+
+
+def _safe(name):
+    return re.sub(r'[^\w.-]', '_', name)
+
+
+profiler = Profiler()
+
+
+def instrument(application):
+    """עוטף את כל ה-handlers שרשומים ב-Application בדגימה (לא עושה כלום כשהדגימה כבויה)"""
+    for handler in metrics.iter_handlers(application):
+        handler.callback = profiler.wrap(handler.callback)
+
+
+async def rotate(context):
+    """Job: כותב את הדוח של החלון שהסתיים"""
+    await profiler.dump()
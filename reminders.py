@@ -0,0 +1,221 @@
+"""
+reminders.py - Push-based reminder scheduler
+
+Reminders are delivered by the Application job queue at their
+reminder_date, for all users, instead of being polled whenever a user
+opens a view. Every REMINDER_WINDOW_MINUTES the next window of due
+reminders is streamed from the reminders collection in batches of
+REMINDER_BATCH_SIZE (one range scan over the partial index on unsent
+reminders) and each one becomes a run_once job; set_reminder adds jobs
+directly.
+
+Delivery is safe with several bot instances on the same database. Before
+sending, an instance claims the reminder atomically (claimed_by =
+leader.INSTANCE_ID until now + REMINDER_LEASE_SECONDS), so a reminder that is
+due in two instances, or fired twice in one, is sent by one of them. It
+is marked sent after delivery; a failed send releases the claim with an
+exponential backoff (REMINDER_RETRY_BASE_SECONDS, doubling up to
+REMINDER_RETRY_MAX_SECONDS) and is given up after REMINDER_MAX_ATTEMPTS.
+Every REMINDER_SWEEP_SECONDS a sweep claims whatever is due and unclaimed
+- retries, claims of an instance that died, reminders no job was
+scheduled for - in batches of REMINDER_CLAIM_BATCH, with at most
+REMINDER_CONCURRENCY deliveries in flight. Delivery is at least once: an
+instance that crashes between the send and the mark has its claim
+reclaimed when the lease expires, and the reminder is sent again.
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+import async_database as db
+import leader
+
+logger = logging.getLogger(__name__)
+
+REMINDER_WINDOW = timedelta(minutes=int(os.getenv('REMINDER_WINDOW_MINUTES', '10')))
+
+# תפיסה של תזכורת לשליחה - מעבר לזה נחשבת לתהליך שנפל ונתפסת מחדש
+REMINDER_LEASE = timedelta(seconds=int(os.getenv('REMINDER_LEASE_SECONDS', '120')))
+REMINDER_SWEEP_SECONDS = int(os.getenv('REMINDER_SWEEP_SECONDS', '60'))
+REMINDER_CLAIM_BATCH = int(os.getenv('REMINDER_CLAIM_BATCH', '50'))
+REMINDER_CONCURRENCY = int(os.getenv('REMINDER_CONCURRENCY', '10'))
+REMINDER_MAX_ATTEMPTS = int(os.getenv('REMINDER_MAX_ATTEMPTS', '5'))
+REMINDER_RETRY_BASE_SECONDS = int(os.getenv('REMINDER_RETRY_BASE_SECONDS', '30'))
+REMINDER_RETRY_MAX_SECONDS = int(os.getenv('REMINDER_RETRY_MAX_SECONDS', '3600'))
+
+# תזכורות שנשלחו מסומנות ב-DB יחד, בעדכון אחד, אחרי השהיה קצרה
+MARK_SENT_DELAY = 1.0
+
+
+def _job_name(item_id):
+    return f"reminder_{item_id}"
+
+
+def retry_delay(attempts):
+    """ההשהיה לפני ניסיון נוסף אחרי attempts ניסיונות שנכשלו"""
+    seconds = REMINDER_RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1)
+    return timedelta(seconds=min(seconds, REMINDER_RETRY_MAX_SECONDS))
+
+
+def is_due(item, now=None):
+    """בודק שהתזכורת עדיין בתוקף (לא נשלחה, לא נמחקה, הגיע זמנה)"""
+    now = now or datetime.now()
+    # reminder_date נמחק מהפריט כשהתזכורת מסומנת כנשלחה
+    return bool(
+        item
+        and item.get('reminder_date')
+        and item.get('status') != 'deleted'
+        and item['reminder_date'] <= now
+    )
+
+
+class ReminderScheduler:
+    """מתזמן תזכורות על גבי ה-job queue של האפליקציה"""
+
+    def __init__(self, job_queue, deliver, window=REMINDER_WINDOW, owner=leader.INSTANCE_ID):
+        """
+        deliver - coroutine (bot, item) ששולחת את התזכורת למשתמש
+        owner - המזהה של ה-instance בתפיסות
+        """
+        self.job_queue = job_queue
+        self.deliver = deliver
+        self.window = window
+        self.owner = owner
+        self._sent = set()  # נשלחו, עוד לא סומנו ב-DB
+        self._mark_scheduled = False
+        self._slots = asyncio.Semaphore(REMINDER_CONCURRENCY)
+
+    def start(self):
+        """טעינה מיידית ואז טעינה מחזורית של החלון הבא, וסריקה מחזורית של מה שלא נשלח
+
+        שתיהן רק ב-instance שמחזיק ב-lease (leader.py); תזכורות ש-set_reminder מתזמן
+        נשלחות מכל instance, והתפיסה מונעת כפילויות
+        """
+        leader.run_repeating(
+            self.job_queue,
+            self._load_window,
+            interval=self.window,
+            first=0,
+            name='reminders_load_window'
+        )
+        leader.run_repeating(
+            self.job_queue,
+            self._sweep,
+            interval=REMINDER_SWEEP_SECONDS,
+            first=REMINDER_SWEEP_SECONDS,
+            name='reminders_sweep'
+        )
+
+    def schedule(self, item_id, user_id, reminder_date):
+        """מתזמן (או מחליף) תזכורת לפריט - נקרא גם מ-set_reminder"""
+        item_id = str(item_id)
+        now = datetime.now()
+
+        self.cancel(item_id)
+
+        # תזכורות רחוקות ייטענו בחלון שלהן
+        if reminder_date > now + 2 * self.window:
+            return
+
+        self.job_queue.run_once(
+            self._fire,
+            when=max(0.0, (reminder_date - now).total_seconds()),
+            data=item_id,
+            name=_job_name(item_id),
+            chat_id=user_id
+        )
+
+    def cancel(self, item_id):
+        """מבטל תזכורת מתוזמנת לפריט"""
+        for job in self.job_queue.get_jobs_by_name(_job_name(item_id)):
+            job.schedule_removal()
+
+    def is_scheduled(self, item_id):
+        return bool(self.job_queue.get_jobs_by_name(_job_name(item_id)))
+
+    async def _load_window(self, context):
+        """טוען מה-DB תזכורות שמועדן בחלון הקרוב"""
+        # חלון כפול כדי שתזכורת בקצה החלון לא תחכה לטעינה הבאה
+        until = datetime.now() + 2 * self.window
+        scheduled = 0
+        # ב-batches - תזכורות שכבר הגיע זמנן יוצאות בזמן שהבאות עוד נטענות
+        async for reminder in db.iter_due_reminders(until):
+            item_id = str(reminder['_id'])
+            if not self.is_scheduled(item_id) and item_id not in self._sent:
+                self.schedule(item_id, reminder['user_id'], reminder['due_at'])
+                scheduled += 1
+        if scheduled:
+            logger.info("Scheduled %d reminders until %s", scheduled, until)
+
+    async def _fire(self, context):
+        """שליחת תזכורת בזמנה"""
+        item_id = context.job.data
+        # תפוסה כבר (instance אחר / ניסיון קודם שעוד לא פג) או שנשלחה - לא שולחים
+        for reminder in await db.claim_reminders(self.owner, REMINDER_LEASE, item_id=item_id):
+            await self._deliver_claimed(context.bot, reminder)
+
+    async def _sweep(self, context):
+        """תופס ב-batches תזכורות שהגיע זמנן ואינן תפוסות, ושולח במקביל (עד REMINDER_CONCURRENCY)"""
+        delivered = 0
+        while True:
+            claimed = await db.claim_reminders(self.owner, REMINDER_LEASE, limit=REMINDER_CLAIM_BATCH)
+            await asyncio.gather(*(self._deliver_claimed(context.bot, reminder) for reminder in claimed))
+            delivered += len(claimed)
+            if len(claimed) < REMINDER_CLAIM_BATCH:
+                break
+        if delivered:
+            logger.info("Reminder sweep handled %d reminders", delivered)
+
+    async def _deliver_claimed(self, bot, reminder):
+        """שולח תזכורת שנתפסה; בכישלון משחרר אותה לניסיון נוסף"""
+        item_id = str(reminder['_id'])
+        async with self._slots:
+            item = await db.get_item_by_id(item_id)
+
+            # ייתכן שהפריט נמחק / התזכורת שונתה מאז התזמון - רק משחררים את התזכורת
+            if is_due(item, datetime.now() + timedelta(seconds=1)):
+                try:
+                    await self.deliver(bot, item)
+                except Exception:
+                    await self._retry(item_id, reminder['attempts'])
+                    return
+        self._done(item_id)
+
+    async def _retry(self, item_id, attempts):
+        """מחזיר תזכורת שלא נשלחה לתפיסה אחרי backoff, או מוותר עליה אחרי REMINDER_MAX_ATTEMPTS"""
+        if attempts >= REMINDER_MAX_ATTEMPTS:
+            logger.exception("Giving up on reminder %s after %d attempts", item_id, attempts)
+            self._done(item_id)
+            return
+        delay = retry_delay(attempts)
+        logger.exception("Failed to deliver reminder %s, retrying in %s", item_id, delay)
+        try:
+            await db.release_reminder(item_id, self.owner, delay)
+        except Exception:
+            # התפיסה תפוג מעצמה ותיתפס שוב בסריקה
+            logger.exception("Failed to release reminder %s", item_id)
+
+    def _done(self, item_id):
+        """התזכורת טופלה - תסומן כנשלחה בסימון המרוכז הבא"""
+        self._sent.add(item_id)
+        self._schedule_mark(MARK_SENT_DELAY)
+
+    def _schedule_mark(self, when):
+        """מתזמן סימון, אם אין כבר אחד שממתין"""
+        if not self._mark_scheduled:
+            self._mark_scheduled = True
+            self.job_queue.run_once(self._mark_sent, when=when)
+
+    async def _mark_sent(self, context):
+        """מסמן בבת אחת את כל התזכורות שנשלחו מאז הסימון הקודם"""
+        # תזכורת שמסתיימת בזמן שהסימון הזה ממתין ל-DB מתזמנת סימון משלה
+        self._mark_scheduled = False
+        item_ids = list(self._sent)
+        try:
+            await db.mark_reminders_sent(item_ids)
+        except Exception:
+            logger.exception("Failed to mark %d reminders as sent, retrying", len(item_ids))
+            self._schedule_mark(MARK_SENT_DELAY * 5)
+            return
+        self._sent.difference_update(item_ids)
@@ -0,0 +1,143 @@
+"""
+review.py - Weekly review sessions
+
+A session keeps the prefetched review items in memory (at most
+REVIEW_MAX_ITEMS documents at a time; the next chunk is loaded when the
+current one runs out) and buffers the user's decisions. Every decision
+is first appended to the review_log (one small insert), and the items
+are updated together every REVIEW_FLUSH_EVERY decisions and at the end of
+the session, which then drops those log entries. Sessions live in a
+module-level registry rather than in user_data, so the idle-flush job and
+shutdown can still write the decisions of a session the user abandoned;
+decisions of a process that died before writing them are still in the
+log, and recover() writes them when the bot starts.
+"""
+import logging
+import os
+import time
+
+import async_database as db
+
+logger = logging.getLogger(__name__)
+
+REVIEW_MAX_ITEMS = int(os.getenv('REVIEW_MAX_ITEMS', '100'))
+REVIEW_FLUSH_EVERY = int(os.getenv('REVIEW_FLUSH_EVERY', '10'))
+REVIEW_IDLE_FLUSH = int(os.getenv('REVIEW_IDLE_FLUSH_SECONDS', '300'))
+
+# user_id -> ReviewSession
+_sessions = {}
+
+
+class ReviewSession:
+    """סיקור שבועי פעיל של משתמש אחד"""
+
+    def __init__(self, user_id, items):
+        self.user_id = user_id
+        self.items = items
+        self.index = 0       # מיקום בתוך החלק הטעון
+        self.position = 0    # כמה פריטים עברנו בסך הכל
+        self.exhausted = len(items) < REVIEW_MAX_ITEMS
+        self.pending = []    # [(log_id, item_id, action)] - ב-review_log, עוד לא נכתבו לפריטים
+        self.touched = time.monotonic()
+
+    @property
+    def total(self):
+        """סך הפריטים לתצוגה (עם + אם יש עוד חלקים לטעון)"""
+        seen = self.position - self.index + len(self.items)
+        return str(seen) if self.exhausted else f"{seen}+"
+
+    def current(self):
+        if self.index < len(self.items):
+            return self.items[self.index]
+        return None
+
+    async def advance(self):
+        """עובר לפריט הבא, וטוען את החלק הבא כשהנוכחי נגמר"""
+        self.touched = time.monotonic()
+        self.index += 1
+        self.position += 1
+        if self.index >= len(self.items) and not self.exhausted:
+            last = self.items[-1]
+            self.items = await db.get_items_for_review(
+                self.user_id,
+                after=(last['created_at'], str(last['_id'])),
+                limit=REVIEW_MAX_ITEMS
+            )
+            self.index = 0
+            self.exhausted = len(self.items) < REVIEW_MAX_ITEMS
+
+    async def decide(self, item_id, action):
+        """רושם החלטה (archive / keep / delete) ב-review_log, וכותב לפריטים כל REVIEW_FLUSH_EVERY החלטות"""
+        log_id = await db.log_review_decision(self.user_id, item_id, action)
+        self.pending.append((log_id, item_id, action))
+        if len(self.pending) >= REVIEW_FLUSH_EVERY:
+            await self.flush()
+
+    async def flush(self):
+        """כותב את כל ההחלטות שבתור לפריטים ומוחק אותן מה-review_log"""
+        decisions, self.pending = self.pending, []
+        if not decisions:
+            return
+        try:
+            await db.apply_review_decisions(
+                self.user_id,
+                [(item_id, action) for _, item_id, action in decisions],
+                [log_id for log_id, _, _ in decisions]
+            )
+        except Exception:
+            # מחזיר לתור כדי שהניסיון הבא יכתוב אותן
+            self.pending = decisions + self.pending
+            raise
+
+
+async def start_session(user_id, items):
+    """פותח סיקור חדש (ושומר קודם את ההחלטות של סיקור קודם שלא הסתיים)"""
+    previous = _sessions.get(user_id)
+    if previous:
+        await previous.flush()
+    session = ReviewSession(user_id, items)
+    _sessions[user_id] = session
+    return session
+
+
+def get_session(user_id):
+    return _sessions.get(user_id)
+
+
+async def finish_session(session):
+    """מסיים סיקור: כותב את ההחלטות ומסיר אותו מהרישום"""
+    await session.flush()
+    if _sessions.get(session.user_id) is session:
+        del _sessions[session.user_id]
+
+
+async def flush_idle_sessions(context=None):
+    """job תקופתי: כותב החלטות של סיקורים שהמשתמש נטש, ומסיר אותם"""
+    now = time.monotonic()
+    for user_id, session in list(_sessions.items()):
+        if now - session.touched < REVIEW_IDLE_FLUSH:
+            continue
+        try:
+            await finish_session(session)
+        except Exception:
+            logger.exception("Failed to flush review session of user %s", user_id)
+
+
+async def recover(context=None):
+    """בהפעלה: כותב החלטות שנשארו ב-review_log מתהליך שנפל לפני שכתב אותן"""
+    try:
+        replayed = await db.replay_review_log()
+    except Exception:
+        logger.exception("Failed to replay the review log")
+        return
+    if replayed:
+        logger.info("Replayed %d review decisions left in the review log", replayed)
+
+
+async def flush_all():
+    """כותב את ההחלטות של כל הסיקורים הפתוחים (לקריאה בכיבוי)"""
+    for user_id, session in list(_sessions.items()):
+        try:
+            await session.flush()
+        except Exception:
+            logger.exception("Failed to flush review session of user %s", user_id)
@@ -0,0 +1,259 @@
+"""
+search.py - Tokenizing, ranking and the in-memory search index
+
+Every item stores `search_terms`: the distinct index terms (see
+tokenizer.py) of its content and tags. The multikey index on
+(user_id, search_terms) acts as an inverted index in MongoDB, and a query
+word matches a term by prefix with an anchored, escaped regex.
+
+On top of that, SearchIndex keeps a per-user inverted index in memory.
+It is built lazily on a user's first search, kept up to date by the
+write functions in database.py, and evicted LRU-style, so most searches
+never reach MongoDB. Results are ranked by (score, created_at, _id) and
+paged by keyset on that key.
+"""
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import tokenizer
+
+# גרסת פורמט search_terms - כשמעלים אותה מוסיפים migration שמריץ backfill_search_terms
+TERMS_VERSION = 2
+
+# אינדקס בזיכרון
+SEARCH_INDEX_MAX_USERS = int(os.getenv('SEARCH_INDEX_MAX_USERS', '200'))
+SEARCH_INDEX_MAX_ITEMS = int(os.getenv('SEARCH_INDEX_MAX_ITEMS', '20000'))
+SEARCH_INDEX_TTL = int(os.getenv('SEARCH_INDEX_TTL_SECONDS', '3600'))
+
+# השדות שנשמרים בזיכרון - מה ש-format_item והמקלדות צריכים
+INDEX_PROJECTION = {
+    'user_id': 1, 'type': 1, 'content': 1, 'tags': 1, 'status': 1,
+    'created_at': 1, 'reminder_date': 1
+}
+
+
+def item_terms(content, tags=None):
+    """מחזיר את מונחי החיפוש של פריט (ללא כפילויות)"""
+    terms = tokenizer.index_terms(content)
+    for tag in tags or []:
+        terms.update(tokenizer.index_terms(tag))
+    return sorted(terms)
+
+
+def query_terms(query):
+    """מחזיר את מילות השאילתה (ללא כפילויות, לפי הסדר)"""
+    return list(dict.fromkeys(tokenizer.tokenize(query)))
+
+
+def prefix_patterns(terms):
+    """ביטויים רגולריים מעוגנים (ומוגנים) לחיפוש לפי תחילית באינדקס"""
+    return [re.compile('^' + re.escape(term)) for term in terms]
+
+
+def score(words, tag_words, terms):
+    """ציון רלוונטיות: התאמה מלאה שווה יותר מתחילית, ותגית יותר מתוכן"""
+    total = 0
+    for term in terms:
+        if term in words:
+            total += 3
+        elif any(word.startswith(term) for word in words):
+            total += 1
+        else:
+            continue
+        if any(word.startswith(term) for word in tag_words):
+            total += 1
+    return total
+
+
+class UserIndex:
+    """אינדקס הפוך של משתמש אחד: מונח -> מזהי פריטים"""
+
+    def __init__(self):
+        self.docs = {}
+        self.doc_terms = {}
+        self.tag_terms = {}
+        self.postings = {}
+        self.terms = []  # ממוין, לחיפוש תחיליות עם bisect
+
+    def add(self, doc):
+        item_id = str(doc['_id'])
+        self.remove(item_id)
+        terms = set(item_terms(doc.get('content'), doc.get('tags')))
+        self.docs[item_id] = doc
+        self.doc_terms[item_id] = terms
+        self.tag_terms[item_id] = set(item_terms('', doc.get('tags')))
+        for term in terms:
+            if term not in self.postings:
+                self.postings[term] = set()
+                bisect.insort(self.terms, term)
+            self.postings[term].add(item_id)
+
+    def remove(self, item_id):
+        self.docs.pop(item_id, None)
+        self.tag_terms.pop(item_id, None)
+        for term in self.doc_terms.pop(item_id, ()):
+            ids = self.postings[term]
+            ids.discard(item_id)
+            if not ids:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+
+    def update(self, item_id, fields):
+        doc = self.docs.get(item_id)
+        if doc is None:
+            return
+        doc = {**doc, **fields}
+        if 'content' in fields or 'tags' in fields:
+            self.add(doc)
+        else:
+            self.docs[item_id] = doc
+
+    def search(self, terms, limit, after=None, ascending=False):
+        """עד limit תוצאות (עותקים עם 'score') לפי (score, created_at, _id) מהגבוה לנמוך
+
+        after - המפתח (score, created_at, item_id) של התוצאה שממנה ממשיכים, בכיוון המיון
+        """
+        candidates = set()
+        for term in terms:
+            index = bisect.bisect_left(self.terms, term)
+            while index < len(self.terms) and self.terms[index].startswith(term):
+                candidates.update(self.postings[self.terms[index]])
+                index += 1
+
+        keys = []
+        for item_id in candidates:
+            points = score(self.doc_terms[item_id], self.tag_terms[item_id], terms)
+            if not points:
+                continue
+            key = (points, self.docs[item_id]['created_at'], item_id)
+            if after is None or (key > after if ascending else key < after):
+                keys.append(key)
+        top = heapq.nsmallest(limit, keys) if ascending else heapq.nlargest(limit, keys)
+        return [{**self.docs[item_id], 'score': points} for points, _, item_id in top]
+
+
+# סימון למשתמש שיש לו יותר מדי פריטים לאינדקס בזיכרון
+_OVERSIZED = object()
+
+
+class SearchIndex:
+    """אינדקסים בזיכרון לכל המשתמשים, עם פינוי LRU ו-TTL
+
+    בטוח לשימוש מכמה threads (הפונקציות ב-database.py רצות על thread pool).
+    """
+
+    def __init__(self, max_users=SEARCH_INDEX_MAX_USERS, max_items=SEARCH_INDEX_MAX_ITEMS,
+                 ttl=SEARCH_INDEX_TTL):
+        self.max_users = max_users
+        self.max_items = max_items
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user_id -> (UserIndex | _OVERSIZED, built_at)
+        self._owners = {}            # item_id -> user_id
+        self._building = {}          # user_id -> שינויים שהגיעו בזמן הבנייה
+
+    def _get(self, user_id):
+        entry = self._users.get(user_id)
+        if entry is None:
+            return None
+        index, built_at = entry
+        if time.monotonic() - built_at > self.ttl:
+            self._evict(user_id)
+            return None
+        self._users.move_to_end(user_id)
+        return index
+
+    def _evict(self, user_id):
+        index, _ = self._users.pop(user_id)
+        if index is not _OVERSIZED:
+            for item_id in index.docs:
+                self._owners.pop(item_id, None)
+
+    def search(self, user_id, terms, limit, after=None, ascending=False):
+        """מחזיר תוצאות מהזיכרון (ראה UserIndex.search), או None אם אין אינדקס למשתמש"""
+        with self._lock:
+            index = self._get(user_id)
+            if index is None or index is _OVERSIZED:
+                return None
+            return index.search(terms, limit, after, ascending)
+
+    def begin_build(self, user_id):
+        """מסמן שמתחילה בנייה; False אם אין צורך (כבר נבנה / בבנייה / גדול מדי / max_users 0)"""
+        with self._lock:
+            if not self.max_users or self._get(user_id) is not None or user_id in self._building:
+                return False
+            self._building[user_id] = []
+            return True
+
+    def abort_build(self, user_id):
+        with self._lock:
+            self._building.pop(user_id, None)
+
+    def finish_build(self, user_id, docs):
+        """בונה את האינדקס מהמסמכים ומחיל שינויים שהגיעו בזמן הטעינה"""
+        with self._lock:
+            pending = self._building.pop(user_id, [])
+            if len(docs) > self.max_items:
+                index = _OVERSIZED
+            else:
+                index = UserIndex()
+                for doc in docs:
+                    index.add(doc)
+                for op, arg, fields in pending:
+                    self._apply(index, op, arg, fields)
+                for item_id in index.docs:
+                    self._owners[item_id] = user_id
+
+            self._users[user_id] = (index, time.monotonic())
+            while len(self._users) > self.max_users:
+                self._evict(next(iter(self._users)))
+
+    def _apply(self, index, op, arg, fields):
+        if op == 'add':
+            index.add(arg)
+        elif op == 'remove':
+            index.remove(arg)
+        else:
+            index.update(arg, fields)
+
+    def _record(self, user_id, op, arg, fields=None):
+        """מחיל שינוי על אינדקס קיים, או שומר אותו לבנייה שבתהליך"""
+        if user_id is None:
+            # שינוי לפי item_id של פריט שעדיין לא באינדקס - רלוונטי רק לבניות פתוחות
+            for pending in self._building.values():
+                pending.append((op, arg, fields))
+            return
+        if user_id in self._building:
+            self._building[user_id].append((op, arg, fields))
+        index = self._get(user_id)
+        if index is not None and index is not _OVERSIZED:
+            self._apply(index, op, arg, fields)
+            if op == 'add':
+                self._owners[str(arg['_id'])] = user_id
+            elif op == 'remove':
+                self._owners.pop(arg, None)
+
+    def add(self, doc):
+        doc = {field: doc.get(field) for field in ('_id', *INDEX_PROJECTION)}
+        with self._lock:
+            self._record(doc['user_id'], 'add', doc)
+
+    def update(self, item_id, **fields):
+        item_id = str(item_id)
+        with self._lock:
+            self._record(self._owners.get(item_id), 'update', item_id, fields)
+
+    def remove(self, item_id):
+        item_id = str(item_id)
+        with self._lock:
+            self._record(self._owners.get(item_id), 'remove', item_id)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._owners.clear()
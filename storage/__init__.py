@@ -0,0 +1,30 @@
+"""
+storage - Pluggable storage backends behind database.py
+
+The backend is chosen with STORAGE_BACKEND:
+    mongo  - MongoDB at MONGODB_URI (default)
+    sqlite - a local SQLite file at SQLITE_PATH, for single-node deployments
+    memory - plain dicts in the process, for benchmarks and local runs
+"""
+import os
+
+from storage.base import Storage
+
+__all__ = ['BACKENDS', 'Storage', 'create']
+
+BACKENDS = ('mongo', 'sqlite', 'memory')
+
+
+def create(name=None):
+    """יוצר את ה-backend לפי השם (או לפי STORAGE_BACKEND)"""
+    name = name or os.getenv('STORAGE_BACKEND', 'mongo')
+    if name == 'mongo':
+        from storage.mongo import MongoStorage
+        return MongoStorage()
+    if name == 'sqlite':
+        from storage.sqlite import SQLiteStorage
+        return SQLiteStorage(os.getenv('SQLITE_PATH', 'thought_bot.db'))
+    if name == 'memory':
+        from storage.memory import MemoryStorage
+        return MemoryStorage()
+    raise ValueError(f"Unknown storage backend: {name} (expected one of {', '.join(BACKENDS)})")
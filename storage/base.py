@@ -0,0 +1,250 @@
+"""
+storage/base.py - The storage interface
+
+database.py keeps the caches, the in-memory search index and the
+business rules (what "today" means, when a review is due); a Storage
+backend only reads and writes documents. Documents are plain dicts shaped
+like the MongoDB ones - `_id` is an ObjectId and dates are naive
+datetimes with millisecond precision - so every backend hands the same
+thing to database.py and the handlers.
+
+Item ids are passed in as strings (as they arrive in callback data).
+
+Items are kept in two tiers. The hot tier holds everything the views
+read; deleted items (after a grace period) and long-archived items are
+moved to the cold tier by move_to_cold, so the hot indexes stay small.
+Reads that take cold=True go to the cold tier; deleted cold items carry
+expire_at and are purged once it passes.
+
+Reminders are kept apart from the items, one document per item that has
+a reminder (its _id is the item id), so finding the due ones is a range
+scan over the undelivered reminders only. The item keeps reminder_date
+just for display, and only until the reminder is sent.
+"""
+from abc import ABC, abstractmethod
+
+
+def bson_time(value):
+    """מעגל datetime לאלפיות שנייה, כמו ש-MongoDB שומר תאריכים"""
+    if value is None:
+        return None
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def project(doc, projection):
+    """מחזיר עותק של המסמך עם השדות שב-projection בלבד (ו-_id)"""
+    if projection is None:
+        return dict(doc)
+    result = {'_id': doc['_id']}
+    for field in projection:
+        if field in doc:
+            result[field] = doc[field]
+    return result
+
+
+class Storage(ABC):
+    """ממשק אחסון משותף ל-MongoDB, SQLite ולזיכרון"""
+
+    name = None
+
+    # Users
+
+    @abstractmethod
+    def get_or_create_user(self, user_id, defaults):
+        """מחזיר את מסמך המשתמש, ויוצר אותו עם defaults אם אינו קיים (אטומי)"""
+
+    @abstractmethod
+    def get_user(self, user_id):
+        """מחזיר את מסמך המשתמש או None"""
+
+    @abstractmethod
+    def update_user(self, user_id, fields):
+        """מעדכן שדות במסמך המשתמש"""
+
+    @abstractmethod
+    def get_user_with_items(self, user_id, statuses, since, limit, projection=None):
+        """מחזיר (user או None, עד limit פריטים מהחדש לישן) - בסבב אחד כשאפשר"""
+
+    # Items
+
+    @abstractmethod
+    def insert_item(self, item):
+        """שומר פריט חדש, מוסיף לו _id ומחזיר את ה-id כמחרוזת"""
+
+    @abstractmethod
+    def get_item(self, item_id, projection=None, cold=False):
+        """מחזיר פריט לפי id או None (cold - מה-cold)"""
+
+    @abstractmethod
+    def get_items(self, item_ids, projection=None):
+        """הפריטים הקיימים מתוך item_ids (בלי סדר מובטח)"""
+
+    @abstractmethod
+    def update_item(self, item_id, fields):
+        """מעדכן שדות בפריט אחד
+
+        מחזיר את הפריט כפי שהיה לפני העדכון (לפחות user_id, status ו-tags), או None אם אינו קיים
+        """
+
+    @abstractmethod
+    def update_items(self, updates, ordered=True):
+        """מעדכן כמה פריטים בכתיבה אחת: [(item_id, fields)]"""
+
+    @abstractmethod
+    def update_user_items(self, user_id, item_ids, fields):
+        """מעדכן את אותם שדות בכמה פריטים של משתמש בפקודה אחת; מחזיר כמה פריטים עודכנו
+
+        פריטים של משתמשים אחרים ופריטים מחוקים לא מתעדכנים
+        """
+
+    @abstractmethod
+    def item_owners(self, item_ids):
+        """ה-user_ids של הפריטים (set)"""
+
+    @abstractmethod
+    def find_items(self, user_id, statuses, since=None, after=None, ascending=False,
+                   limit=None, projection=None, tag=None, cold=False):
+        """פריטים של משתמש לפי סטטוס, ממוינים לפי (created_at, _id)
+
+        since - רק פריטים שנוצרו מאז
+        after - (created_at, item_id) להמשך בעימוד keyset, בכיוון המיון
+        tag - רק פריטים עם התגית (התאמה מדויקת, באינדקס (user_id, tags, created_at))
+        cold - מה-cold במקום מה-hot (בלי tag)
+        """
+
+    @abstractmethod
+    def find_items_by_terms(self, user_id, terms, limit, after=None, ascending=False, projection=None,
+                            cold=False):
+        """פריטים שאינם מחוקים עם מונח חיפוש שמתחיל באחת המילים, ממוינים לפי (created_at, _id)
+
+        after - (created_at, item_id) להמשך בעימוד keyset, בכיוון המיון (ברירת מחדל מהחדש לישן)
+        cold - מה-cold במקום מה-hot
+        """
+
+    @abstractmethod
+    def find_stale_items(self, terms_version, limit):
+        """פריטים שה-search_terms שלהם בגרסה אחרת מ-terms_version"""
+
+    # Tiering
+
+    @abstractmethod
+    def move_to_cold(self, deleted_before, archived_before, limit, expire_at):
+        """מעביר עד limit פריטים מה-hot ל-cold; מחזיר אותם (user_id, status, tags) כפי שהועברו
+
+        פריטים שנמחקו עד deleted_before (ומקבלים expire_at), ופריטים שהועברו לארכיון עד
+        archived_before (לפי status_at, או created_at בפריטים ישנים בלי status_at) ואין להם
+        תזכורת שעוד לא נשלחה. בטוח להרצה חוזרת אחרי נפילה באמצע, ובקריאות חופפות (שני
+        leaders) כל פריט מוחזר רק מהקריאה שהוציאה אותו מה-hot.
+        """
+
+    @abstractmethod
+    def restore_item(self, item_id):
+        """מחזיר פריט מה-cold ל-hot; מחזיר את הפריט, או None אם אינו ב-cold"""
+
+    @abstractmethod
+    def purge_cold(self, now, limit):
+        """מוחק מה-cold עד limit פריטים שה-expire_at שלהם עבר; מחזיר כמה נמחקו"""
+
+    # Tags
+
+    @abstractmethod
+    def adjust_tag_counts(self, user_id, deltas):
+        """מוסיף לכל מונה תגית של המשתמש {tag: delta}; מונה שירד ל-0 נמחק"""
+
+    @abstractmethod
+    def top_tags(self, user_id, limit):
+        """[(tag, count)] - התגיות הנפוצות של המשתמש, מהנפוצה ביותר"""
+
+    @abstractmethod
+    def rebuild_tags(self):
+        """בונה מחדש את מוני התגיות (ואת האינדקס של התגיות, אם יש) מהפריטים"""
+
+    # Reminders - {_id: id הפריט, user_id, due_at, sent}, תזכורת אחת לכל פריט
+
+    @abstractmethod
+    def set_reminder(self, item_id, user_id, due_at):
+        """קובע (או מחליף) את התזכורת של פריט, כתזכורת שעוד לא נשלחה"""
+
+    @abstractmethod
+    def cancel_reminders(self, item_ids):
+        """מוחק את התזכורות שעוד לא נשלחו של הפריטים"""
+
+    @abstractmethod
+    def find_due_reminders(self, until, user_id=None, after=None, limit=None):
+        """תזכורות שלא נשלחו ומועדן עד until (של כל המשתמשים או של אחד), לפי (due_at, _id)
+
+        כל תזכורת היא {_id, user_id, due_at}
+
+        after - (due_at, item_id) של התזכורת האחרונה מה-batch הקודם
+        """
+
+    @abstractmethod
+    def claim_reminders(self, owner, now, lease_until, limit, item_id=None):
+        """תופס עד limit תזכורות שהגיע זמנן ואינן תפוסות (או שהתפיסה שלהן פגה), מהמוקדמת
+
+        כל תפיסה אטומית: owner נרשם ב-claimed_by עד lease_until ו-attempts עולה ב-1, כך
+        שכמה תהליכים לא ישלחו את אותה תזכורת. item_id - רק התזכורת של הפריט.
+        מחזיר את התזכורות שנתפסו {_id, user_id, due_at, attempts}.
+        """
+
+    @abstractmethod
+    def release_reminder(self, item_id, owner, retry_at):
+        """משחרר תזכורת ש-owner תפס (שליחה נכשלה); אפשר לתפוס אותה שוב מ-retry_at"""
+
+    @abstractmethod
+    def mark_reminders_sent(self, item_ids, until):
+        """מסמן תזכורות כנשלחו ומוחק את reminder_date מהפריטים, רק אם מועדן עד until"""
+
+    @abstractmethod
+    def migrate_reminders(self):
+        """מעתיק תזכורות מהשדות reminder_date / reminded של הפריטים ומשאיר בפריט רק תזכורת ממתינה"""
+
+    # Review log - {_id, user_id, item_id, action}, החלטות סיקור שעוד לא נכתבו לפריטים
+
+    @abstractmethod
+    def log_review_decision(self, user_id, item_id, action):
+        """רושם החלטת סיקור אחת (הוספה בלבד, זולה); מחזיר את ה-_id של הרשומה"""
+
+    @abstractmethod
+    def find_review_log(self):
+        """כל הרשומות, לפי סדר ההוספה"""
+
+    @abstractmethod
+    def delete_review_log(self, log_ids):
+        """מוחק רשומות שההחלטות שלהן כבר נכתבו לפריטים"""
+
+    # Leases
+
+    @abstractmethod
+    def acquire_lease(self, name, owner, now, until):
+        """תופס או מאריך את ה-lease בשם name עבור owner עד until
+
+        מצליח אם owner כבר מחזיק בו, אם הוא פג (expire_at עד now) או אם עוד לא קיים.
+        מחזיר את ה-fencing token - מספר שעולה בכל החלפת מחזיק ונשאר קבוע בהארכות -
+        או None אם מחזיק אחר עוד בתוקף.
+        """
+
+    @abstractmethod
+    def release_lease(self, name, owner, now):
+        """משחרר את ה-lease אם owner מחזיק בו (ה-token נשמר להחלפה הבאה)"""
+
+    @abstractmethod
+    def get_lease(self, name):
+        """ה-lease בשם name {_id, owner, token, expire_at}, או None"""
+
+    # Maintenance
+
+    @abstractmethod
+    def create_indexes(self):
+        """יוצר את האינדקסים (אם חסרים)"""
+
+    @abstractmethod
+    def applied_migrations(self):
+        """מספרי ה-migrations שכבר רצו"""
+
+    @abstractmethod
+    def record_migration(self, version, description, applied_at):
+        """רושם migration שרץ"""
+
+    def close(self):
+        """משחרר חיבורים (אם יש)"""
@@ -0,0 +1,344 @@
+"""
+storage/memory.py - In-process backend
+
+Keeps users and items in dicts guarded by one lock (database.py functions
+run on the DB thread pool). Nothing is persisted; meant for benchmarks,
+local experiments and single-process runs where losing data on restart
+is acceptable. Returned documents are copies, as a real database would
+return.
+"""
+import copy
+import threading
+from collections import Counter
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+from storage.base import Storage, bson_time, project
+
+
+def _stored(fields):
+    """עותק של השדות לשמירה, עם תאריכים ברזולוציה של MongoDB"""
+    fields = copy.deepcopy(fields)
+    for key, value in fields.items():
+        if isinstance(value, datetime):
+            fields[key] = bson_time(value)
+    return fields
+
+
+def _keyset_page(items, after, ascending, limit, projection, field='created_at'):
+    """ממיין לפי (field, _id), ממשיך אחרי after בכיוון המיון ומחזיר עותקים"""
+    if after is not None:
+        key = (after[0], ObjectId(after[1]))
+        if ascending:
+            items = [item for item in items if (item[field], item['_id']) > key]
+        else:
+            items = [item for item in items if (item[field], item['_id']) < key]
+    items.sort(key=lambda item: (item[field], item['_id']), reverse=not ascending)
+    if limit:
+        items = items[:limit]
+    return [copy.deepcopy(project(item, projection)) for item in items]
+
+
+class MemoryStorage(Storage):
+    """אחסון בזיכרון התהליך"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._users = {}       # user_id -> מסמך
+        self._items = {}       # ObjectId -> מסמך
+        self._by_user = {}     # user_id -> set של ObjectId
+        self._cold = {}        # ObjectId -> מסמך שהועבר ל-cold
+        self._tags = {}        # user_id -> Counter(tag -> מספר פריטים)
+        self._reminders = {}   # ObjectId של הפריט -> תזכורת
+        self._locks = {}       # שם -> lease
+        self._review_log = {}  # _id -> החלטת סיקור שעוד לא נכתבה
+        self._migrations = {}  # version -> מסמך
+
+    def get_or_create_user(self, user_id, defaults):
+        with self._lock:
+            if user_id not in self._users:
+                user = _stored(defaults)
+                user.update({'_id': ObjectId(), 'user_id': user_id})
+                self._users[user_id] = user
+            return copy.deepcopy(self._users[user_id])
+
+    def get_user(self, user_id):
+        with self._lock:
+            return copy.deepcopy(self._users.get(user_id))
+
+    def update_user(self, user_id, fields):
+        with self._lock:
+            if user_id in self._users:
+                self._users[user_id].update(_stored(fields))
+
+    def get_user_with_items(self, user_id, statuses, since, limit, projection=None):
+        with self._lock:
+            return self.get_user(user_id), self.find_items(
+                user_id, statuses, since=since, limit=limit, projection=projection
+            )
+
+    def insert_item(self, item):
+        with self._lock:
+            item['_id'] = ObjectId()
+            self._items[item['_id']] = _stored(item)
+            self._by_user.setdefault(item['user_id'], set()).add(item['_id'])
+            return str(item['_id'])
+
+    def get_item(self, item_id, projection=None, cold=False):
+        with self._lock:
+            item = (self._cold if cold else self._items).get(ObjectId(item_id))
+            return copy.deepcopy(project(item, projection)) if item else None
+
+    def get_items(self, item_ids, projection=None):
+        with self._lock:
+            items = (self._items.get(ObjectId(item_id)) for item_id in set(item_ids))
+            return [copy.deepcopy(project(item, projection)) for item in items if item is not None]
+
+    def update_item(self, item_id, fields):
+        with self._lock:
+            item = self._items.get(ObjectId(item_id))
+            if item is None:
+                return None
+            previous = copy.deepcopy(project(item, ('user_id', 'status', 'tags')))
+            item.update(_stored(fields))
+            return previous
+
+    def update_items(self, updates, ordered=True):
+        with self._lock:
+            for item_id, fields in updates:
+                self.update_item(item_id, fields)
+
+    def update_user_items(self, user_id, item_ids, fields):
+        with self._lock:
+            items = [self._items.get(ObjectId(item_id)) for item_id in set(item_ids)]
+            items = [
+                item for item in items
+                if item is not None and item['user_id'] == user_id and item['status'] != 'deleted'
+            ]
+            for item in items:
+                item.update(_stored(fields))
+            return len(items)
+
+    def item_owners(self, item_ids):
+        with self._lock:
+            items = (self._items.get(ObjectId(item_id)) for item_id in item_ids)
+            return {item['user_id'] for item in items if item is not None}
+
+    def _user_items(self, user_id):
+        return (self._items[oid] for oid in self._by_user.get(user_id, ()))
+
+    def _user_cold_items(self, user_id):
+        return (item for item in self._cold.values() if item['user_id'] == user_id)
+
+    def find_items(self, user_id, statuses, since=None, after=None, ascending=False,
+                   limit=None, projection=None, tag=None, cold=False):
+        with self._lock:
+            items = [
+                item for item in (self._user_cold_items(user_id) if cold else self._user_items(user_id))
+                if item['status'] in statuses
+                and (since is None or item['created_at'] >= since)
+                and (tag is None or tag in item.get('tags', ()))
+            ]
+            return _keyset_page(items, after, ascending, limit, projection)
+
+    def find_items_by_terms(self, user_id, terms, limit, after=None, ascending=False, projection=None,
+                            cold=False):
+        with self._lock:
+            items = [
+                item for item in (self._user_cold_items(user_id) if cold else self._user_items(user_id))
+                if item['status'] != 'deleted'
+                and any(word.startswith(term) for word in item.get('search_terms', ()) for term in terms)
+            ]
+            return _keyset_page(items, after, ascending, limit, projection)
+
+    def find_stale_items(self, terms_version, limit):
+        with self._lock:
+            stale = [item for item in self._items.values() if item.get('search_v') != terms_version]
+            return [project(item, ('content', 'tags')) for item in stale[:limit]]
+
+    def move_to_cold(self, deleted_before, archived_before, limit, expire_at):
+        def ready(item):
+            changed_at = item.get('status_at') or item['created_at']
+            if item['status'] == 'deleted':
+                return changed_at <= deleted_before
+            # תזכורת שעוד לא נשלחה נשארת ב-hot
+            return item['status'] == 'archived' and changed_at <= archived_before and item.get('reminder_date') is None
+
+        with self._lock:
+            batch = [item for item in self._items.values() if ready(item)][:limit]
+            for item in batch:
+                del self._items[item['_id']]
+                self._by_user[item['user_id']].discard(item['_id'])
+                item['expire_at'] = bson_time(expire_at) if item['status'] == 'deleted' else None
+                self._cold[item['_id']] = item
+            return [copy.deepcopy(project(item, ('user_id', 'status', 'tags'))) for item in batch]
+
+    def restore_item(self, item_id):
+        with self._lock:
+            item = self._cold.pop(ObjectId(item_id), None)
+            if item is None:
+                return None
+            item.pop('expire_at', None)
+            self._items[item['_id']] = item
+            self._by_user.setdefault(item['user_id'], set()).add(item['_id'])
+            return copy.deepcopy(item)
+
+    def purge_cold(self, now, limit):
+        with self._lock:
+            expired = [
+                oid for oid, item in self._cold.items()
+                if item.get('expire_at') is not None and item['expire_at'] <= now
+            ][:limit]
+            for oid in expired:
+                del self._cold[oid]
+            return len(expired)
+
+    def adjust_tag_counts(self, user_id, deltas):
+        with self._lock:
+            counts = self._tags.setdefault(user_id, Counter())
+            counts.update(deltas)
+            for tag in [tag for tag, count in counts.items() if count <= 0]:
+                del counts[tag]
+
+    def top_tags(self, user_id, limit):
+        with self._lock:
+            counts = self._tags.get(user_id, {})
+            return sorted(counts.items(), key=lambda entry: (-entry[1], entry[0]))[:limit]
+
+    def rebuild_tags(self):
+        with self._lock:
+            self._tags = {}
+            for item in self._items.values():
+                if item['status'] != 'deleted':
+                    self._tags.setdefault(item['user_id'], Counter()).update(set(item.get('tags', ())))
+
+    def set_reminder(self, item_id, user_id, due_at):
+        with self._lock:
+            oid = ObjectId(item_id)
+            self._reminders[oid] = {'_id': oid, 'user_id': user_id, 'due_at': bson_time(due_at), 'sent': False}
+
+    def cancel_reminders(self, item_ids):
+        with self._lock:
+            for item_id in item_ids:
+                oid = ObjectId(item_id)
+                if oid in self._reminders and not self._reminders[oid]['sent']:
+                    del self._reminders[oid]
+
+    def find_due_reminders(self, until, user_id=None, after=None, limit=None):
+        with self._lock:
+            due = [
+                reminder for reminder in self._reminders.values()
+                if not reminder['sent']
+                and reminder['due_at'] <= until
+                and (user_id is None or reminder['user_id'] == user_id)
+            ]
+            return _keyset_page(due, after, True, limit, ('user_id', 'due_at'), field='due_at')
+
+    def claim_reminders(self, owner, now, lease_until, limit, item_id=None):
+        with self._lock:
+            if item_id is not None:
+                candidates = [self._reminders.get(ObjectId(item_id))]
+            else:
+                candidates = self._reminders.values()
+            available = sorted(
+                (
+                    reminder for reminder in candidates
+                    if reminder is not None
+                    and not reminder['sent']
+                    and reminder['due_at'] <= now
+                    and (reminder.get('claim_until') is None or reminder['claim_until'] <= now)
+                ),
+                key=lambda reminder: reminder['due_at']
+            )[:limit]
+            for reminder in available:
+                reminder['claimed_by'] = owner
+                reminder['claim_until'] = bson_time(lease_until)
+                reminder['attempts'] = reminder.get('attempts', 0) + 1
+            return [copy.deepcopy(project(reminder, ('user_id', 'due_at', 'attempts'))) for reminder in available]
+
+    def release_reminder(self, item_id, owner, retry_at):
+        with self._lock:
+            reminder = self._reminders.get(ObjectId(item_id))
+            if reminder and reminder.get('claimed_by') == owner and not reminder['sent']:
+                reminder['claimed_by'] = None
+                reminder['claim_until'] = bson_time(retry_at)
+
+    def mark_reminders_sent(self, item_ids, until):
+        with self._lock:
+            for item_id in item_ids:
+                oid = ObjectId(item_id)
+                reminder = self._reminders.get(oid)
+                # תזכורת שהוגדרה מחדש בינתיים לא מסומנת
+                if reminder and reminder['due_at'] <= until:
+                    reminder['sent'] = True
+                    reminder.pop('claimed_by', None)
+                    reminder.pop('claim_until', None)
+                item = self._items.get(oid)
+                if item and item.get('reminder_date') and item['reminder_date'] <= until:
+                    del item['reminder_date']
+
+    def migrate_reminders(self):
+        with self._lock:
+            for item in self._items.values():
+                reminded = item.pop('reminded', False)
+                if item.get('reminder_date') is None or reminded or item['status'] == 'deleted':
+                    item.pop('reminder_date', None)
+                elif item['_id'] not in self._reminders:
+                    self.set_reminder(item['_id'], item['user_id'], item['reminder_date'])
+
+    def log_review_decision(self, user_id, item_id, action):
+        with self._lock:
+            log_id = ObjectId()
+            self._review_log[log_id] = {'_id': log_id, 'user_id': user_id, 'item_id': str(item_id), 'action': action}
+            return log_id
+
+    def find_review_log(self):
+        with self._lock:
+            return copy.deepcopy(list(self._review_log.values()))
+
+    def delete_review_log(self, log_ids):
+        with self._lock:
+            for log_id in log_ids:
+                self._review_log.pop(log_id, None)
+
+    def acquire_lease(self, name, owner, now, until):
+        with self._lock:
+            lease = self._locks.get(name)
+            if lease is None:
+                lease = self._locks[name] = {'_id': name, 'owner': None, 'token': 0, 'expire_at': None}
+            elif lease['owner'] != owner and lease['expire_at'] > now:
+                return None
+            if lease['owner'] != owner:
+                lease['token'] += 1
+            lease['owner'] = owner
+            lease['expire_at'] = bson_time(until)
+            return lease['token']
+
+    def release_lease(self, name, owner, now):
+        with self._lock:
+            lease = self._locks.get(name)
+            if lease and lease['owner'] == owner:
+                lease['owner'] = None
+                lease['expire_at'] = bson_time(now)
+
+    def get_lease(self, name):
+        with self._lock:
+            return copy.deepcopy(self._locks.get(name))
+
+    def create_indexes(self):
+        pass
+
+    def applied_migrations(self):
+        with self._lock:
+            return set(self._migrations)
+
+    def record_migration(self, version, description, applied_at):
+        with self._lock:
+            self._migrations[version] = {
+                '_id': version,
+                'description': description,
+                'applied_at': applied_at
+            }
@@ -0,0 +1,494 @@
+"""
+storage/mongo.py - MongoDB backend
+
+The connection is opened lazily, on the first query, so importing the
+module never touches the network.
+"""
+import os
+import threading
+
+from bson.objectid import ObjectId
+from pymongo import MongoClient, ReplaceOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+import metrics
+import search
+from storage.base import Storage
+
+DB_NAME = 'thought_bot'
+
+# הגדרות חיבור ל-MongoDB
+MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '50'))
+MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """מחזיר את ה-MongoClient, ויוצר אותו בקריאה הראשונה"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    os.getenv('MONGODB_URI'),
+                    maxPoolSize=MONGO_MAX_POOL_SIZE,
+                    minPoolSize=MONGO_MIN_POOL_SIZE,
+                    connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                    # זמן כל פקודה, משויך לפונקציה ב-database.py ששלחה אותה
+                    event_listeners=[metrics.CommandTimer()]
+                )
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+class _LazyCollection:
+    """Collection שמתחבר ל-MongoDB רק בשימוש הראשון"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self.name], attr)
+
+
+# Collections
+users_collection = _LazyCollection('users')
+items_collection = _LazyCollection('items')
+# פריטים מחוקים (אחרי תקופת חסד) וארכיון ישן - מחוץ ל-working set
+cold_items_collection = _LazyCollection('items_cold')
+migrations_collection = _LazyCollection('migrations')
+# מונה לכל (user_id, tag) - מספר הפריטים שאינם מחוקים עם התגית
+tags_collection = _LazyCollection('tags')
+# תזכורת לכל פריט שיש לו: {_id: id הפריט, user_id, due_at, sent, claimed_by, claim_until, attempts}
+reminders_collection = _LazyCollection('reminders')
+# lease לכל עבודת רקע שרצה ב-instance אחד: {_id: שם, owner, token, expire_at}
+locks_collection = _LazyCollection('locks')
+# החלטות סיקור שעוד לא נכתבו לפריטים: {_id, user_id, item_id, action}
+review_log_collection = _LazyCollection('review_log')
+
+# מה ש-update_item מחזיר מהפריט שלפני העדכון
+_PREVIOUS_PROJECTION = {'_id': 0, 'user_id': 1, 'status': 1, 'tags': 1}
+
+
+def _status_filter(statuses):
+    if len(statuses) == 1:
+        return statuses[0]
+    return {'$in': list(statuses)}
+
+
+def _keyset(query, after, ascending, field='created_at'):
+    """מוסיף לפילטר את ההמשך אחרי after ומחזיר את המיון לעימוד keyset על (field, _id)"""
+    if after is not None:
+        value, item_id = after
+        op = '$gt' if ascending else '$lt'
+        query['$and'] = [{'$or': [
+            {field: {op: value}},
+            {field: value, '_id': {op: ObjectId(item_id)}}
+        ]}]
+    order = 1 if ascending else -1
+    return [(field, order), ('_id', order)]
+
+
+def _collection(cold):
+    return cold_items_collection if cold else items_collection
+
+
+def _tier_query(deleted_before, archived_before):
+    """פריטים שמוכנים למעבר ל-cold (status_at חסר בפריטים שנשמרו לפניו - לפי created_at)"""
+    def older_than(cutoff):
+        return {'$or': [
+            {'status_at': {'$lte': cutoff}},
+            {'status_at': None, 'created_at': {'$lte': cutoff}}
+        ]}
+    return {'$or': [
+        {'status': 'deleted', **older_than(deleted_before)},
+        {
+            'status': 'archived',
+            '$and': [
+                older_than(archived_before),
+                # תזכורת שעוד לא נשלחה נשארת ב-hot
+                {'reminder_date': None}
+            ]
+        }
+    ]}
+
+
+def _limited(cursor, limit):
+    """limit, ו-batch באותו גודל - כל batch של עימוד הוא סבב אחד מול השרת"""
+    if limit:
+        cursor = cursor.limit(limit).batch_size(limit)
+    return cursor
+
+
+def _items_query(user_id, statuses, since=None, after=None, ascending=False, tag=None):
+    """פילטר ומיון לשאילתת פריטים (משותף ל-find ול-$lookup)"""
+    query = {'user_id': user_id, 'status': _status_filter(statuses)}
+    if tag is not None:
+        # התאמה מדויקת לאיבר במערך - האינדקס multikey על (user_id, tags, created_at)
+        query['tags'] = tag
+    if since is not None:
+        query['created_at'] = {'$gte': since}
+    return query, _keyset(query, after, ascending)
+
+
+class MongoStorage(Storage):
+    """אחסון ב-MongoDB"""
+
+    name = 'mongo'
+
+    def get_or_create_user(self, user_id, defaults):
+        try:
+            return users_collection.find_one_and_update(
+                {'user_id': user_id},
+                {'$setOnInsert': defaults},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # שני upsert-ים במקביל - השני נכשל על האינדקס הייחודי, המשתמש כבר קיים
+            return users_collection.find_one({'user_id': user_id})
+
+    def get_user(self, user_id):
+        return users_collection.find_one({'user_id': user_id})
+
+    def update_user(self, user_id, fields):
+        users_collection.update_one({'user_id': user_id}, {'$set': fields})
+
+    def get_user_with_items(self, user_id, statuses, since, limit, projection=None):
+        # aggregation אחד על users עם $lookup לפריטים
+        query, sort = _items_query(user_id, statuses, since)
+        pipeline = [
+            {'$match': query},
+            {'$sort': dict(sort)},
+            {'$limit': limit}
+        ]
+        if projection is not None:
+            pipeline.append({'$project': projection})
+        result = list(users_collection.aggregate([
+            {'$match': {'user_id': user_id}},
+            {'$limit': 1},
+            {'$lookup': {'from': items_collection.name, 'pipeline': pipeline, 'as': 'items'}}
+        ]))
+        if not result:
+            # משתמש שעוד לא נוצר (לא שלח /start)
+            return None, self.find_items(user_id, statuses, since=since, limit=limit, projection=projection)
+        user = result[0]
+        return user, user.pop('items')
+
+    def insert_item(self, item):
+        return str(items_collection.insert_one(item).inserted_id)
+
+    def get_item(self, item_id, projection=None, cold=False):
+        return _collection(cold).find_one({'_id': ObjectId(item_id)}, projection)
+
+    def get_items(self, item_ids, projection=None):
+        return list(items_collection.find(
+            {'_id': {'$in': [ObjectId(item_id) for item_id in item_ids]}}, projection
+        ))
+
+    def update_item(self, item_id, fields):
+        # find_one_and_update - באותו סבב גם הבעלים (למטמון), הסטטוס והתגיות (למוני התגיות)
+        return items_collection.find_one_and_update(
+            {'_id': ObjectId(item_id)}, {'$set': fields}, projection=_PREVIOUS_PROJECTION
+        )
+
+    def update_items(self, updates, ordered=True):
+        if not updates:
+            return
+        items_collection.bulk_write([
+            UpdateOne({'_id': ObjectId(item_id)}, {'$set': fields})
+            for item_id, fields in updates
+        ], ordered=ordered)
+
+    def update_user_items(self, user_id, item_ids, fields):
+        if not item_ids:
+            return 0
+        return items_collection.update_many(
+            {
+                '_id': {'$in': [ObjectId(item_id) for item_id in item_ids]},
+                'user_id': user_id,
+                'status': {'$ne': 'deleted'}
+            },
+            {'$set': fields}
+        ).matched_count
+
+    def item_owners(self, item_ids):
+        return set(items_collection.distinct(
+            'user_id', {'_id': {'$in': [ObjectId(item_id) for item_id in item_ids]}}
+        ))
+
+    def find_items(self, user_id, statuses, since=None, after=None, ascending=False,
+                   limit=None, projection=None, tag=None, cold=False):
+        query, sort = _items_query(user_id, statuses, since, after, ascending, tag)
+        return list(_limited(_collection(cold).find(query, projection).sort(sort), limit))
+
+    def find_items_by_terms(self, user_id, terms, limit, after=None, ascending=False, projection=None,
+                            cold=False):
+        query = {
+            'user_id': user_id,
+            'search_terms': {'$in': search.prefix_patterns(terms)},
+            'status': {'$ne': 'deleted'}
+        }
+        sort = _keyset(query, after, ascending)
+        return list(_limited(_collection(cold).find(query, projection).sort(sort), limit))
+
+    def find_stale_items(self, terms_version, limit):
+        return list(items_collection.find(
+            {'search_v': {'$ne': terms_version}},
+            {'content': 1, 'tags': 1}
+        ).limit(limit))
+
+    def move_to_cold(self, deleted_before, archived_before, limit, expire_at):
+        query = _tier_query(deleted_before, archived_before)
+        batch = list(items_collection.find(query).limit(limit))
+        if not batch:
+            return []
+        # קודם העתקה (upsert - בטוח להרצה חוזרת), ואז מחיקה מה-hot עם אותו פילטר
+        cold_items_collection.bulk_write([
+            ReplaceOne(
+                {'_id': item['_id']},
+                {**item, 'expire_at': expire_at if item['status'] == 'deleted' else None},
+                upsert=True
+            )
+            for item in batch
+        ], ordered=False)
+        # מחיקה לכל פריט בנפרד - מוחזרים רק הפריטים שהקריאה הזו מחקה. leader קודם שנתקע באמצע
+        # batch מעביר את אותם פריטים במקביל, וכל פריט נספר (ויורד ממוני התגיות) רק אצל אחד מהם
+        moved = [
+            item for item in batch
+            if items_collection.find_one_and_delete({'_id': item['_id'], **query}, projection={'_id': 1})
+        ]
+        moved_ids = {item['_id'] for item in moved}
+        missed = [item['_id'] for item in batch if item['_id'] not in moved_ids]
+        if missed:
+            # פריט שהשתנה בין הקריאה למחיקה נשאר ב-hot - העותק שלו ב-cold מיותר
+            # (פריט שנמחק בקריאה אחרת כבר לא ב-hot, והעותק שלו ב-cold נשאר)
+            kept = items_collection.distinct('_id', {'_id': {'$in': missed}})
+            if kept:
+                cold_items_collection.delete_many({'_id': {'$in': kept}})
+        return [
+            {'_id': item['_id'], 'user_id': item['user_id'], 'status': item['status'], 'tags': item.get('tags')}
+            for item in moved
+        ]
+
+    def restore_item(self, item_id):
+        item = cold_items_collection.find_one({'_id': ObjectId(item_id)})
+        if item is None:
+            return None
+        item.pop('expire_at', None)
+        # קודם ל-hot ואז מחיקה מה-cold - נפילה באמצע משאירה עותק, לא מאבדת את הפריט
+        items_collection.replace_one({'_id': item['_id']}, item, upsert=True)
+        cold_items_collection.delete_one({'_id': item['_id']})
+        return item
+
+    def purge_cold(self, now, limit):
+        # אינדקס ה-TTL על expire_at מוחק בשרת
+        return 0
+
+    def adjust_tag_counts(self, user_id, deltas):
+        deltas = {tag: delta for tag, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        tags_collection.bulk_write([
+            UpdateOne({'user_id': user_id, 'tag': tag}, {'$inc': {'count': delta}}, upsert=True)
+            for tag, delta in deltas.items()
+        ], ordered=False)
+        removed = [tag for tag, delta in deltas.items() if delta < 0]
+        if removed:
+            tags_collection.delete_many({'user_id': user_id, 'tag': {'$in': removed}, 'count': {'$lte': 0}})
+
+    def top_tags(self, user_id, limit):
+        docs = tags_collection.find({'user_id': user_id}, {'_id': 0, 'tag': 1, 'count': 1})
+        return [(doc['tag'], doc['count']) for doc in docs.sort([('count', -1), ('tag', 1)]).limit(limit)]
+
+    def rebuild_tags(self):
+        # כולו בשרת: ספירה לכל (user_id, tag) ו-$out שמחליף את ה-collection (האינדקסים נשמרים)
+        items_collection.aggregate([
+            {'$match': {'status': {'$ne': 'deleted'}, 'tags.0': {'$exists': True}}},
+            {'$project': {'user_id': 1, 'tags': {'$setUnion': ['$tags', []]}}},
+            {'$unwind': '$tags'},
+            {'$group': {'_id': {'user_id': '$user_id', 'tag': '$tags'}, 'count': {'$sum': 1}}},
+            {'$project': {'_id': 0, 'user_id': '$_id.user_id', 'tag': '$_id.tag', 'count': 1}},
+            {'$out': tags_collection.name}
+        ])
+
+    def set_reminder(self, item_id, user_id, due_at):
+        reminders_collection.replace_one(
+            {'_id': ObjectId(item_id)},
+            {'user_id': user_id, 'due_at': due_at, 'sent': False},
+            upsert=True
+        )
+
+    def cancel_reminders(self, item_ids):
+        if not item_ids:
+            return
+        reminders_collection.delete_many(
+            {'_id': {'$in': [ObjectId(item_id) for item_id in item_ids]}, 'sent': False}
+        )
+
+    def find_due_reminders(self, until, user_id=None, after=None, limit=None):
+        # sent: False - האינדקס החלקי מכיל רק תזכורות שלא נשלחו
+        query = {'sent': False, 'due_at': {'$lte': until}}
+        if user_id is not None:
+            query['user_id'] = user_id
+        sort = _keyset(query, after, True, field='due_at')
+        return list(_limited(reminders_collection.find(query, {'user_id': 1, 'due_at': 1}).sort(sort), limit))
+
+    def claim_reminders(self, owner, now, lease_until, limit, item_id=None):
+        query = {
+            'sent': False,
+            'due_at': {'$lte': now},
+            # לא תפוסה, או שהתפיסה פגה (תהליך שנפל) / הגיע מועד הניסיון הבא
+            '$or': [{'claim_until': None}, {'claim_until': {'$lte': now}}]
+        }
+        if item_id is not None:
+            query['_id'] = ObjectId(item_id)
+        claimed = []
+        # find_one_and_update לכל תזכורת - כל תפיסה אטומית בנפרד
+        for _ in range(limit):
+            reminder = reminders_collection.find_one_and_update(
+                query,
+                {'$set': {'claimed_by': owner, 'claim_until': lease_until}, '$inc': {'attempts': 1}},
+                projection={'user_id': 1, 'due_at': 1, 'attempts': 1},
+                sort=[('due_at', 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if reminder is None:
+                break
+            claimed.append(reminder)
+        return claimed
+
+    def release_reminder(self, item_id, owner, retry_at):
+        reminders_collection.update_one(
+            {'_id': ObjectId(item_id), 'claimed_by': owner, 'sent': False},
+            {'$set': {'claimed_by': None, 'claim_until': retry_at}}
+        )
+
+    def mark_reminders_sent(self, item_ids, until):
+        if not item_ids:
+            return
+        ids = [ObjectId(item_id) for item_id in item_ids]
+        # תזכורת שהוגדרה מחדש בינתיים לא מסומנת
+        reminders_collection.update_many(
+            {'_id': {'$in': ids}, 'due_at': {'$lte': until}},
+            {'$set': {'sent': True}, '$unset': {'claimed_by': '', 'claim_until': ''}}
+        )
+        items_collection.update_many(
+            {'_id': {'$in': ids}, 'reminder_date': {'$lte': until}}, {'$unset': {'reminder_date': ''}}
+        )
+
+    def migrate_reminders(self):
+        pending = items_collection.find(
+            {'reminded': False, 'reminder_date': {'$ne': None}, 'status': {'$ne': 'deleted'}},
+            {'user_id': 1, 'reminder_date': 1}
+        )
+        batch = []
+        for item in pending:
+            batch.append(UpdateOne(
+                {'_id': item['_id']},
+                {'$setOnInsert': {'user_id': item['user_id'], 'due_at': item['reminder_date'], 'sent': False}},
+                upsert=True
+            ))
+            if len(batch) == 1000:
+                reminders_collection.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            reminders_collection.bulk_write(batch, ordered=False)
+        # בפריט נשאר רק מועד של תזכורת ממתינה (להצגה), בלי reminded
+        items_collection.update_many(
+            {'$or': [{'reminded': True}, {'reminder_date': None}, {'status': 'deleted'}]},
+            {'$unset': {'reminder_date': ''}}
+        )
+        items_collection.update_many({'reminded': {'$exists': True}}, {'$unset': {'reminded': ''}})
+        if 'reminded_1_reminder_date_1__id_1' in items_collection.index_information():
+            items_collection.drop_index('reminded_1_reminder_date_1__id_1')
+
+    def log_review_decision(self, user_id, item_id, action):
+        return review_log_collection.insert_one(
+            {'user_id': user_id, 'item_id': str(item_id), 'action': action}
+        ).inserted_id
+
+    def find_review_log(self):
+        return list(review_log_collection.find().sort('_id', 1))
+
+    def delete_review_log(self, log_ids):
+        if log_ids:
+            review_log_collection.delete_many({'_id': {'$in': list(log_ids)}})
+
+    def acquire_lease(self, name, owner, now, until):
+        # הארכה - ה-token לא משתנה
+        lease = locks_collection.find_one_and_update(
+            {'_id': name, 'owner': owner},
+            {'$set': {'expire_at': until}},
+            projection={'token': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if lease is None:
+            try:
+                # השתלטות על lease שפג (או יצירה) - token חדש
+                lease = locks_collection.find_one_and_update(
+                    {'_id': name, 'expire_at': {'$lte': now}},
+                    {'$set': {'owner': owner, 'expire_at': until}, '$inc': {'token': 1}},
+                    projection={'token': 1},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                # ה-lease קיים ובתוקף אצל מחזיק אחר
+                return None
+        return lease['token']
+
+    def release_lease(self, name, owner, now):
+        locks_collection.update_one({'_id': name, 'owner': owner}, {'$set': {'owner': None, 'expire_at': now}})
+
+    def get_lease(self, name):
+        return locks_collection.find_one({'_id': name})
+
+    def create_indexes(self):
+        users_collection.create_index('user_id', unique=True)
+        items_collection.create_index([('user_id', 1), ('created_at', -1)])
+        items_collection.create_index([('user_id', 1), ('status', 1)])
+        items_collection.create_index([('user_id', 1), ('status', 1), ('created_at', -1), ('_id', -1)])
+        items_collection.create_index([('user_id', 1), ('search_terms', 1)])
+        # multikey - עמוד של תגית הוא סריקת טווח, בלי לעבור על כל ההיסטוריה
+        items_collection.create_index([('user_id', 1), ('tags', 1), ('created_at', -1), ('_id', -1)])
+        # מועמדים למעבר ל-cold
+        items_collection.create_index([('status', 1), ('status_at', 1)])
+        cold_items_collection.create_index([('user_id', 1), ('status', 1), ('created_at', -1), ('_id', -1)])
+        cold_items_collection.create_index([('user_id', 1), ('search_terms', 1)])
+        # TTL - רק לפריטים מחוקים יש expire_at
+        cold_items_collection.create_index('expire_at', expireAfterSeconds=0)
+        # רק תזכורות שלא נשלחו; (due_at, _id) הוא המיון של עימוד ה-batches ושל התפיסה
+        reminders_collection.create_index(
+            [('due_at', 1), ('_id', 1)], partialFilterExpression={'sent': False}
+        )
+        # הגרסה הקודמת, עם user_id באמצע - לא מתאימה למיון (due_at, _id)
+        if 'due_at_1_user_id_1__id_1' in reminders_collection.index_information():
+            reminders_collection.drop_index('due_at_1_user_id_1__id_1')
+        tags_collection.create_index([('user_id', 1), ('tag', 1)], unique=True)
+        tags_collection.create_index([('user_id', 1), ('count', -1), ('tag', 1)])
+
+    def applied_migrations(self):
+        return {doc['_id'] for doc in migrations_collection.find({}, {'_id': 1})}
+
+    def record_migration(self, version, description, applied_at):
+        migrations_collection.insert_one({
+            '_id': version,
+            'description': description,
+            'applied_at': applied_at
+        })
+
+    def close(self):
+        global _client
+        with _client_lock:
+            if _client is not None:
+                _client.close()
+                _client = None
@@ -0,0 +1,689 @@
+"""
+storage/sqlite.py - SQLite backend for single-node deployments
+
+One connection (WAL mode) shared by the DB thread pool and serialized by
+a lock. Items are stored in columns; tags and search_terms as JSON, and
+search_terms are also kept in item_terms, whose (user_id, term) primary
+key serves prefix searches as range scans. Tags are likewise kept in
+item_tags, keyed (user_id, tag, created_at, _id) so the items of a tag
+are read as one range scan, with their counts in tag_counts. Reminders
+have their own table, with a partial index on (due_at, _id) over
+the unsent ones. Dates are
+stored as ISO strings with millisecond precision, which sort in time
+order.
+
+The cold tier is the items_cold table. Moved items keep their item_terms
+rows, so a cold search joins items_cold instead of items; their item_tags
+rows are dropped (tag pages read the hot tier only) and written again
+when an item is restored.
+
+The file is created on the first query (SQLITE_PATH, default
+thought_bot.db); the schema and indexes are created with it.
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from bson.objectid import ObjectId
+
+from storage.base import Storage, bson_time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    _id TEXT NOT NULL,
+    last_review_date TEXT,
+    next_review_at TEXT,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS items (
+    _id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    type TEXT,
+    content TEXT,
+    tags TEXT NOT NULL DEFAULT '[]',
+    search_terms TEXT NOT NULL DEFAULT '[]',
+    search_v INTEGER,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    keep_until TEXT,
+    reminder_date TEXT,
+    status_at TEXT
+);
+CREATE TABLE IF NOT EXISTS items_cold (
+    _id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    type TEXT,
+    content TEXT,
+    tags TEXT NOT NULL DEFAULT '[]',
+    search_terms TEXT NOT NULL DEFAULT '[]',
+    search_v INTEGER,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    keep_until TEXT,
+    reminder_date TEXT,
+    status_at TEXT,
+    expire_at TEXT
+);
+CREATE TABLE IF NOT EXISTS item_terms (
+    user_id INTEGER NOT NULL,
+    term TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, term, item_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS item_tags (
+    user_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    _id TEXT NOT NULL,
+    PRIMARY KEY (user_id, tag, created_at, _id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tag_counts (
+    user_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (user_id, tag)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reminders (
+    _id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    due_at TEXT NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    claim_until TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS locks (
+    _id TEXT PRIMARY KEY,
+    owner TEXT,
+    token INTEGER NOT NULL,
+    expire_at TEXT
+);
+CREATE TABLE IF NOT EXISTS review_log (
+    _id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    item_id TEXT NOT NULL,
+    action TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    _id INTEGER PRIMARY KEY,
+    description TEXT,
+    applied_at TEXT
+);
+CREATE INDEX IF NOT EXISTS items_user_status_created
+    ON items (user_id, status, created_at, _id);
+CREATE INDEX IF NOT EXISTS item_tags_item ON item_tags (_id);
+CREATE INDEX IF NOT EXISTS tag_counts_top ON tag_counts (user_id, count);
+DROP INDEX IF EXISTS reminders_due;
+CREATE INDEX IF NOT EXISTS reminders_due_id ON reminders (due_at, _id) WHERE sent = 0;
+CREATE INDEX IF NOT EXISTS items_status_changed ON items (status, status_at);
+CREATE INDEX IF NOT EXISTS items_cold_user_status_created
+    ON items_cold (user_id, status, created_at, _id);
+CREATE INDEX IF NOT EXISTS items_cold_expire ON items_cold (expire_at) WHERE expire_at IS NOT NULL;
+"""
+
+# עמודות שנוספו אחרי שהטבלה נוצרה - ALTER בקבצים קיימים לפני ה-SCHEMA
+ADDED_COLUMNS = {
+    'items': ('status_at TEXT',),
+    'reminders': ('claimed_by TEXT', 'claim_until TEXT', 'attempts INTEGER NOT NULL DEFAULT 0'),
+}
+
+USER_COLUMNS = ('_id', 'user_id', 'last_review_date', 'next_review_at', 'created_at')
+ITEM_COLUMNS = (
+    '_id', 'user_id', 'type', 'content', 'tags', 'search_terms', 'search_v',
+    'status', 'created_at', 'keep_until', 'reminder_date', 'status_at'
+)
+REMINDER_COLUMNS = ('_id', 'user_id', 'due_at')
+
+_DATE_FIELDS = {
+    'created_at', 'keep_until', 'reminder_date', 'status_at', 'expire_at', 'due_at', 'claim_until',
+    'last_review_date', 'next_review_at', 'applied_at'
+}
+_JSON_FIELDS = {'tags', 'search_terms'}
+
+# גבול עליון לטווח של תחילית (תו ה-Unicode האחרון)
+_PREFIX_END = '\U0010ffff'
+
+
+def _to_sql(field, value):
+    if value is None:
+        return None
+    if field == '_id':
+        return str(value)
+    if field in _DATE_FIELDS:
+        return bson_time(value).isoformat(timespec='milliseconds')
+    if field in _JSON_FIELDS:
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _from_sql(field, value):
+    if field == '_id':
+        return ObjectId(value)
+    if value is None:
+        return None
+    if field in _DATE_FIELDS:
+        return datetime.fromisoformat(value)
+    if field in _JSON_FIELDS:
+        return json.loads(value)
+    return value
+
+
+def _doc(row):
+    return {key: _from_sql(key, row[key]) for key in row.keys()}
+
+
+def _columns(projection, columns, table=None):
+    """רשימת העמודות ל-SELECT לפי projection"""
+    if projection is not None:
+        columns = ['_id'] + [field for field in projection if field in columns and field != '_id']
+    if table:
+        return ', '.join(f"{table}.{column}" for column in columns)
+    return ', '.join(columns)
+
+
+def _keyset(after, ascending, table=None, field='created_at'):
+    """תנאי ההמשך אחרי after ו-ORDER BY לעימוד keyset על (field, _id)"""
+    prefix = f"{table}." if table else ''
+    order = 'ASC' if ascending else 'DESC'
+    order_by = f"ORDER BY {prefix}{field} {order}, {prefix}_id {order}"
+    if after is None:
+        return None, [], order_by
+    op = '>' if ascending else '<'
+    condition = f"({prefix}{field}, {prefix}_id) {op} (?, ?)"
+    return condition, [_to_sql(field, after[0]), str(ObjectId(after[1]))], order_by
+
+
+def _table(cold):
+    return 'items_cold' if cold else 'items'
+
+
+def _assignments(fields, columns):
+    """SET clause ופרמטרים לעדכון שדות"""
+    for field in fields:
+        if field not in columns or field == '_id':
+            raise KeyError(f"Unknown field: {field}")
+    clause = ', '.join(f"{field} = ?" for field in fields)
+    return clause, [_to_sql(field, value) for field, value in fields.items()]
+
+
+def _add_columns(conn):
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if not existing:
+            continue  # טבלה חדשה - ה-SCHEMA יוצר אותה עם כל העמודות
+        for column in columns:
+            if column.split()[0] not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column}")
+
+
+class SQLiteStorage(Storage):
+    """אחסון בקובץ SQLite מקומי"""
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            _add_columns(conn)
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    # Users
+
+    def get_or_create_user(self, user_id, defaults):
+        with self._lock, self._connection() as conn:
+            fields = {'_id': ObjectId(), 'user_id': user_id, **defaults}
+            conn.execute(
+                f"INSERT OR IGNORE INTO users ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                [_to_sql(field, value) for field, value in fields.items()]
+            )
+            return self.get_user(user_id)
+
+    def get_user(self, user_id):
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            return _doc(row) if row else None
+
+    def update_user(self, user_id, fields):
+        clause, params = _assignments(fields, USER_COLUMNS)
+        with self._lock, self._connection() as conn:
+            conn.execute(f"UPDATE users SET {clause} WHERE user_id = ?", params + [user_id])
+
+    def get_user_with_items(self, user_id, statuses, since, limit, projection=None):
+        # מקומי - שתי שאילתות זולות כמו אחת
+        with self._lock:
+            return self.get_user(user_id), self.find_items(
+                user_id, statuses, since=since, limit=limit, projection=projection
+            )
+
+    # Items
+
+    def _set_terms(self, conn, item_id, user_id, terms):
+        conn.execute("DELETE FROM item_terms WHERE item_id = ?", (item_id,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO item_terms (user_id, term, item_id) VALUES (?, ?, ?)",
+            [(user_id, term, item_id) for term in terms]
+        )
+
+    def _set_tags(self, conn, item_id, user_id, created_at, tags):
+        conn.execute("DELETE FROM item_tags WHERE _id = ?", (item_id,))
+        conn.executemany(
+            "INSERT OR IGNORE INTO item_tags (user_id, tag, created_at, _id) VALUES (?, ?, ?, ?)",
+            [(user_id, tag, created_at, item_id) for tag in tags]
+        )
+
+    def insert_item(self, item):
+        item['_id'] = ObjectId()
+        fields = {field: item[field] for field in ITEM_COLUMNS if field in item}
+        item_id = str(item['_id'])
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                f"INSERT INTO items ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                [_to_sql(field, value) for field, value in fields.items()]
+            )
+            self._set_terms(conn, item_id, item['user_id'], item.get('search_terms') or [])
+            self._set_tags(
+                conn, item_id, item['user_id'], _to_sql('created_at', item['created_at']), item.get('tags') or []
+            )
+        return item_id
+
+    def get_item(self, item_id, projection=None, cold=False):
+        with self._lock:
+            row = self._connection().execute(
+                f"SELECT {_columns(projection, ITEM_COLUMNS)} FROM {_table(cold)} WHERE _id = ?",
+                (str(ObjectId(item_id)),)
+            ).fetchone()
+            return _doc(row) if row else None
+
+    def get_items(self, item_ids, projection=None):
+        if not item_ids:
+            return []
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT {_columns(projection, ITEM_COLUMNS)} FROM items "
+                f"WHERE _id IN ({', '.join('?' * len(item_ids))})",
+                [str(ObjectId(item_id)) for item_id in item_ids]
+            )
+            return [_doc(row) for row in rows]
+
+    def _update_item(self, conn, item_id, fields):
+        item_id = str(ObjectId(item_id))
+        clause, params = _assignments(fields, ITEM_COLUMNS)
+        row = conn.execute(
+            "SELECT user_id, status, tags, created_at FROM items WHERE _id = ?", (item_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(f"UPDATE items SET {clause} WHERE _id = ?", params + [item_id])
+        if 'search_terms' in fields:
+            self._set_terms(conn, item_id, row['user_id'], fields['search_terms'] or [])
+        if 'tags' in fields:
+            self._set_tags(conn, item_id, row['user_id'], row['created_at'], fields['tags'] or [])
+        return _doc(row)
+
+    def update_item(self, item_id, fields):
+        with self._lock, self._connection() as conn:
+            return self._update_item(conn, item_id, fields)
+
+    def update_items(self, updates, ordered=True):
+        # טרנזקציה אחת - הסדר נשמר בכל מקרה
+        with self._lock, self._connection() as conn:
+            for item_id, fields in updates:
+                self._update_item(conn, item_id, fields)
+
+    def update_user_items(self, user_id, item_ids, fields):
+        if not item_ids:
+            return 0
+        clause, params = _assignments(fields, ITEM_COLUMNS)
+        with self._lock, self._connection() as conn:
+            return conn.execute(
+                f"UPDATE items SET {clause} WHERE _id IN ({', '.join('?' * len(item_ids))}) "
+                "AND user_id = ? AND status != 'deleted'",
+                params + [str(ObjectId(item_id)) for item_id in item_ids] + [user_id]
+            ).rowcount
+
+    def item_owners(self, item_ids):
+        if not item_ids:
+            return set()
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT DISTINCT user_id FROM items WHERE _id IN ({', '.join('?' * len(item_ids))})",
+                [str(ObjectId(item_id)) for item_id in item_ids]
+            )
+            return {row['user_id'] for row in rows}
+
+    def find_items(self, user_id, statuses, since=None, after=None, ascending=False,
+                   limit=None, projection=None, tag=None, cold=False):
+        # עם תגית - סריקת טווח על המפתח של item_tags, והפריטים עצמם לפי _id
+        items = _table(cold)
+        table = items if tag is None else 't'
+        source = items if tag is None else f'item_tags t JOIN {items} ON {items}._id = t._id'
+        where = [f"{table}.user_id = ?", f"{items}.status IN ({', '.join('?' * len(statuses))})"]
+        params = [user_id, *statuses]
+        if tag is not None:
+            where.append("t.tag = ?")
+            params.append(tag)
+        if since is not None:
+            where.append(f"{table}.created_at >= ?")
+            params.append(_to_sql('created_at', since))
+        condition, keyset_params, order_by = _keyset(after, ascending, table=table)
+        if condition:
+            where.append(condition)
+            params.extend(keyset_params)
+        sql = (
+            f"SELECT {_columns(projection, ITEM_COLUMNS, table=items)} FROM {source} "
+            f"WHERE {' AND '.join(where)} {order_by}"
+        )
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [_doc(row) for row in self._connection().execute(sql, params)]
+
+    def find_items_by_terms(self, user_id, terms, limit, after=None, ascending=False, projection=None,
+                            cold=False):
+        ranges = ' OR '.join("(t.term >= ? AND t.term < ?)" for _ in terms)
+        where = ["t.user_id = ?", f"({ranges})", "i.status != 'deleted'"]
+        params = [user_id]
+        for term in terms:
+            params.extend([term, term + _PREFIX_END])
+        condition, keyset_params, order_by = _keyset(after, ascending, table='i')
+        if condition:
+            where.append(condition)
+            params.extend(keyset_params)
+        params.append(limit)
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT DISTINCT {_columns(projection, ITEM_COLUMNS, table='i')} "
+                f"FROM item_terms t JOIN {_table(cold)} i ON i._id = t.item_id "
+                f"WHERE {' AND '.join(where)} {order_by} LIMIT ?",
+                params
+            )
+            return [_doc(row) for row in rows]
+
+    def find_stale_items(self, terms_version, limit):
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT _id, content, tags FROM items WHERE search_v IS NOT ? LIMIT ?",
+                (terms_version, limit)
+            )
+            return [_doc(row) for row in rows]
+
+    # Tiering
+
+    def move_to_cold(self, deleted_before, archived_before, limit, expire_at):
+        changed_at = "COALESCE(status_at, created_at)"
+        columns = ', '.join(ITEM_COLUMNS)
+        with self._lock, self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT _id, user_id, status, tags FROM items "
+                f"WHERE (status = 'deleted' AND {changed_at} <= ?) "
+                f"OR (status = 'archived' AND {changed_at} <= ? AND reminder_date IS NULL) "
+                "LIMIT ?",
+                (_to_sql('status_at', deleted_before), _to_sql('status_at', archived_before), limit)
+            ).fetchall()
+            if not rows:
+                return []
+            # טרנזקציה אחת - העתקה ומחיקה מה-hot יחד
+            ids = [row['_id'] for row in rows]
+            where = f"_id IN ({', '.join('?' * len(ids))})"
+            conn.execute(
+                f"INSERT OR REPLACE INTO items_cold ({columns}, expire_at) "
+                f"SELECT {columns}, CASE WHEN status = 'deleted' THEN ? END FROM items WHERE {where}",
+                [_to_sql('expire_at', expire_at)] + ids
+            )
+            conn.execute(f"DELETE FROM items WHERE {where}", ids)
+            conn.execute(f"DELETE FROM item_tags WHERE {where}", ids)
+            return [_doc(row) for row in rows]
+
+    def restore_item(self, item_id):
+        item_id = str(ObjectId(item_id))
+        columns = ', '.join(ITEM_COLUMNS)
+        with self._lock, self._connection() as conn:
+            row = conn.execute(f"SELECT {columns} FROM items_cold WHERE _id = ?", (item_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute(f"INSERT INTO items ({columns}) SELECT {columns} FROM items_cold WHERE _id = ?", (item_id,))
+            conn.execute("DELETE FROM items_cold WHERE _id = ?", (item_id,))
+            item = _doc(row)
+            self._set_tags(conn, item_id, item['user_id'], row['created_at'], item['tags'])
+            return item
+
+    def purge_cold(self, now, limit):
+        with self._lock, self._connection() as conn:
+            ids = [row['_id'] for row in conn.execute(
+                "SELECT _id FROM items_cold WHERE expire_at IS NOT NULL AND expire_at <= ? LIMIT ?",
+                (_to_sql('expire_at', now), limit)
+            )]
+            if not ids:
+                return 0
+            where = f"({', '.join('?' * len(ids))})"
+            conn.execute(f"DELETE FROM items_cold WHERE _id IN {where}", ids)
+            conn.execute(f"DELETE FROM item_terms WHERE item_id IN {where}", ids)
+            return len(ids)
+
+    # Tags
+
+    def adjust_tag_counts(self, user_id, deltas):
+        deltas = [(user_id, tag, delta) for tag, delta in deltas.items() if delta]
+        if not deltas:
+            return
+        with self._lock, self._connection() as conn:
+            conn.executemany(
+                "INSERT INTO tag_counts (user_id, tag, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id, tag) DO UPDATE SET count = count + excluded.count",
+                deltas
+            )
+            conn.execute("DELETE FROM tag_counts WHERE user_id = ? AND count <= 0", (user_id,))
+
+    def top_tags(self, user_id, limit):
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT tag, count FROM tag_counts WHERE user_id = ? ORDER BY count DESC, tag LIMIT ?",
+                (user_id, limit)
+            )
+            return [(row['tag'], row['count']) for row in rows]
+
+    def rebuild_tags(self):
+        with self._lock, self._connection() as conn:
+            conn.execute("DELETE FROM item_tags")
+            conn.execute(
+                "INSERT OR IGNORE INTO item_tags (user_id, tag, created_at, _id) "
+                "SELECT items.user_id, tags.value, items.created_at, items._id "
+                "FROM items, json_each(items.tags) tags"
+            )
+            conn.execute("DELETE FROM tag_counts")
+            conn.execute(
+                "INSERT INTO tag_counts (user_id, tag, count) "
+                "SELECT t.user_id, t.tag, COUNT(*) FROM item_tags t JOIN items ON items._id = t._id "
+                "WHERE items.status != 'deleted' GROUP BY t.user_id, t.tag"
+            )
+
+    # Reminders
+
+    def set_reminder(self, item_id, user_id, due_at):
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reminders (_id, user_id, due_at, sent) VALUES (?, ?, ?, 0)",
+                (str(ObjectId(item_id)), user_id, _to_sql('due_at', due_at))
+            )
+
+    def cancel_reminders(self, item_ids):
+        if not item_ids:
+            return
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                f"DELETE FROM reminders WHERE _id IN ({', '.join('?' * len(item_ids))}) AND sent = 0",
+                [str(ObjectId(item_id)) for item_id in item_ids]
+            )
+
+    def find_due_reminders(self, until, user_id=None, after=None, limit=None):
+        # sent = 0 - האינדקס החלקי מכיל רק תזכורות שלא נשלחו
+        where = ["sent = 0", "due_at <= ?"]
+        params = [_to_sql('due_at', until)]
+        if user_id is not None:
+            where.append("user_id = ?")
+            params.append(user_id)
+        condition, keyset_params, order_by = _keyset(after, True, field='due_at')
+        if condition:
+            where.append(condition)
+            params.extend(keyset_params)
+        sql = f"SELECT {', '.join(REMINDER_COLUMNS)} FROM reminders WHERE {' AND '.join(where)} {order_by}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [_doc(row) for row in self._connection().execute(sql, params)]
+
+    def claim_reminders(self, owner, now, lease_until, limit, item_id=None):
+        now, lease_until = _to_sql('due_at', now), _to_sql('claim_until', lease_until)
+        where = ["sent = 0", "due_at <= ?", "(claim_until IS NULL OR claim_until <= ?)"]
+        params = [now, now]
+        if item_id is not None:
+            where.append("_id = ?")
+            params.append(str(ObjectId(item_id)))
+        with self._lock, self._connection() as conn:
+            # UPDATE אחד - אטומי גם מול תהליכים אחרים על אותו קובץ; RETURNING - רק מה שנתפס עכשיו
+            rows = conn.execute(
+                "UPDATE reminders SET claimed_by = ?, claim_until = ?, attempts = attempts + 1 "
+                f"WHERE _id IN (SELECT _id FROM reminders WHERE {' AND '.join(where)} ORDER BY due_at LIMIT ?) "
+                "RETURNING _id, user_id, due_at, attempts",
+                [owner, lease_until, *params, limit]
+            ).fetchall()
+            return sorted((_doc(row) for row in rows), key=lambda reminder: reminder['due_at'])
+
+    def release_reminder(self, item_id, owner, retry_at):
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "UPDATE reminders SET claimed_by = NULL, claim_until = ? "
+                "WHERE _id = ? AND claimed_by = ? AND sent = 0",
+                (_to_sql('claim_until', retry_at), str(ObjectId(item_id)), owner)
+            )
+
+    def mark_reminders_sent(self, item_ids, until):
+        if not item_ids:
+            return
+        ids = [str(ObjectId(item_id)) for item_id in item_ids]
+        where = f"_id IN ({', '.join('?' * len(ids))})"
+        with self._lock, self._connection() as conn:
+            # תזכורת שהוגדרה מחדש בינתיים לא מסומנת
+            conn.execute(
+                f"UPDATE reminders SET sent = 1, claimed_by = NULL, claim_until = NULL "
+                f"WHERE {where} AND due_at <= ?",
+                ids + [_to_sql('due_at', until)]
+            )
+            conn.execute(
+                f"UPDATE items SET reminder_date = NULL WHERE {where} AND reminder_date <= ?",
+                ids + [_to_sql('reminder_date', until)]
+            )
+
+    def migrate_reminders(self):
+        with self._lock, self._connection() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(items)")}
+            if 'reminded' not in columns:
+                return  # קובץ שנוצר אחרי הפיצול
+            conn.execute(
+                "INSERT OR IGNORE INTO reminders (_id, user_id, due_at, sent) "
+                "SELECT _id, user_id, reminder_date, 0 FROM items "
+                "WHERE reminded = 0 AND reminder_date IS NOT NULL AND status != 'deleted'"
+            )
+            # בפריט נשאר רק מועד של תזכורת ממתינה (להצגה)
+            conn.execute("UPDATE items SET reminder_date = NULL WHERE reminded = 1 OR status = 'deleted'")
+            conn.execute("DROP INDEX IF EXISTS items_due_reminders")
+
+    # Review log
+
+    def log_review_decision(self, user_id, item_id, action):
+        with self._lock, self._connection() as conn:
+            return conn.execute(
+                "INSERT INTO review_log (user_id, item_id, action) VALUES (?, ?, ?)",
+                (user_id, str(item_id), action)
+            ).lastrowid
+
+    def find_review_log(self):
+        with self._lock:
+            rows = self._connection().execute("SELECT * FROM review_log ORDER BY _id")
+            # ה-_id הוא מספר רץ, לא ObjectId
+            return [dict(row) for row in rows]
+
+    def delete_review_log(self, log_ids):
+        if not log_ids:
+            return
+        with self._lock, self._connection() as conn:
+            conn.execute(f"DELETE FROM review_log WHERE _id IN ({', '.join('?' * len(log_ids))})", list(log_ids))
+
+    # Leases
+
+    def acquire_lease(self, name, owner, now, until):
+        now, until = _to_sql('expire_at', now), _to_sql('expire_at', until)
+        with self._lock, self._connection() as conn:
+            # הארכה - ה-token לא משתנה
+            rows = conn.execute(
+                "UPDATE locks SET expire_at = ? WHERE _id = ? AND owner = ? RETURNING token",
+                (until, name, owner)
+            ).fetchall()
+            if not rows:
+                # השתלטות על lease שפג - token חדש
+                rows = conn.execute(
+                    "UPDATE locks SET owner = ?, expire_at = ?, token = token + 1 "
+                    "WHERE _id = ? AND expire_at <= ? RETURNING token",
+                    (owner, until, name, now)
+                ).fetchall()
+            if not rows:
+                # עוד לא קיים; אם קיים ובתוקף אצל מחזיק אחר - לא נוסף כלום
+                rows = conn.execute(
+                    "INSERT INTO locks (_id, owner, token, expire_at) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (_id) DO NOTHING RETURNING token",
+                    (name, owner, until)
+                ).fetchall()
+            return rows[0]['token'] if rows else None
+
+    def release_lease(self, name, owner, now):
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "UPDATE locks SET owner = NULL, expire_at = ? WHERE _id = ? AND owner = ?",
+                (_to_sql('expire_at', now), name, owner)
+            )
+
+    def get_lease(self, name):
+        with self._lock, self._connection() as conn:
+            row = conn.execute("SELECT * FROM locks WHERE _id = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            # ה-_id הוא שם, לא ObjectId
+            return {**_doc({key: row[key] for key in row.keys() if key != '_id'}), '_id': row['_id']}
+
+    # Maintenance
+
+    def create_indexes(self):
+        with self._lock:
+            self._connection().executescript(SCHEMA)
+
+    def applied_migrations(self):
+        with self._lock:
+            return {row['_id'] for row in self._connection().execute("SELECT _id FROM migrations")}
+
+    def record_migration(self, version, description, applied_at):
+        with self._lock, self._connection() as conn:
+            conn.execute(
+                "INSERT INTO migrations (_id, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, _to_sql('applied_at', applied_at))
+            )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
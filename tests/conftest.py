@@ -0,0 +1,58 @@
+"""
+Shared fixtures: every test that takes `backend` runs against memory,
+SQLite (a file in tmp_path) and MongoDB. MongoDB is MONGODB_URI (default
+localhost) with a throwaway database; the mongo case is skipped when no
+server answers.
+"""
+import os
+import uuid
+
+import pymongo
+import pytest
+
+import database
+import storage
+
+_mongo_reachable = None
+
+
+def _require_mongo():
+    global _mongo_reachable
+    if _mongo_reachable is None:
+        uri = os.getenv('MONGODB_URI') or 'mongodb://localhost:27017'
+        try:
+            client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=500)
+            client.admin.command('ping')
+            client.close()
+            _mongo_reachable = True
+        except pymongo.errors.PyMongoError:
+            _mongo_reachable = False
+    if not _mongo_reachable:
+        pytest.skip("MongoDB is not reachable")
+
+
+@pytest.fixture(params=storage.BACKENDS)
+def backend(request, tmp_path, monkeypatch):
+    """backend ריק, מחובר ל-database.py, עם מטמונים ואינדקס חיפוש נקיים"""
+    name = request.param
+    if name == 'mongo':
+        _require_mongo()
+        from storage import mongo
+        monkeypatch.setenv('MONGODB_URI', os.getenv('MONGODB_URI') or 'mongodb://localhost:27017')
+        monkeypatch.setattr(mongo, 'DB_NAME', f"thought_bot_test_{uuid.uuid4().hex[:12]}")
+    elif name == 'sqlite':
+        monkeypatch.setenv('SQLITE_PATH', str(tmp_path / 'thought_bot.db'))
+
+    created = storage.create(name)
+    monkeypatch.setattr(database, 'backend', created)
+    database.user_cache.clear()
+    database.view_cache.clear()
+    database.search_index.clear()
+    database._item_versions.clear()
+    database.migrate()
+    yield created
+
+    if name == 'mongo':
+        from storage import mongo
+        mongo.get_client().drop_database(mongo.DB_NAME)
+    created.close()
@@ -0,0 +1,108 @@
+"""
+ReminderScheduler on a fake job queue: the batched mark-sent and its
+interleaving with deliveries that finish while a mark is in flight.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import async_database
+import database
+import reminders
+
+USER = 2001
+
+
+class FakeJobQueue:
+    """job queue שמריץ את ה-jobs רק כשמבקשים"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def run_once(self, callback, when, **kwargs):
+        self.jobs.append(callback)
+
+    def run_repeating(self, callback, interval, **kwargs):
+        pass
+
+    def get_jobs_by_name(self, name):
+        return []
+
+    async def run_pending(self):
+        while self.jobs:
+            await self.jobs.pop(0)(None)
+
+
+def _due_reminder():
+    item_id = database.add_item(USER, 'task', 'call back')
+    database.set_reminder(item_id, datetime.now() - timedelta(seconds=1))
+    return item_id
+
+
+def test_delivery_during_mark_is_marked(backend, monkeypatch):
+    first, second = _due_reminder(), _due_reminder()
+    delivered = []
+
+    async def deliver(bot, item):
+        delivered.append(str(item['_id']))
+
+    async def run():
+        queue = FakeJobQueue()
+        scheduler = reminders.ReminderScheduler(queue, deliver, owner='test')
+        mark = async_database.mark_reminders_sent
+        in_flight, resume = asyncio.Event(), asyncio.Event()
+
+        async def slow_mark(item_ids):
+            in_flight.set()
+            await resume.wait()
+            await mark(item_ids)
+
+        [claimed] = await async_database.claim_reminders('test', reminders.REMINDER_LEASE, item_id=first)
+        await scheduler._deliver_claimed(None, claimed)
+        monkeypatch.setattr(async_database, 'mark_reminders_sent', slow_mark)
+        marking = asyncio.ensure_future(queue.jobs.pop(0)(None))
+        await in_flight.wait()
+
+        # השנייה מסתיימת בזמן שהסימון של הראשונה ממתין ל-DB
+        [claimed] = await async_database.claim_reminders('test', reminders.REMINDER_LEASE, item_id=second)
+        await scheduler._deliver_claimed(None, claimed)
+        resume.set()
+        await marking
+        monkeypatch.setattr(async_database, 'mark_reminders_sent', mark)
+        await queue.run_pending()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert delivered == [first, second]
+    assert scheduler._sent == set()
+    assert database.get_due_reminders(datetime.now()) == []
+    # שום דבר לא נשאר לתפיסה חוזרת אחרי שה-lease פג
+    assert database.backend.claim_reminders('other', datetime.now() + timedelta(hours=1),
+                                            datetime.now() + timedelta(hours=2), 10) == []
+
+
+def test_failed_mark_is_retried(backend, monkeypatch):
+    item_id = _due_reminder()
+
+    async def deliver(bot, item):
+        pass
+
+    async def run():
+        queue = FakeJobQueue()
+        scheduler = reminders.ReminderScheduler(queue, deliver, owner='test')
+        mark = async_database.mark_reminders_sent
+
+        async def failing_mark(item_ids):
+            raise RuntimeError('database is down')
+
+        [claimed] = await async_database.claim_reminders('test', reminders.REMINDER_LEASE, item_id=item_id)
+        await scheduler._deliver_claimed(None, claimed)
+        monkeypatch.setattr(async_database, 'mark_reminders_sent', failing_mark)
+        await queue.jobs.pop(0)(None)
+        assert scheduler._sent == {item_id} and len(queue.jobs) == 1
+        monkeypatch.setattr(async_database, 'mark_reminders_sent', mark)
+        await queue.run_pending()
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler._sent == set()
+    assert database.get_due_reminders(datetime.now()) == []
@@ -0,0 +1,76 @@
+"""
+Review decisions: each one reaches the review_log before the batched
+write, a process that dies mid-session loses none of them, and decisions
+only ever touch the reviewing user's own items.
+"""
+import asyncio
+
+import database
+import review
+
+USER = 2001
+OTHER = 2002
+
+
+def _add(user_id=USER, tags=None):
+    return database.add_item(user_id, 'thought', 'thought', tags)
+
+
+def _status(item_id):
+    return database.get_item_by_id(item_id)['status']
+
+
+def test_decisions_survive_a_crash_before_the_flush(backend, monkeypatch):
+    archived, deleted, kept = _add(tags=['t']), _add(tags=['t']), _add()
+
+    async def review_and_die():
+        session = await review.start_session(USER, [])
+        await session.decide(archived, 'archive')
+        await session.decide(deleted, 'delete')
+        await session.decide(kept, 'keep')
+
+    monkeypatch.setattr(review, '_sessions', {})
+    asyncio.run(review_and_die())
+    # SIGKILL: הסיקור בזיכרון אבד, ההחלטות עוד לא נכתבו לפריטים
+    monkeypatch.setattr(review, '_sessions', {})
+    assert [_status(item_id) for item_id in (archived, deleted)] == ['active', 'active']
+    assert len(backend.find_review_log()) == 3
+
+    asyncio.run(review.recover())
+    assert _status(archived) == 'archived'
+    assert _status(deleted) == 'deleted'
+    assert backend.get_item(kept)['keep_until'] is not None
+    assert dict(database.get_top_tags(USER)) == {'t': 1}
+    assert backend.find_review_log() == []
+
+    # הרצה חוזרת לא עושה כלום
+    assert database.replay_review_log() == 0
+
+
+def test_flush_writes_items_and_clears_the_log(backend, monkeypatch):
+    monkeypatch.setattr(review, 'REVIEW_FLUSH_EVERY', 2)
+    monkeypatch.setattr(review, '_sessions', {})
+    first, second = _add(), _add()
+
+    async def decide_both():
+        session = await review.start_session(USER, [])
+        await session.decide(first, 'archive')
+        await session.decide(second, 'archive')
+
+    asyncio.run(decide_both())
+    assert [_status(first), _status(second)] == ['archived', 'archived']
+    assert backend.find_review_log() == []
+
+
+def test_decisions_only_touch_own_items(backend):
+    mine = _add()
+    theirs = _add(user_id=OTHER)
+    database.apply_review_decisions(USER, [(mine, 'archive'), (theirs, 'delete')])
+    assert _status(mine) == 'archived'
+    assert _status(theirs) == 'active'
+
+
+def test_last_decision_on_an_item_wins(backend):
+    item_id = _add()
+    database.apply_review_decisions(USER, [(item_id, 'delete'), (item_id, 'archive')])
+    assert _status(item_id) == 'archived'
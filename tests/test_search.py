@@ -0,0 +1,81 @@
+"""
+Search paging through the callback-data cursor: encode_cursor /
+decode_cursor round trips and keyset pages over items created within the
+same millisecond.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+import utils
+
+USER = 3001
+
+
+class _FrozenClock(datetime):
+    """datetime.now() שמתקדם במיקרו-שנייה בכל קריאה, בתוך אותה אלפית שנייה"""
+
+    start = datetime(2026, 1, 1, 12, 0, 0, 100)
+    calls = 0
+
+    @classmethod
+    def now(cls, tz=None):
+        cls.calls += 1
+        return cls.start + timedelta(microseconds=cls.calls)
+
+
+def _page(cursor, direction):
+    items, has_prev, has_next = database.search_page(USER, 'meeting', cursor=cursor, direction=direction)
+    return items, has_prev, has_next
+
+
+def _token(item):
+    # כמו get_page_keyboard ו-handle_page: המפתח עובר דרך callback_data
+    return utils.decode_cursor(utils.encode_cursor(item, item['score']))
+
+
+def test_search_paging_round_trip_within_one_millisecond(backend, monkeypatch):
+    # האינדקס בזיכרון כבר בנוי - הפריטים נכנסים אליו מ-add_item
+    assert database.search_items(USER, 'meeting') == []
+    with monkeypatch.context() as patch:
+        patch.setattr(database, 'datetime', _FrozenClock)
+        ids = [database.add_item(USER, 'thought', f'meeting {i}') for i in range(12)]
+
+    pages = []
+    items, has_prev, has_next = _page(None, 'next')
+    pages.append(items)
+    while has_next:
+        items, has_prev, has_next = _page(_token(items[-1]), 'next')
+        assert has_prev
+        pages.append(items)
+
+    seen = [str(item['_id']) for page in pages for item in page]
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(set(seen))
+    # מהחדש לישן - סדר ההוספה הפוך
+    assert seen == ids[::-1]
+
+    # ◀️ הקודם מעמוד 2 מחזיר בדיוק את עמוד 1
+    back, has_prev, has_next = _page(_token(pages[1][0]), 'prev')
+    assert [item['_id'] for item in back] == [item['_id'] for item in pages[0]]
+    assert not has_prev and has_next
+
+
+@pytest.mark.parametrize('score', [0, 1, 255, 256, 300, 70000])
+def test_cursor_keeps_the_whole_score(score):
+    item = {'_id': '65a1b2c3d4e5f60718293a4b', 'created_at': datetime(2026, 3, 4, 5, 6, 7, 891000)}
+    assert utils.decode_cursor(utils.encode_cursor(item, score)) == (score, item['created_at'], item['_id'])
+    assert utils.decode_cursor(utils.encode_cursor(item)) == (item['created_at'], item['_id'])
+
+
+def test_cursor_order_follows_the_score():
+    item = {'_id': '65a1b2c3d4e5f60718293a4b', 'created_at': datetime(2026, 3, 4, 5, 6, 7)}
+    keys = [utils.decode_cursor(utils.encode_cursor(item, score)) for score in (300, 256, 255)]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_old_single_byte_score_cursor_still_decodes():
+    item = {'_id': '65a1b2c3d4e5f60718293a4b', 'created_at': datetime(2026, 3, 4, 5, 6, 7)}
+    assert utils.decode_cursor(utils.encode_cursor(item, 7))[0] == 7
+    assert utils.decode_cursor('not-a-cursor') is None
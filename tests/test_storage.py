@@ -0,0 +1,325 @@
+"""
+Behavioural tests of the storage backends, through database.py where it
+owns the rules and directly on the backend where the interface is the
+contract. Every test runs against memory, SQLite and MongoDB.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import cache
+import database
+import search
+from storage.base import bson_time
+
+USER = 1001
+OTHER = 1002
+
+
+def _add(user_id=USER, content='thought', tags=None, created_at=None):
+    item_id = database.add_item(user_id, 'thought', content, tags)
+    if created_at is not None:
+        database.backend.update_item(item_id, {'created_at': created_at})
+    return item_id
+
+
+# CRUD
+
+def test_add_and_get_item(backend):
+    item_id = _add(content='buy milk', tags=['home'])
+    item = database.get_item_by_id(item_id)
+    assert str(item['_id']) == item_id
+    assert item['user_id'] == USER
+    assert item['content'] == 'buy milk'
+    assert item['tags'] == ['home']
+    assert item['status'] == 'active'
+    assert item['created_at'] == bson_time(item['created_at'])
+
+
+def test_get_missing_item(backend):
+    assert database.get_item_by_id('0' * 24) is None
+
+
+def test_update_content_and_tags(backend):
+    item_id = _add(content='draft', tags=['a'])
+    database.update_item_content(item_id, 'final', tags=['b'])
+    item = database.get_item_by_id(item_id)
+    assert item['content'] == 'final'
+    assert item['tags'] == ['b']
+    assert dict(database.get_top_tags(USER)) == {'b': 1}
+
+
+def test_status_changes_update_tag_counts(backend):
+    item_id = _add(tags=['work'])
+    database.update_item_status(item_id, 'archived')
+    assert database.get_item_by_id(item_id)['status'] == 'archived'
+    assert dict(database.get_top_tags(USER)) == {'work': 1}
+    database.update_item_status(item_id, 'deleted')
+    assert database.get_top_tags(USER) == []
+
+
+def test_bulk_action_only_touches_own_items(backend):
+    mine = [_add() for _ in range(3)]
+    theirs = _add(user_id=OTHER)
+    count = database.apply_bulk_action(USER, mine + [theirs], 'archive')
+    assert count == 3
+    assert all(database.get_item_by_id(item_id)['status'] == 'archived' for item_id in mine)
+    assert database.get_item_by_id(theirs)['status'] == 'active'
+
+
+def test_bulk_action_leaves_other_users_search_index_alone(backend):
+    mine = _add(content='meeting notes')
+    theirs = _add(user_id=OTHER, content='meeting notes')
+    # האינדקס של OTHER בנוי בזיכרון
+    assert [str(item['_id']) for item in database.search_items(OTHER, 'meeting')] == [theirs]
+    assert database.apply_bulk_action(USER, [mine, theirs], 'delete') == 1
+    assert [str(item['_id']) for item in database.search_items(OTHER, 'meeting')] == [theirs]
+    assert database.search_items(USER, 'meeting') == []
+
+
+def test_users(backend):
+    user = database.get_or_create_user(USER)
+    assert user['user_id'] == USER
+    assert database.should_review(USER)
+    database.update_last_review(USER)
+    assert not database.should_review(USER)
+
+
+def _multi_instance(monkeypatch):
+    # מה ש-MULTI_INSTANCE=1 בונה בטעינת database.py
+    monkeypatch.setattr(database, 'user_cache', cache.TTLCache(0, database.USER_CACHE_TTL))
+    monkeypatch.setattr(database, 'view_cache', cache.TTLCache(0, database.VIEW_CACHE_TTL))
+    monkeypatch.setattr(database, 'search_index', search.SearchIndex(max_users=0))
+
+
+def test_multi_instance_sees_writes_of_other_instances(backend, monkeypatch):
+    _multi_instance(monkeypatch)
+    item_id = _add(content='meeting notes', tags=['work'])
+    assert [str(item['_id']) for item in database.get_items_page(USER, 'today')[0]] == [item_id]
+    assert [str(item['_id']) for item in database.search_items(USER, 'meeting')] == [item_id]
+    assert database.should_review(USER)
+
+    # כתיבות של instance אחר - ישירות ב-DB, בלי לעבור דרך database.py של התהליך הזה
+    backend.update_item(item_id, {'status': 'deleted'})
+    backend.update_user(USER, {'next_review_at': datetime.now() + timedelta(days=1)})
+
+    assert database.get_items_page(USER, 'today')[0] == []
+    assert database.search_items(USER, 'meeting') == []
+    assert not database.should_review(USER)
+
+
+# Keyset paging
+
+def test_keyset_paging_round_trip(backend):
+    now = bson_time(datetime.now())
+    # שלושה פריטים באותה אלפית שנייה - ה-_id מכריע
+    ids = [_add(content=f'item {i}', created_at=now - timedelta(seconds=i // 3)) for i in range(12)]
+    _add(user_id=OTHER)
+
+    pages = []
+    cursor = None
+    while True:
+        items, has_prev, has_next = database.get_items_page(USER, 'today', cursor, 'next', limit=5)
+        assert has_prev == (cursor is not None)
+        pages.append([str(item['_id']) for item in items])
+        if not has_next:
+            break
+        cursor = (items[-1]['created_at'], str(items[-1]['_id']))
+
+    seen = [item_id for page in pages for item_id in page]
+    assert sorted(seen) == sorted(ids)
+    assert len(seen) == len(set(seen))
+    assert [len(page) for page in pages] == [5, 5, 2]
+
+    # חזרה אחורה מהעמוד האחרון מחזירה בדיוק את העמוד הקודם
+    first = database.get_items_page(USER, 'today', None, 'next', limit=5)[0]
+    second = database.get_items_page(
+        USER, 'today', (first[-1]['created_at'], str(first[-1]['_id'])), 'next', limit=5
+    )[0]
+    back, has_prev, has_next = database.get_items_page(
+        USER, 'today', (second[0]['created_at'], str(second[0]['_id'])), 'prev', limit=5
+    )
+    assert [item['_id'] for item in back] == [item['_id'] for item in first]
+    assert not has_prev and has_next
+
+
+def test_tag_page(backend):
+    tagged = [_add(tags=['x']) for _ in range(4)]
+    _add(tags=['y'])
+    items, _, has_next = database.get_tag_page(USER, 'x', limit=3)
+    assert len(items) == 3 and has_next
+    rest, _, has_next = database.get_tag_page(
+        USER, 'x', (items[-1]['created_at'], str(items[-1]['_id'])), limit=3
+    )
+    assert not has_next
+    assert sorted(str(item['_id']) for item in items + rest) == sorted(tagged)
+
+
+# Reminders
+
+def test_reminder_claim_release_and_mark(backend):
+    now = datetime.now()
+    first = _add()
+    second = _add()
+    later = _add()
+    database.set_reminder(first, now - timedelta(minutes=2))
+    database.set_reminder(second, now - timedelta(minutes=1))
+    database.set_reminder(later, now + timedelta(hours=1))
+
+    claimed = database.claim_reminders('a', timedelta(minutes=1), limit=10)
+    assert [str(reminder['_id']) for reminder in claimed] == [first, second]
+    assert all(reminder['attempts'] == 1 and reminder['user_id'] == USER for reminder in claimed)
+    # תפוסות - instance אחר לא מקבל אותן
+    assert database.claim_reminders('b', timedelta(minutes=1), limit=10) == []
+
+    # שחרור רק על ידי מי שתפס
+    database.release_reminder(first, 'b', timedelta(0))
+    assert database.claim_reminders('b', timedelta(minutes=1), item_id=first) == []
+    database.release_reminder(first, 'a', timedelta(0))
+    again = database.claim_reminders('b', timedelta(minutes=1), item_id=first)
+    assert len(again) == 1 and again[0]['attempts'] == 2
+
+    # שחרור עם השהיה - לא נתפסת עד שהיא עוברת
+    database.release_reminder(second, 'a', timedelta(hours=1))
+    assert database.claim_reminders('c', timedelta(minutes=1), item_id=second) == []
+
+    database.mark_reminders_sent([first])
+    assert database.get_item_by_id(first).get('reminder_date') is None
+    due = [str(reminder['_id']) for reminder in database.get_due_reminders(now + timedelta(hours=2))]
+    assert due == [second, later]
+
+
+def test_expired_claim_is_reclaimed(backend):
+    item_id = _add()
+    database.set_reminder(item_id, datetime.now() - timedelta(minutes=1))
+    now = datetime.now()
+    assert len(backend.claim_reminders('a', now, now - timedelta(seconds=1), 1)) == 1
+    reclaimed = database.claim_reminders('b', timedelta(minutes=1))
+    assert [str(reminder['_id']) for reminder in reclaimed] == [item_id]
+    assert reclaimed[0]['attempts'] == 2
+
+
+def test_deleting_item_cancels_reminder(backend):
+    item_id = _add()
+    database.set_reminder(item_id, datetime.now() - timedelta(minutes=1))
+    database.update_item_status(item_id, 'deleted')
+    assert database.get_due_reminders(datetime.now()) == []
+    assert database.claim_reminders('a', timedelta(minutes=1), limit=10) == []
+
+
+# Leases
+
+def test_lease_renew_takeover_and_release(backend):
+    now = datetime.now()
+    ttl = timedelta(seconds=30)
+    assert backend.get_lease('jobs') is None
+    assert backend.acquire_lease('jobs', 'a', now, now + ttl) == 1
+    assert backend.acquire_lease('jobs', 'b', now, now + ttl) is None
+    # הארכה שומרת על ה-token
+    assert backend.acquire_lease('jobs', 'a', now, now + ttl) == 1
+
+    # אחרי שפג - השתלטות עם token חדש
+    later = now + ttl + timedelta(seconds=1)
+    assert backend.acquire_lease('jobs', 'b', later, later + ttl) == 2
+    assert backend.acquire_lease('jobs', 'a', later, later + ttl) is None
+    lease = backend.get_lease('jobs')
+    assert (lease['_id'], lease['owner'], lease['token']) == ('jobs', 'b', 2)
+
+    backend.release_lease('jobs', 'a', later)
+    assert backend.get_lease('jobs')['owner'] == 'b'
+    backend.release_lease('jobs', 'b', later)
+    assert backend.acquire_lease('jobs', 'a', later, later + ttl) == 3
+
+
+# Tiering
+
+def test_tiering_moves_old_items_and_restores_on_action(backend):
+    old = datetime.now() - timedelta(days=400)
+    deleted = _add(tags=['t'])
+    archived = _add(tags=['t'])
+    fresh = _add(tags=['t'])
+    database.update_item_status(deleted, 'deleted')
+    database.update_item_status(archived, 'archived')
+    database.update_item_status(fresh, 'archived')
+    backend.update_item(deleted, {'status_at': old})
+    backend.update_item(archived, {'status_at': old})
+
+    assert database.tier_items(limit=10) == 2
+    assert database.tier_items(limit=10) == 0
+    assert backend.get_item(archived) is None
+    assert backend.get_item(archived, cold=True)['status'] == 'archived'
+    assert dict(database.get_top_tags(USER)) == {'t': 1}
+
+    old_page = database.get_items_page(USER, 'old')[0]
+    assert [str(item['_id']) for item in old_page] == [archived]
+
+    # פעולה על פריט מה-cold מחזירה אותו ל-hot
+    database.update_item_status(archived, 'active')
+    assert backend.get_item(archived)['status'] == 'active'
+    assert backend.get_item(archived, cold=True) is None
+    assert dict(database.get_top_tags(USER)) == {'t': 2}
+
+
+def test_editing_a_cold_item_keeps_its_tags_searchable(backend):
+    item_id = _add(content='old plan', tags=['garden'])
+    database.update_item_status(item_id, 'archived')
+    backend.update_item(item_id, {'status_at': datetime.now() - timedelta(days=400)})
+    assert database.tier_items(limit=10) == 1
+    # האינדקס בזיכרון בנוי, והפריט חוזר אליו בעריכה
+    assert database.search_items(USER, 'garden') == []
+
+    database.update_item_content(item_id, 'new plan')
+    item = backend.get_item(item_id)
+    assert item['content'] == 'new plan'
+    assert item['tags'] == ['garden']
+    assert [str(found['_id']) for found in database.search_items(USER, 'garden')] == [item_id]
+    assert [str(found['_id']) for found in database.get_tag_page(USER, 'garden')[0]] == [item_id]
+    assert dict(database.get_top_tags(USER)) == {'garden': 1}
+
+
+class _PausedCopy:
+    """items_cold שבו שתי קריאות ל-move_to_cold מחכות זו לזו אחרי ההעתקה - שתיהן בחרו את אותו batch"""
+
+    def __init__(self, collection):
+        self._collection = collection
+        self._barrier = threading.Barrier(2, timeout=10)
+
+    def __getattr__(self, attr):
+        return getattr(self._collection, attr)
+
+    def bulk_write(self, *args, **kwargs):
+        result = self._collection.bulk_write(*args, **kwargs)
+        self._barrier.wait()
+        return result
+
+
+def test_overlapping_tiering_counts_each_item_once(backend, monkeypatch):
+    old = datetime.now() - timedelta(days=400)
+    moved = [_add(tags=['t']) for _ in range(4)]
+    _add(tags=['t'])
+    for item_id in moved:
+        database.update_item_status(item_id, 'archived')
+        backend.update_item(item_id, {'status_at': old})
+    if backend.name == 'mongo':
+        from storage import mongo
+        monkeypatch.setattr(mongo, 'cold_items_collection', _PausedCopy(mongo.cold_items_collection))
+
+    # שני leaders חופפים (אחד נתקע אחרי הבדיקה של ה-lease)
+    with ThreadPoolExecutor(2) as pool:
+        counts = list(pool.map(lambda _: database.tier_items(limit=10), range(2)))
+
+    assert sum(counts) == 4
+    assert dict(database.get_top_tags(USER)) == {'t': 1}
+    assert all(backend.get_item(item_id, cold=True) for item_id in moved)
+
+
+def test_purge_cold_removes_expired_deleted_items(backend):
+    deleted = _add()
+    database.update_item_status(deleted, 'deleted')
+    backend.update_item(deleted, {'status_at': datetime.now() - timedelta(days=400)})
+    database.tier_items(limit=10)
+    assert backend.get_item(deleted, cold=True) is not None
+    assert backend.purge_cold(datetime.now(), 10) in (0, 1)  # ב-MongoDB המחיקה היא TTL
+    if backend.name != 'mongo':
+        assert backend.purge_cold(datetime.now() + database.COLD_DELETED_TTL + timedelta(days=1), 10) == 1
+        assert backend.get_item(deleted, cold=True) is None
@@ -0,0 +1,50 @@
+"""
+PerUserUpdateProcessor through PTB's own process_update: updates of one
+user run in order, updates of different users run concurrently.
+"""
+import asyncio
+
+from telegram import Update, User
+from telegram.ext import BaseUpdateProcessor
+
+from update_processor import PerUserUpdateProcessor
+
+
+def _update(update_id, user_id):
+    update = Update(update_id)
+    # effective_user נקבע מההודעה; כאן ישירות, בלי לבנות Message
+    update._effective_user = User(user_id, 'user', is_bot=False)
+    return update
+
+
+def test_process_update_is_not_overridden():
+    assert 'process_update' not in PerUserUpdateProcessor.__dict__
+    assert PerUserUpdateProcessor.process_update is BaseUpdateProcessor.process_update
+
+
+def test_same_user_in_order_other_users_concurrently():
+    async def scenario():
+        processor = PerUserUpdateProcessor(max_concurrent_updates=4)
+        events = []
+        release = asyncio.Event()
+
+        async def handle(name, wait):
+            events.append(f'{name} start')
+            if wait:
+                await release.wait()
+            events.append(f'{name} end')
+
+        first = asyncio.create_task(processor.process_update(_update(1, 1), handle('a1', True)))
+        second = asyncio.create_task(processor.process_update(_update(2, 1), handle('a2', False)))
+        other = asyncio.create_task(processor.process_update(_update(3, 2), handle('b', False)))
+        await other
+        # b לא חיכה ל-a1; a2 עוד ממתין לנעילה של משתמש 1
+        assert events == ['a1 start', 'b start', 'b end']
+        assert processor.stats()['active_users'] == 1
+        release.set()
+        await asyncio.gather(first, second)
+        return events, processor.stats()
+
+    events, stats = asyncio.run(scenario())
+    assert events[3:] == ['a1 end', 'a2 start', 'a2 end']
+    assert stats['processed'] == 3 and stats['active_users'] == 0
@@ -0,0 +1,67 @@
+"""
+Webhook mode: Telegram's secret_token accepts only [A-Za-z0-9_-], so a
+generated base64 secret must reach setWebhook in a form it accepts, and
+requests carrying that form must be let through; and the bot refuses to
+start as one of several replicas.
+"""
+import asyncio
+import re
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+import webhook
+
+# כמו ש-generateValue של Render מייצר
+BASE64_SECRET = 'q3+Zt/8kLw0aZ1x9PZ4mYk2bT5vN0rQwE7sJ1uHcG2o='
+
+
+def test_set_webhook_from_base64_secret():
+    settings = webhook.webhook_settings('https://bot.example.com/', BASE64_SECRET, '/webhook')
+    assert settings['url'] == 'https://bot.example.com/webhook'
+    assert re.fullmatch(r'[A-Za-z0-9_-]{1,256}', settings['secret_token'])
+    # יציב בין הפעלות ובין replicas
+    assert settings['secret_token'] == webhook.secret_token(BASE64_SECRET)
+
+
+def test_valid_secret_is_sent_as_is():
+    assert webhook.secret_token('my_secret-1') == 'my_secret-1'
+    assert webhook.secret_token(None) is None
+    assert webhook.secret_token('x' * 257) != 'x' * 257
+
+
+class _Application:
+    bot = None
+    running = True
+
+    def __init__(self):
+        self.update_queue = asyncio.Queue()
+
+
+def test_server_accepts_the_derived_token():
+    async def scenario():
+        application = _Application()
+        server = webhook.WebhookServer(application, secret=BASE64_SECRET)
+        async with TestClient(TestServer(server.app)) as client:
+            update = {'update_id': 1}
+            sent = webhook.webhook_settings('https://bot.example.com', BASE64_SECRET)['secret_token']
+            ok = await client.post('/webhook', json=update, headers={webhook.SECRET_HEADER: sent})
+            raw = await client.post('/webhook', json=update, headers={webhook.SECRET_HEADER: BASE64_SECRET})
+            return ok.status, raw.status, application.update_queue.qsize()
+
+    assert asyncio.run(scenario()) == (200, 403, 1)
+
+
+def test_webhook_mode_refuses_multiple_replicas(monkeypatch):
+    import bot
+    import database
+
+    def build_application(token):
+        raise AssertionError("the bot must not start")
+
+    monkeypatch.setenv('TELEGRAM_TOKEN', 'token')
+    monkeypatch.setattr(bot, 'BOT_MODE', 'webhook')
+    monkeypatch.setattr(database, 'MULTI_INSTANCE', True)
+    monkeypatch.setattr(bot, 'build_application', build_application)
+    with pytest.raises(SystemExit, match='single replica'):
+        bot.main()
@@ -0,0 +1,80 @@
+"""
+tiering.py - Periodic move of deleted and old archived items to the cold tier
+
+Every TIER_INTERVAL_SECONDS a job moves items that were deleted more than
+TIER_DELETED_GRACE_DAYS ago, and items archived more than
+TIER_ARCHIVED_AFTER_DAYS ago (without a pending reminder), from the items
+collection to items_cold (database.tier_items). It works in batches of
+TIER_BATCH_SIZE with a short pause between them, and stops after
+TIER_MAX_BATCHES so a large backlog is spread over several runs instead
+of loading the database in one go. Deleted items expire from the cold tier
+after COLD_DELETED_TTL_DAYS - a TTL index with MongoDB, purge_cold with
+the other backends, in the same bounded batches.
+
+The job runs only on the instance that holds the leader lease
+(leader.py), which is checked again before every batch. That check does
+not fence the writes, so a leader that froze mid-run can overlap the new
+one by one batch. That is harmless: the copy to cold is an upsert, and
+move_to_cold returns only the items its own call removed from items, so
+each item is taken off the tag counts and the search index once.
+
+Cold items are still read on demand: the old archive and a search in it
+(bot.py), opening an item, and any action on one, which moves it back.
+"""
+import asyncio
+import logging
+import os
+import time
+
+import async_database as db
+import leader
+
+logger = logging.getLogger(__name__)
+
+TIER_INTERVAL_SECONDS = int(os.getenv('TIER_INTERVAL_SECONDS', '3600'))
+TIER_BATCH_SIZE = int(os.getenv('TIER_BATCH_SIZE', '500'))
+TIER_MAX_BATCHES = int(os.getenv('TIER_MAX_BATCHES', '20'))
+# הפסקה בין batches - כדי לא לתפוס את ה-DB ברצף
+TIER_PAUSE_SECONDS = float(os.getenv('TIER_PAUSE_SECONDS', '0.5'))
+
+_stats = {'runs': 0, 'moved': 0, 'purged': 0, 'errors': 0, 'last_run_seconds': 0.0}
+
+
+async def _batches(operation):
+    """מריץ batches עד שאחד חוזר לא מלא (או עד TIER_MAX_BATCHES); מחזיר כמה פריטים טופלו"""
+    total = 0
+    for batch in range(TIER_MAX_BATCHES):
+        if batch:
+            await asyncio.sleep(TIER_PAUSE_SECONDS)
+        # instance אחר השתלט בינתיים - מפסיקים (מצמצם חפיפה, לא מונע אותה - ראו למעלה)
+        if not await leader.lease.still_leader():
+            logger.warning("Tiering stopped: lease %s is no longer held", leader.lease.name)
+            break
+        count = await operation(TIER_BATCH_SIZE)
+        total += count
+        if count < TIER_BATCH_SIZE:
+            break
+    return total
+
+
+async def run(context=None):
+    """Job: העברה ל-cold ואז ניקוי של פריטים מחוקים שתוקפם עבר"""
+    started = time.perf_counter()
+    try:
+        moved = await _batches(db.tier_items)
+        purged = await _batches(db.purge_cold)
+    except Exception:
+        _stats['errors'] += 1
+        logger.exception("Tiering run failed")
+        return
+    finally:
+        _stats['runs'] += 1
+        _stats['last_run_seconds'] = round(time.perf_counter() - started, 3)
+    _stats['moved'] += moved
+    _stats['purged'] += purged
+    if moved or purged:
+        logger.info("Tiering: moved %d items to cold, purged %d", moved, purged)
+
+
+def stats():
+    return dict(_stats)
@@ -0,0 +1,66 @@
+"""
+tokenizer.py - Hebrew-aware tokenizing for search
+
+Normalizes niqqud, final letters and abbreviation quotes, and expands
+Hebrew words with their attached prefixes (ו, ה, ב, ל, מ, ש, כ) stripped,
+so a search for "עבודה" also finds "בעבודה".
+"""
+import re
+
+# אותיות שיכולות להיות מחוברות לתחילת מילה
+HEBREW_PREFIXES = 'והבלמשכ'
+
+# כמה אותיות תחילית להוריד לכל היותר (לדוגמה: "וכשה...")
+MAX_PREFIX_LETTERS = 3
+
+# אורך מינימלי למה שנשאר אחרי הורדת תחיליות
+MIN_STEM_LENGTH = 2
+
+FINAL_LETTERS = str.maketrans('ךםןףץ', 'כמנפצ')
+
+# מקף עברי, פסק, סוף פסוק ונו"ן הפוכה מפרידים בין מילים
+_HEBREW_SEPARATORS_RE = re.compile('[\u05BE\u05C0\u05C3\u05C6]')
+# טעמים וניקוד
+_NIQQUD_RE = re.compile('[\u0591-\u05C7]')
+# גרש / גרשיים בראשי תיבות (צה"ל, ח'ברה)
+_ABBREVIATION_RE = re.compile('(?<=[\u05D0-\u05EA])["\'\u05F3\u05F4](?=[\u05D0-\u05EA])')
+_HEBREW_WORD_RE = re.compile('^[\u05D0-\u05EA]+$')
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """מנרמל טקסט: בלי ניקוד, בלי אותיות סופיות, אותיות קטנות"""
+    text = _HEBREW_SEPARATORS_RE.sub(' ', text)
+    text = _NIQQUD_RE.sub('', text)
+    text = _ABBREVIATION_RE.sub('', text)
+    return text.translate(FINAL_LETTERS).casefold()
+
+
+def tokenize(text):
+    """מפרק טקסט למילים מנורמלות"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(normalize(text))
+
+
+def strip_prefixes(word):
+    """מחזיר את המילה ואת הגרסאות שלה בלי אותיות התחילית"""
+    variants = [word]
+    if not _HEBREW_WORD_RE.match(word):
+        return variants
+
+    stem = word
+    for _ in range(MAX_PREFIX_LETTERS):
+        if stem[0] not in HEBREW_PREFIXES or len(stem) - 1 < MIN_STEM_LENGTH:
+            break
+        stem = stem[1:]
+        variants.append(stem)
+    return variants
+
+
+def index_terms(text):
+    """כל המונחים לאינדקס: המילים עצמן וגרסאותיהן בלי תחיליות"""
+    terms = set()
+    for word in tokenize(text):
+        terms.update(strip_prefixes(word))
+    return terms
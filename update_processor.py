@@ -0,0 +1,85 @@
+"""
+update_processor.py - Concurrent update processing with per-user ordering
+
+Updates of different users are handled concurrently (up to
+MAX_CONCURRENT_UPDATES at once), while updates of the same user are
+serialized by a per-user lock, so ConversationHandler state and
+context.user_data stay consistent. Time spent waiting for a user's lock
+is recorded and reported through stats().
+
+The lock is taken in do_process_update, the hook PTB leaves to subclasses
+(process_update is final and holds the concurrency slot around it), so an
+update waiting for its user's lock holds one of the slots meanwhile.
+"""
+import asyncio
+import os
+import time
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '32'))
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """עיבוד מקבילי בין משתמשים, לפי הסדר לכל משתמש"""
+
+    def __init__(self, max_concurrent_updates=MAX_CONCURRENT_UPDATES):
+        super().__init__(max_concurrent_updates)
+        self._locks = {}  # user_id -> [asyncio.Lock, מספר עדכונים שמחזיקים / מחכים]
+
+        # מדדים
+        self.processed = 0
+        self.contended = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    async def do_process_update(self, update, coroutine):
+        # נקרא מ-process_update (final ב-PTB) בתוך המקום במגבלה הגלובלית
+        user_id = _user_id(update)
+        if user_id is None:
+            self.processed += 1
+            await coroutine
+            return
+
+        entry = self._locks.setdefault(user_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            started = time.monotonic()
+            async with entry[0]:
+                self._record_wait(time.monotonic() - started)
+                self.processed += 1
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user_id]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def _record_wait(self, seconds):
+        if seconds > 0.001:
+            self.contended += 1
+        self._wait_total += seconds
+        self._wait_max = max(self._wait_max, seconds)
+
+    def stats(self):
+        """מדדי העיבוד: עומס וזמני המתנה לנעילת משתמש"""
+        return {
+            'max_concurrent': self.max_concurrent_updates,
+            'active_users': len(self._locks),
+            'processed': self.processed,
+            'lock_contended': self.contended,
+            'lock_wait_avg_ms': round(self._wait_total / self.processed * 1000, 2) if self.processed else 0.0,
+            'lock_wait_max_ms': round(self._wait_max * 1000, 1),
+        }
+
+
+def _user_id(update):
+    if isinstance(update, Update) and update.effective_user:
+        return update.effective_user.id
+    return None
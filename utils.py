@@ -2,8 +2,11 @@
 utils.py - Helper functions
 """
 from datetime import datetime, timedelta
+import base64
 import re
 
+from bson.objectid import ObjectId
+
 
 def extract_tags(text):
     """מחלץ תגיות מטקסט (#תגית)"""
@@ -34,26 +37,71 @@ def format_item(item):
     
     # תזכורת
     reminder_str = ""
-    if item.get('reminder_date') and not item.get('reminded'):
+    # reminder_date נשאר בפריט רק עד שהתזכורת נשלחת
+    if item.get('reminder_date'):
         reminder_date = item['reminder_date']
         reminder_str = f"\n⏰ תזכורת ל-{reminder_date.strftime('%d/%m/%Y %H:%M')}"
     
     return f"{item_type} | {date_str}{tags_str}\n{item['content']}{reminder_str}"
 
 
-def format_items_list(items):
-    """מעצב רשימת פריטים"""
+def format_items_list(items, start=1, preview_chars=None):
+    """מעצב רשימת פריטים (ממוספרת מ-start, עם קיצור תוכן ארוך)"""
     if not items:
         return "אין פריטים להצגה 🤷‍♂️"
     
     result = []
-    for idx, item in enumerate(items, 1):
+    for idx, item in enumerate(items, start):
+        if preview_chars and len(item['content']) > preview_chars:
+            item = {**item, 'content': item['content'][:preview_chars].rstrip() + "…"}
         result.append(f"{idx}. {format_item(item)}")
         result.append("─" * 30)
     
     return "\n".join(result)
 
 
+# נקודת הייחוס לקידוד cursor (תאריכים נשמרים בלי אזור זמן)
+_EPOCH = datetime(1970, 1, 1)
+# ציון חיפוש עד 2^32 - הרבה מעבר למה ששאילתה בגודל הודעה בטלגרם יכולה לצבור
+_MAX_SCORE_BYTES = 4
+
+
+def encode_cursor(item, score=None):
+    """מקודד את מפתח העימוד של פריט לטוקן קצר ל-callback_data (עד 64 בתים)
+
+    (created_at, _id), ובחיפוש (score, created_at, _id): 6 בתים של אלפיות שנייה,
+    12 של ה-ObjectId, ובחיפוש לפניהם הציון בכמה בתים שצריך (עד _MAX_SCORE_BYTES) -
+    24 תווי base64, או 26-30 בחיפוש.
+    """
+    millis = (item['created_at'] - _EPOCH) // timedelta(milliseconds=1)
+    raw = millis.to_bytes(6, 'big') + ObjectId(item['_id']).binary
+    if score is not None:
+        raw = score.to_bytes(max(1, (score.bit_length() + 7) // 8), 'big') + raw
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(token):
+    """מפענח טוקן של encode_cursor; מחזיר (created_at, item_id), (score, created_at, item_id) או None"""
+    if '.' in token:
+        # פורמט קודם ("millis.id") - בהודעות שנשלחו לפני השינוי
+        try:
+            millis, item_id = token.split('.')
+            return _EPOCH + timedelta(milliseconds=int(millis)), item_id
+        except ValueError:
+            return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    except ValueError:
+        return None
+    if not 18 <= len(raw) <= 18 + _MAX_SCORE_BYTES:
+        return None
+    key = (
+        _EPOCH + timedelta(milliseconds=int.from_bytes(raw[-18:-12], 'big')),
+        str(ObjectId(raw[-12:]))
+    )
+    return (int.from_bytes(raw[:-18], 'big'),) + key if len(raw) > 18 else key
+
+
 def get_reminder_date(option):
     """ממיר אופציית תזכורת לתאריך"""
     now = datetime.now()
@@ -0,0 +1,153 @@
+"""
+webhook.py - Webhook serving mode with an embedded aiohttp server
+
+Selected with BOT_MODE=webhook. Telegram POSTs updates to WEBHOOK_PATH,
+the X-Telegram-Bot-Api-Secret-Token header is checked against the token
+derived from WEBHOOK_SECRET (see secret_token), and the update is handed
+to the Application queue.
+GET /healthz answers the load balancer and GET /metrics serves the
+Prometheus metrics (see metrics.py). On SIGTERM/SIGINT the server
+stops accepting requests, finishes the ones in flight and lets the
+Application drain the queued updates before shutting down.
+
+Local test (no WEBHOOK_URL, so setWebhook is skipped):
+    BOT_MODE=webhook WEBHOOK_SECRET=s python bot.py
+    curl -H 'X-Telegram-Bot-Api-Secret-Token: s' -d @update.json localhost:8080/webhook
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import re
+import signal
+
+from aiohttp import web
+from telegram import Update
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # הכתובת הציבורית, לדוגמה https://thought-bot.onrender.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '8080'))
+
+# כמה זמן לחכות לבקשות שבטיפול בזמן כיבוי
+SHUTDOWN_TIMEOUT = float(os.getenv('WEBHOOK_SHUTDOWN_TIMEOUT', '30'))
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# מה שטלגרם מקבל ב-secret_token של setWebhook
+_VALID_SECRET_TOKEN = re.compile(r'[A-Za-z0-9_-]{1,256}')
+
+
+def secret_token(secret):
+    """ה-secret_token שנשלח ל-setWebhook ונבדק בכל בקשה, מתוך WEBHOOK_SECRET
+
+    טלגרם מקבל רק A-Z a-z 0-9 _ - ועד 256 תווים. סוד אחר (למשל base64 עם + / = שמייצר
+    Render) מומר ל-sha256 שלו ב-hex, כדי ש-setWebhook לא ייכשל
+    """
+    if not secret or _VALID_SECRET_TOKEN.fullmatch(secret):
+        return secret
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def webhook_settings(url=WEBHOOK_URL, secret=WEBHOOK_SECRET, path=WEBHOOK_PATH):
+    """הפרמטרים של bot.set_webhook"""
+    return {
+        'url': url.rstrip('/') + path,
+        'secret_token': secret_token(secret),
+        'allowed_updates': Update.ALL_TYPES
+    }
+
+
+class WebhookServer:
+    """שרת HTTP שמעביר עדכונים מטלגרם ל-Application"""
+
+    def __init__(self, application, secret=WEBHOOK_SECRET, path=WEBHOOK_PATH):
+        self.application = application
+        self.secret = secret_token(secret)
+        self.path = path
+        self.accepting = True
+        self.app = web.Application()
+        self.app.router.add_post(path, self.handle_update)
+        self.app.router.add_get('/healthz', self.handle_health)
+        self.app.router.add_get('/metrics', self.handle_metrics)
+
+    async def handle_update(self, request):
+        if not self.accepting:
+            return web.Response(status=503)
+
+        if self.secret:
+            token = request.headers.get(SECRET_HEADER, '')
+            if not hmac.compare_digest(token, self.secret):
+                return web.Response(status=403)
+
+        try:
+            update = Update.de_json(await request.json(), self.application.bot)
+        except (TypeError, KeyError, ValueError):
+            # JSON לא תקין או שאינו Update
+            update = None
+        if update is None:
+            return web.Response(status=400)
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_health(self, request):
+        status = 200 if self.accepting and self.application.running else 503
+        return web.json_response({
+            'status': 'ok' if status == 200 else 'shutting_down',
+            'pending_updates': self.application.update_queue.qsize()
+        }, status=status)
+
+    async def handle_metrics(self, request):
+        if metrics.METRICS_TOKEN:
+            token = request.headers.get('Authorization', '')
+            if not hmac.compare_digest(token, f"Bearer {metrics.METRICS_TOKEN}"):
+                return web.Response(status=403)
+        return web.Response(text=metrics.render(), content_type='text/plain', charset='utf-8')
+
+
+async def run(application, host=HOST, port=PORT):
+    """מריץ את הבוט במצב webhook עד SIGTERM / SIGINT"""
+    if not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set - webhook requests are not authenticated")
+
+    server = WebhookServer(application)
+    runner = web.AppRunner(server.app, shutdown_timeout=SHUTDOWN_TIMEOUT)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    await application.start()
+
+    try:
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(**webhook_settings())
+
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        logger.info("Webhook server listening on %s:%s%s", host, port, WEBHOOK_PATH)
+
+        await stop.wait()
+    finally:
+        # 1. מפסיקים לקבל עדכונים חדשים ומסיימים בקשות שבאמצע
+        logger.info("Shutting down webhook server...")
+        server.accepting = False
+        await runner.cleanup()
+
+        # 2. ה-Application מעבד את מה שכבר בתור לפני שהוא נעצר
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)